@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ExtractionJob, JobDocument
+
+
+class JobDocumentInline(admin.TabularInline):
+    model = JobDocument
+    fields = ('index', 'status', 'response', 'error')
+    readonly_fields = fields
+    extra = 0
+
+
+@admin.register(ExtractionJob)
+class ExtractionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'status')
+    inlines = [JobDocumentInline]
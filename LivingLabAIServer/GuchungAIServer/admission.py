@@ -0,0 +1,27 @@
+import math
+
+
+class Overloaded(Exception):
+    """서버가 요청을 받을 수 없는 상태 (retry_after 초 뒤 다시 시도)"""
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class QueueFull(Overloaded):
+    """대기열이 가득 차서 요청을 받지 않았다 (429)"""
+
+
+class QueueTimeout(Overloaded):
+    """최대 대기 시간 안에 생성을 시작하지 못했다 (503)"""
+
+
+class ModelNotReady(Overloaded):
+    """최대 대기 시간 안에 모델 로드가 끝나지 않았다 (503)"""
+
+
+def endpoint_priority(priorities, endpoint):
+    """엔드포인트의 우선순위 (작을수록 먼저, 설정에 없으면 가장 나중)"""
+    if endpoint in priorities:
+        return priorities[endpoint]
+    return max(priorities.values(), default=0) + 1
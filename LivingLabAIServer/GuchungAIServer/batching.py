@@ -0,0 +1,416 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList, StoppingCriteria, StoppingCriteriaList
+
+from . import metrics
+from .admission import QueueFull, QueueTimeout, endpoint_priority
+from .cancellation import GenerationCancelled
+
+
+class GenerationRequest:
+    """스케줄러에 들어온 단일 생성 요청 (min_rows 는 구간 경로에서 배치를 최소 그 행 수로 채우게 한다, 워밍업용)"""
+    def __init__(self, input_ids, generation_kwargs, prefix=None, streamer=None, json_columns=None, speculative=None,
+                 endpoint='unknown', priority=0, cancel_token=None, min_rows=1):
+        self.input_ids = input_ids
+        self.min_rows = min_rows
+        self.endpoint = endpoint
+        self.priority = priority
+        self.cancel_token = cancel_token
+        self.generation_kwargs = generation_kwargs
+        self.prefix = prefix
+        self.streamer = streamer
+        self.json_columns = json_columns
+        self.speculative = speculative
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def group_key(self):
+        """같은 생성 파라미터와 같은 접두부를 가진 요청끼리만 한 배치로 묶는다.
+
+        스트리밍과 추측(speculative) 디코딩은 배치 크기 1만 지원하므로 항상 단독으로 처리한다.
+        """
+        prefix_name = self.prefix.name if self.prefix is not None else None
+        alone = id(self) if self.streamer is not None or self.speculative else None
+        return (prefix_name, alone) + tuple(sorted((k, repr(v)) for k, v in self.generation_kwargs.items()))
+
+
+class FirstTokenTimer(LogitsProcessor):
+    """처음 호출된 시각(= prefill 이 끝나고 첫 토큰을 고르는 시점)을 기록한다"""
+    def __init__(self):
+        self.first_token_at = None
+
+    def __call__(self, input_ids, scores):
+        if self.first_token_at is None:
+            self.first_token_at = time.monotonic()
+        return scores
+
+
+class CancelCriteria(StoppingCriteria):
+    """취소된 요청의 행과 배치 크기를 맞추려고 복제한 행(rows 이후)의 생성을 멈춘다
+
+    모든 행이 멈추면 model.generate 가 max_new_tokens 전에 끝난다.
+    """
+    def __init__(self, cancel_tokens):
+        self.cancel_tokens = cancel_tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = torch.ones(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        for row, token in enumerate(self.cancel_tokens):
+            done[row] = token is not None and token.cancelled
+        return done
+
+
+class BatchScheduler:
+    """일정 시간 동안 들어온 요청을 모아 한 번의 model.generate 호출로 처리하는 스케줄러
+
+    대기열은 엔드포인트 우선순위(priorities, 작을수록 먼저) 순서로 꺼내며,
+    max_queue_size 를 넘으면 QueueFull, max_queue_wait 초 넘게 기다린 요청은 QueueTimeout 으로 끝낸다.
+
+    static_cache 이면 입력 길이를 length_buckets 로, 배치 크기를 2의 거듭제곱으로 맞추고
+    미리 할당한 StaticCache 와 torch.compile 한 forward 를 사용한다 (구간마다 한 번만 컴파일된다).
+    컴파일한 forward 는 이 구간 경로에서만 쓰고, 나머지 경로는 원래 forward 로 생성한다.
+    가장 긴 구간보다 긴 입력이나 max_new_tokens 가 static_max_new_tokens 보다 큰 요청은 일반 경로로 처리한다.
+    """
+    def __init__(self, model, tokenizer, max_batch_size=8, max_wait_ms=20, prefix_cache=None,
+                 draft_model=None, prompt_lookup_num_tokens=10, max_queue_size=0, max_queue_wait=0,
+                 priorities=None, static_cache=False, length_buckets=(256, 512, 1024, 2048),
+                 static_max_new_tokens=256):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.max_queue_size = max(0, max_queue_size)
+        self.max_queue_wait = max(0, max_queue_wait)
+        self.priorities = priorities or {}
+        self.prefix_cache = prefix_cache
+        self.draft_model = draft_model
+        self.prompt_lookup_num_tokens = prompt_lookup_num_tokens
+        self.terminators = [
+            tokenizer.eos_token_id,
+            tokenizer.convert_tokens_to_ids("<|eot_id|>")
+        ]
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        self._json_vocab = None
+        self._queue = queue.PriorityQueue(maxsize=self.max_queue_size)
+        self._sequence = itertools.count()
+        self._batch_seconds = 1.0
+        self._closed = False
+        self.length_buckets = sorted(length_buckets) if static_cache else []
+        self.static_max_new_tokens = static_max_new_tokens
+        self._static_caches = {}
+        self._eager_forward = model.forward
+        self._compiled_forward = None
+        if static_cache:
+            # CUDA 에서는 decode 단계를 CUDA graph 로 캡처한다
+            mode = 'reduce-overhead' if model.device.type == 'cuda' else 'default'
+            self._compiled_forward = torch.compile(model.forward, mode=mode)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, messages, streamer=None, json_columns=None, speculative=None, endpoint='unknown',
+               cancel_token=None, **generation_kwargs):
+        """요청을 큐에 넣고 디코딩된 응답 문자열을 돌려줄 Future를 반환
+
+        json_columns 를 주면 그 열을 키로 하는 JSON 배열만 생성되도록 제약한다.
+        speculative 가 'prompt_lookup' 이면 입력 텍스트의 n-gram 을, 'draft' 이면 작은 초안 모델을
+        후보로 쓰는 추측 디코딩을 사용한다. 후보 위치마다 상태를 바꾸는 JSON 제약과는
+        함께 쓸 수 없으므로 그때는 일반 디코딩을 사용한다 (StaticCache 를 쓸 때도 마찬가지).
+        대기열이 가득 차 있으면 토큰화하기 전에 QueueFull 을 던진다.
+        cancel_token 이 취소되면 대기 중에는 꺼내지 않고, 생성 중에는 그 행의 생성을 멈추며
+        Future 는 GenerationCancelled 로 끝난다.
+        """
+        self._ensure_started()
+        if self.max_queue_size and self._queue.full():
+            raise self._queue_full(endpoint)
+        if (speculative == 'none' or json_columns or self.length_buckets
+                or (speculative == 'draft' and self.draft_model is None)):
+            speculative = None
+        tokenize_start = time.monotonic()
+        input_ids = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+        metrics.TOKENIZE_TIME.observe(time.monotonic() - tokenize_start, endpoint=endpoint)
+        prefix = None
+        if self.prefix_cache is not None and not speculative:
+            prefix = self.prefix_cache.match(input_ids)
+        priority = endpoint_priority(self.priorities, endpoint)
+        request = GenerationRequest(input_ids, generation_kwargs, prefix, streamer, json_columns, speculative, endpoint,
+                                    priority, cancel_token)
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), request))
+        except queue.Full:
+            raise self._queue_full(endpoint)
+        metrics.QUEUE_DEPTH.set(self._queue.qsize())
+        return request.future
+
+    def retry_after(self):
+        """지금 대기 중인 요청이 모두 처리될 때까지 걸릴 것으로 보이는 시간(초)"""
+        batches = self._queue.qsize() / self.max_batch_size + 1
+        return batches * self._batch_seconds
+
+    def warmup_buckets(self):
+        """(길이 구간, 배치 크기 구간) 쌍마다 한 번씩 생성해 구간별 컴파일을 서버 시작 시 끝낸다
+
+        CUDA graph 는 캡처한 스레드에 묶이므로 직접 생성하지 않고 대기열을 거쳐 스케줄러 스레드에서 생성한다.
+        """
+        self._ensure_started()
+        batch_sizes = sorted({self._batch_bucket(size) for size in range(1, self.max_batch_size + 1)})
+        for length in self.length_buckets:
+            for batch_size in batch_sizes:
+                request = GenerationRequest([self.pad_token_id] * length, {'max_new_tokens': 2, 'do_sample': False},
+                                            endpoint='warmup', min_rows=batch_size)
+                self._queue.put((0, next(self._sequence), request))
+                request.future.result()
+
+    def _queue_full(self, endpoint):
+        metrics.REJECTED.inc(endpoint=endpoint, reason='queue_full')
+        return QueueFull(f"Request queue is full ({self.max_queue_size} waiting)", self.retry_after())
+
+    def generate(self, messages, timeout=None, **generation_kwargs):
+        """요청을 제출하고 결과가 나올 때까지 기다린다"""
+        return self.submit(messages, **generation_kwargs).result(timeout=timeout)
+
+    def stream(self, messages, timeout=None, **generation_kwargs):
+        """생성되는 대로 디코딩된 텍스트 조각을 돌려주는 스트리머와 전체 결과 Future를 반환"""
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+        future = self.submit(messages, streamer=streamer, **generation_kwargs)
+        return streamer, future
+
+    def close(self):
+        """대기열에 남은 요청을 처리한 뒤 생성 스레드를 끝낸다 (모델을 메모리에서 내릴 때)"""
+        with self._lock:
+            self._closed = True
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put((float('inf'), next(self._sequence), None))
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Batch scheduler is closed")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="generate-batcher", daemon=True)
+                self._thread.start()
+
+    def _take(self, timeout=None):
+        """우선순위가 가장 높은 요청을 꺼낸다 (최대 대기 시간을 넘긴 요청은 QueueTimeout 으로 끝낸다)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            _, _, request = self._queue.get(timeout=remaining)
+            metrics.QUEUE_DEPTH.set(self._queue.qsize())
+            if request is None:
+                return None
+            waited = time.monotonic() - request.enqueued_at
+            if request.cancel_token is not None and request.cancel_token.cancelled:
+                # 생성하지 않았으므로 평균 배치 시간만큼을 아낀 것으로 본다
+                self._cancel(request, 'queued', request.generation_kwargs.get('max_new_tokens', 20), self._batch_seconds)
+                continue
+            if not self.max_queue_wait or waited <= self.max_queue_wait:
+                return request
+            metrics.REJECTED.inc(endpoint=request.endpoint, reason='queue_timeout')
+            request.future.set_exception(QueueTimeout(
+                f"Request waited {waited:.1f}s in the queue (limit {self.max_queue_wait}s)", self.retry_after()))
+            if request.streamer is not None:
+                request.streamer.end()
+
+    def _cancel(self, request, stage, reclaimed_tokens, reclaimed_seconds):
+        reason = request.cancel_token.reason
+        metrics.CANCELLED.inc(endpoint=request.endpoint, reason=reason, stage=stage)
+        metrics.RECLAIMED_TOKENS.inc(max(0, reclaimed_tokens), endpoint=request.endpoint)
+        metrics.RECLAIMED_SECONDS.inc(max(0.0, reclaimed_seconds), endpoint=request.endpoint)
+        request.future.set_exception(GenerationCancelled(reason))
+        if stage == 'queued' and request.streamer is not None:
+            request.streamer.end()
+
+    def _collect(self):
+        """첫 요청이 들어온 뒤 max_wait 동안 최대 max_batch_size 개까지 우선순위 순서로 모은다"""
+        first = self._take()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._take(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while not self._closed or not self._queue.empty():
+            batch = self._collect()
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.group_key, []).append(request)
+            # batch 가 우선순위 순서이므로 우선순위가 높은 요청이 든 그룹부터 생성된다
+            for group in groups.values():
+                start = time.monotonic()
+                self._generate_batch(group)
+                self._batch_seconds = 0.8 * self._batch_seconds + 0.2 * (time.monotonic() - start)
+
+    def _length_bucket(self, length):
+        for bucket in self.length_buckets:
+            if length <= bucket:
+                return bucket
+        return None
+
+    def _batch_bucket(self, size):
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        return min(bucket, self.max_batch_size)
+
+    def _static_cache(self, batch_size):
+        """배치 크기 구간마다 가장 긴 길이 구간에 맞춰 한 번만 할당하고 이후에는 비워서 재사용한다"""
+        from transformers import StaticCache
+        cache = self._static_caches.get(batch_size)
+        if cache is None:
+            cache = StaticCache(
+                config=self.model.config,
+                max_batch_size=batch_size,
+                max_cache_len=self.length_buckets[-1] + self.static_max_new_tokens,
+                device=self.model.device,
+                dtype=self.model.dtype,
+            )
+            self._static_caches[batch_size] = cache
+        else:
+            cache.reset()
+        return cache
+
+    @contextmanager
+    def _compiled(self):
+        """구간 경로의 생성 동안만 model.forward 를 컴파일한 forward 로 바꾼다 (생성은 스케줄러 스레드 하나에서만 돈다)"""
+        self.model.forward = self._compiled_forward
+        try:
+            yield
+        finally:
+            self.model.forward = self._eager_forward
+
+    def _encode(self, batch):
+        """입력 길이를 패딩으로 맞춘다.
+
+        캐시된 접두부가 있으면 모든 행에서 접두부 위치가 같아야 하므로
+        패딩을 접두부와 나머지 사이에 넣고, 없으면 일반적인 왼쪽 패딩이 된다.
+        길이 구간을 쓰면 그 구간 길이까지 왼쪽을 더 채운다.
+        """
+        prefix_len = len(batch[0].prefix.ids) if batch[0].prefix is not None else 0
+        suffixes = [request.input_ids[prefix_len:] for request in batch]
+        max_suffix = max(len(ids) for ids in suffixes)
+        width = prefix_len + max_suffix
+        if self.length_buckets:
+            width = self._length_bucket(width) or width
+        input_ids = torch.full((len(batch), width), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros_like(input_ids)
+        for i, (request, suffix) in enumerate(zip(batch, suffixes)):
+            input_ids[i, :prefix_len] = torch.tensor(request.input_ids[:prefix_len], dtype=torch.long)
+            input_ids[i, input_ids.shape[1] - len(suffix):] = torch.tensor(suffix, dtype=torch.long)
+            attention_mask[i, :prefix_len] = 1
+            attention_mask[i, input_ids.shape[1] - len(suffix):] = 1
+        return input_ids.to(self.model.device), attention_mask.to(self.model.device)
+
+    def _json_logits_processor(self, batch):
+        from .json_constraint import JsonTableConstraint, JsonTableLogitsProcessor, JsonVocabulary
+        if self._json_vocab is None:
+            self._json_vocab = JsonVocabulary(self.tokenizer)
+        constraints = [
+            JsonTableConstraint(self._json_vocab, request.json_columns, self.terminators[-1],
+                                max_new_tokens=request.generation_kwargs.get('max_new_tokens', 20))
+            if request.json_columns else None
+            for request in batch
+        ]
+        return JsonTableLogitsProcessor(constraints)
+
+    def _output_length(self, tokens):
+        """첫 종료 토큰까지(포함) 생성된 토큰 수"""
+        for i, token in enumerate(tokens.tolist()):
+            if token in self.terminators:
+                return i + 1
+        return len(tokens)
+
+    def _generate_batch(self, batch):
+        start = time.monotonic()
+        metrics.BATCH_SIZE.observe(len(batch))
+        for request in batch:
+            metrics.QUEUE_WAIT.observe(start - request.enqueued_at, endpoint=request.endpoint)
+            metrics.INPUT_TOKENS.inc(len(request.input_ids), endpoint=request.endpoint)
+        timer = FirstTokenTimer()
+        try:
+            input_ids, attention_mask = self._encode(batch)
+            extra_kwargs = {}
+            max_new_tokens = batch[0].generation_kwargs.get('max_new_tokens', 20)
+            bucketed = input_ids.shape[-1] in self.length_buckets and max_new_tokens <= self.static_max_new_tokens
+            if bucketed:
+                # 컴파일된 그래프를 재사용하도록 첫 행을 복제해 배치 크기를 구간에 맞춘다 (복제 행의 결과는 버린다)
+                rows = self._batch_bucket(max(len(batch), batch[0].min_rows))
+                if rows > len(batch):
+                    extra = rows - len(batch)
+                    input_ids = torch.cat([input_ids, input_ids[:1].expand(extra, -1)])
+                    attention_mask = torch.cat([attention_mask, attention_mask[:1].expand(extra, -1)])
+                extra_kwargs['past_key_values'] = self._static_cache(rows)
+            if batch[0].prefix is not None:
+                extra_kwargs['past_key_values'] = self.prefix_cache.past_key_values(batch[0].prefix, len(batch))
+            if batch[0].streamer is not None:
+                extra_kwargs['streamer'] = batch[0].streamer
+            if batch[0].speculative == 'prompt_lookup':
+                extra_kwargs['prompt_lookup_num_tokens'] = self.prompt_lookup_num_tokens
+            elif batch[0].speculative == 'draft':
+                extra_kwargs['assistant_model'] = self.draft_model
+            processors = LogitsProcessorList([timer])
+            if any(request.json_columns for request in batch):
+                processors.append(self._json_logits_processor(batch))
+            extra_kwargs['logits_processor'] = processors
+            cancel_tokens = [request.cancel_token for request in batch]
+            if input_ids.shape[0] > len(batch) or any(cancel_tokens):
+                extra_kwargs['stopping_criteria'] = StoppingCriteriaList([CancelCriteria(cancel_tokens)])
+            generate_start = time.monotonic()
+            with torch.no_grad(), (self._compiled() if bucketed else nullcontext()):
+                outputs = self.model.generate(
+                    input_ids,
+                    attention_mask=attention_mask,
+                    eos_token_id=self.terminators,
+                    pad_token_id=self.pad_token_id,
+                    **extra_kwargs,
+                    **batch[0].generation_kwargs
+                )
+            generate_end = time.monotonic()
+            first_token_at = timer.first_token_at or generate_end
+            decode_seconds = generate_end - first_token_at
+            prompt_len = input_ids.shape[-1]
+            gpu_seconds = (generate_end - start) / len(batch)
+            step_seconds = decode_seconds / max(1, outputs.shape[-1] - prompt_len)
+            for i, request in enumerate(batch):
+                output_tokens = self._output_length(outputs[i][prompt_len:])
+                if request.cancel_token is not None and request.cancel_token.cancelled:
+                    # 남은 토큰 수만큼의 decode 시간(배치 안에서 이 행의 몫)을 아낀 것으로 본다
+                    remaining = max_new_tokens - output_tokens
+                    self._cancel(request, 'generating', remaining, remaining * step_seconds / len(batch))
+                    continue
+                decode_start = time.monotonic()
+                response_text = self.tokenizer.decode(outputs[i][prompt_len:], skip_special_tokens=True)
+                metrics.DETOKENIZE_TIME.observe(time.monotonic() - decode_start, endpoint=request.endpoint)
+                metrics.PREFILL_TIME.observe(first_token_at - generate_start, endpoint=request.endpoint)
+                metrics.DECODE_TIME.observe(decode_seconds, endpoint=request.endpoint)
+                metrics.OUTPUT_TOKENS.inc(output_tokens, endpoint=request.endpoint)
+                if decode_seconds > 0:
+                    metrics.DECODE_TOKENS_PER_SECOND.observe(output_tokens / decode_seconds, endpoint=request.endpoint)
+                request.future.gpu_seconds = gpu_seconds
+                request.future.set_result(response_text)
+        except Exception as e:
+            for request in batch:
+                metrics.GENERATION_ERRORS.inc(endpoint=request.endpoint)
+                if not request.future.done():
+                    request.future.set_exception(e)
+                if request.streamer is not None:
+                    request.streamer.end()
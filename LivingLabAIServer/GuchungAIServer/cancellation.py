@@ -0,0 +1,68 @@
+import socket
+import threading
+import time
+
+
+class GenerationCancelled(Exception):
+    """클라이언트 연결이 끊기거나 마감 시간이 지나 생성을 중단했다"""
+    def __init__(self, reason):
+        super().__init__(f"Generation cancelled ({reason})")
+        self.reason = reason
+
+    def __reduce__(self):
+        return GenerationCancelled, (self.reason,)
+
+
+class CancelToken:
+    """요청 하나의 취소 신호 (cancel() 이 호출되거나 deadline 이 지나면 취소된 것으로 본다)"""
+    CLIENT_DISCONNECTED = 'client_disconnected'
+    DEADLINE = 'deadline'
+
+    def __init__(self, timeout=None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._reason = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason=CLIENT_DISCONNECTED):
+        with self._lock:
+            if self._reason is not None:
+                return
+            self._reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(reason)
+
+    def add_callback(self, callback):
+        """취소될 때 callback(reason) 을 호출한다 (이미 취소됐으면 바로 호출)"""
+        with self._lock:
+            if self._reason is None:
+                self._callbacks.append(callback)
+                return
+        callback(self._reason)
+
+    def remaining(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def reason(self):
+        if self._reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            return self.DEADLINE
+        return self._reason
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+
+def client_disconnected(request):
+    """클라이언트가 연결을 닫았는지 확인한다 (소켓을 알 수 있는 gunicorn 에서만, 그 밖에는 항상 False)"""
+    sock = request.META.get('gunicorn.socket')
+    if sock is None:
+        return False
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
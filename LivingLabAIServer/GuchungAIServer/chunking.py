@@ -0,0 +1,52 @@
+def _count(tokenizer, text):
+    return len(tokenizer(text, add_special_tokens=False)['input_ids'])
+
+
+def _split_long_page(tokenizer, page, max_tokens):
+    """한 페이지가 너무 길면 줄 단위로 나눈다 (한 줄이 너무 길면 그대로 한 조각이 된다)"""
+    pieces = []
+    current, current_tokens = [], 0
+    for line in page.splitlines():
+        line_tokens = _count(tokenizer, line) + 1
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append("\n".join(current))
+    return [(piece, _count(tokenizer, piece)) for piece in pieces]
+
+
+def split_into_chunks(tokenizer, pages, max_tokens):
+    """페이지 경계(필요하면 줄 경계)에서 max_tokens 이하의 조각으로 묶는다"""
+    pieces = []
+    for page in pages:
+        if not page or not page.strip():
+            continue
+        page_tokens = _count(tokenizer, page)
+        if page_tokens > max_tokens:
+            pieces.extend(_split_long_page(tokenizer, page, max_tokens))
+        else:
+            pieces.append((page, page_tokens))
+
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, piece_tokens in pieces:
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += piece_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def may_need_chunking(text, max_tokens):
+    """토큰화하지 않고 보는 길이 검사 (토큰은 1바이트 이상이므로 UTF-8 바이트 수가 max_tokens 보다 작으면 나눌 필요가 없다)"""
+    return len(text.encode('utf-8')) >= max_tokens
+
+
+def needs_chunking(tokenizer, text, max_tokens):
+    return _count(tokenizer, text) > max_tokens
@@ -0,0 +1,299 @@
+import itertools
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+from django.conf import settings
+
+from . import metrics
+from .admission import Overloaded
+from .cancellation import CancelToken, GenerationCancelled
+from .model_registry import ModelRegistry
+from .response_cache import CachingGenerator, ResponseCache
+from .routing import ModelRouter, resolve_model
+
+
+def local_backend():
+    """settings 로 이 프로세스에서 모델을 올리는 라우터(모델별 레지스트리와 생성기)와 응답 캐시를 만든다
+
+    AI_MODELS 의 모델마다 ModelRegistry 를 만들고 응답 캐시는 함께 쓴다 (캐시 키에 모델 id 가 들어간다).
+    """
+    response_cache = ResponseCache(max_entries=settings.AI_RESPONSE_CACHE_SIZE, disk_dir=settings.AI_RESPONSE_CACHE_DIR)
+    registries = {}
+    generators = {}
+    for name, model_id in settings.AI_MODELS.items():
+        registries[name] = ModelRegistry(
+            model_id,
+            hf_home=settings.AI_HF_HOME,
+            device=settings.AI_DEVICE,
+            quantization=settings.AI_QUANTIZATION,
+            num_threads=settings.AI_NUM_THREADS,
+            max_batch_size=settings.AI_MAX_BATCH_SIZE,
+            max_wait_ms=settings.AI_MAX_BATCH_WAIT_MS,
+            prefix_cache=settings.AI_PREFIX_CACHE,
+            warmup=settings.AI_WARMUP,
+            # 초안 모델은 AI_MODEL_ID 와 같은 토크나이저를 쓰므로 그 모델에만 붙인다
+            draft_model_id=settings.AI_DRAFT_MODEL_ID if model_id == settings.AI_MODEL_ID else None,
+            prompt_lookup_num_tokens=settings.AI_PROMPT_LOOKUP_TOKENS,
+            max_queue_size=settings.AI_MAX_QUEUE_SIZE,
+            max_queue_wait=settings.AI_MAX_QUEUE_WAIT_SECONDS,
+            priorities=settings.AI_ENDPOINT_PRIORITIES,
+            stub=settings.AI_STUB_MODEL,
+            static_cache=settings.AI_STATIC_CACHE,
+            length_buckets=settings.AI_LENGTH_BUCKETS,
+            static_max_new_tokens=settings.AI_STATIC_MAX_NEW_TOKENS,
+            mmap_weights=settings.AI_MMAP_WEIGHTS,
+        )
+        generators[name] = CachingGenerator(registries[name], response_cache, model_id)
+    router = ModelRouter(registries, generators, settings.AI_ENDPOINT_MODELS,
+                         memory_budget_bytes=int(settings.AI_MODEL_MEMORY_BUDGET_GB * 2 ** 30))
+    return router, response_cache, router
+
+
+def _authkey():
+    return settings.SECRET_KEY.encode('utf-8')
+
+
+def _transportable(error):
+    """pickle 로 보낼 수 있는 예외 (과부하/취소 예외는 retry_after, reason 을 유지한다)"""
+    if isinstance(error, (Overloaded, GenerationCancelled)):
+        return error
+    return RuntimeError(str(error))
+
+
+class InferenceServer:
+    """모델을 올린 프로세스에서 Unix 소켓으로 생성 요청을 받는 서버 (manage.py runinference)
+
+    메시지는 (op, request_id, ...) 튜플이며 결과는 ('result'|'error'|'token', request_id, 값) 으로 돌려준다.
+    """
+    def __init__(self, address, registry, response_cache, generator):
+        self.address = address
+        self.registry = registry
+        self.response_cache = response_cache
+        self.generator = generator
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, family='AF_UNIX', authkey=_authkey()) as listener:
+            print(f"Inference server listening on {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    print(f"Error accepting inference connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(connection,), name="inference-connection",
+                                 daemon=True).start()
+
+    def _handle(self, connection):
+        lock = threading.Lock()
+        cancel_tokens = {}
+
+        def with_cancel_token(request_id, kwargs, cancel):
+            # 클라이언트가 취소 가능한 요청으로 보낸 경우 마감 시간을 가진 토큰을 만들고 'cancel' 메시지를 기다린다
+            if cancel is not None:
+                cancel_tokens[request_id] = kwargs['cancel_token'] = CancelToken(cancel['timeout'])
+            return kwargs
+
+        def send(message):
+            try:
+                with lock:
+                    connection.send(message)
+            except (OSError, EOFError):
+                pass
+
+        def reply(request_id, future):
+            cancel_tokens.pop(request_id, None)
+            if future.exception() is not None:
+                send(('error', request_id, _transportable(future.exception())))
+            else:
+                send(('result', request_id, future.result()))
+
+        while True:
+            try:
+                op, request_id, *args = connection.recv()
+            except (OSError, EOFError):
+                break
+            try:
+                if op == 'submit':
+                    messages, kwargs, cancel = args
+                    self.generator.submit(messages, **with_cancel_token(request_id, kwargs, cancel)).add_done_callback(
+                        lambda f, request_id=request_id: reply(request_id, f))
+                elif op == 'stream':
+                    messages, kwargs, cancel = args
+                    streamer, future = self.generator.stream(messages, **with_cancel_token(request_id, kwargs, cancel))
+                    threading.Thread(target=self._forward_stream, args=(send, reply, request_id, streamer, future),
+                                     name="inference-stream", daemon=True).start()
+                elif op == 'cancel':
+                    token = cancel_tokens.get(request_id)
+                    if token is not None:
+                        token.cancel(args[0])
+                elif op == 'status':
+                    send(('result', request_id, self.registry.status()))
+                elif op == 'stats':
+                    send(('result', request_id, self.response_cache.stats()))
+                elif op == 'metrics':
+                    send(('result', request_id, metrics.METRICS.render()))
+                else:
+                    raise ValueError(f"Unknown inference operation {op!r}")
+            except Exception as e:
+                send(('error', request_id, _transportable(e)))
+        connection.close()
+
+    @staticmethod
+    def _forward_stream(send, reply, request_id, streamer, future):
+        for token in streamer:
+            if token:
+                send(('token', request_id, token))
+        future.add_done_callback(lambda f: reply(request_id, f))
+
+
+class _RemoteStreamer:
+    """TextIteratorStreamer 처럼 토큰 조각을 순서대로 돌려주는 이터레이터"""
+    END = object()
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            token = self.queue.get()
+            if token is self.END:
+                return
+            yield token
+
+
+class InferenceClient:
+    """Django 워커에서 InferenceServer 에 요청을 보내는 클라이언트
+
+    ModelRegistry 와 CachingGenerator, ResponseCache.stats() 를 대신하므로
+    뷰와 작업자는 모델이 같은 프로세스에 있는지 알 필요가 없다.
+    토크나이저(긴 문서 분할에 사용)만 이 프로세스에서 불러온다.
+    """
+    def __init__(self, address, models, endpoint_models=None, hf_home=None, timeout=5.0):
+        self.address = address
+        self.models = models
+        self.endpoint_models = endpoint_models or {}
+        self.hf_home = hf_home
+        self.timeout = timeout
+        self._connection = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._tokenizers = {}
+
+    def start_background_load(self):
+        """모델은 추론 프로세스가 불러오므로 할 일이 없다"""
+
+    @property
+    def is_ready(self):
+        try:
+            return self.status()['status'] == ModelRegistry.STATE_READY
+        except Exception:
+            return False
+
+    def status(self):
+        try:
+            return self._call('status').result(timeout=self.timeout)
+        except Exception as e:
+            return {'status': 'unavailable', 'error': str(e)}
+
+    def stats(self):
+        return self._call('stats').result(timeout=self.timeout)
+
+    def render_metrics(self):
+        return self._call('metrics').result(timeout=self.timeout)
+
+    def get_tokenizer(self, endpoint=None, model=None, timeout=None):
+        """토크나이저는 이 프로세스에서 따로 불러오므로 모델 로드를 기다리지 않는다"""
+        model_id = self.models[resolve_model(self.models, self.endpoint_models, endpoint, model)]
+        if model_id not in self._tokenizers:
+            if self.hf_home:
+                os.environ['HF_HOME'] = self.hf_home
+            from transformers import AutoTokenizer
+            self._tokenizers[model_id] = AutoTokenizer.from_pretrained(model_id)
+        return self._tokenizers[model_id]
+
+    def submit(self, messages, cancel_token=None, **generation_kwargs):
+        return self._call('submit', messages, generation_kwargs, cancel_token=cancel_token)
+
+    def generate(self, messages, timeout=None, **generation_kwargs):
+        return self.submit(messages, **generation_kwargs).result(timeout=timeout)
+
+    def stream(self, messages, cancel_token=None, **generation_kwargs):
+        streamer = _RemoteStreamer()
+        future = self._call('stream', messages, generation_kwargs, streamer=streamer, cancel_token=cancel_token)
+        return streamer, future
+
+    def _call(self, op, *args, streamer=None, cancel_token=None):
+        """요청을 보내고 응답을 받을 Future 를 반환 (cancel_token 이 취소되면 서버에 'cancel' 을 보낸다)"""
+        future = Future()
+        request_id = next(self._ids)
+        if op in ('submit', 'stream'):
+            args += (None if cancel_token is None else {'timeout': cancel_token.remaining()},)
+        with self._lock:
+            connection = self._connect()
+            self._pending[request_id] = (future, streamer)
+            try:
+                connection.send((op, request_id) + args)
+            except (OSError, EOFError) as e:
+                self._pending.pop(request_id, None)
+                self._connection = None
+                raise ConnectionError(f"Inference server connection lost: {e}")
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda reason: self._send_cancel(connection, request_id, reason))
+        return future
+
+    def _send_cancel(self, connection, request_id, reason):
+        with self._lock:
+            if self._connection is not connection or request_id not in self._pending:
+                return
+            try:
+                connection.send(('cancel', request_id, reason))
+            except (OSError, EOFError):
+                pass
+
+    def _connect(self):
+        if self._connection is None:
+            try:
+                self._connection = Client(self.address, family='AF_UNIX', authkey=_authkey())
+            except OSError as e:
+                raise ConnectionError(f"Inference server is not reachable at {self.address}: {e}")
+            threading.Thread(target=self._receive, args=(self._connection,), name="inference-client",
+                             daemon=True).start()
+        return self._connection
+
+    def _receive(self, connection):
+        while True:
+            try:
+                kind, request_id, value = connection.recv()
+            except (OSError, EOFError):
+                break
+            if kind == 'token':
+                entry = self._pending.get(request_id)
+                if entry is not None and entry[1] is not None:
+                    entry[1].queue.put(value)
+                continue
+            with self._lock:
+                future, streamer = self._pending.pop(request_id, (None, None))
+            if future is None:
+                continue
+            if streamer is not None:
+                streamer.queue.put(_RemoteStreamer.END)
+            if kind == 'error':
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+
+        # 연결이 끊기면 기다리던 요청을 모두 실패로 끝내고 다음 요청에서 다시 연결한다
+        with self._lock:
+            if self._connection is connection:
+                self._connection = None
+            pending, self._pending = self._pending, {}
+        for future, streamer in pending.values():
+            if streamer is not None:
+                streamer.queue.put(_RemoteStreamer.END)
+            future.set_exception(ConnectionError("Inference server connection lost"))
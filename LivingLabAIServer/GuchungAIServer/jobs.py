@@ -0,0 +1,157 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .admission import Overloaded
+from .models import ExtractionJob, JobDocument
+
+
+class JobWorker:
+    """DB에 저장된 대기 문서를 꺼내 배치 스케줄러가 항상 가득 차도록 제출하는 백그라운드 작업자
+
+    HTTP 워커 프로세스마다 하나씩 돌며, 가져간 문서에는 작업자 id 와 lease_seconds 짜리 점유 기한을 기록하고
+    처리하는 동안 기한을 연장한다. 기한이 지난 실행 중 문서(멈추거나 죽은 프로세스의 것)만 다시 대기열로 돌린다.
+    build_request(텍스트, 열, 출력 형식, 생성 파라미터)는 (메시지, 생성 파라미터) 를 돌려준다.
+    """
+    def __init__(self, scheduler, generation_kwargs, build_request, max_in_flight=16, poll_interval=1.0,
+                 lease_seconds=60):
+        self.scheduler = scheduler
+        self.generation_kwargs = generation_kwargs
+        self.build_request = build_request
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._backoff_until = 0.0
+        self._renewed_at = 0.0
+        self._wakeup = threading.Event()
+        self._updated = threading.Condition()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="job-worker", daemon=True)
+                self._thread.start()
+
+    def notify(self):
+        """새 작업이 들어왔음을 알린다"""
+        self.ensure_started()
+        self._wakeup.set()
+
+    def wait_for_update(self, timeout):
+        """문서 하나가 끝나거나 timeout 이 지날 때까지 기다린다 (롱 폴링용)"""
+        with self._updated:
+            self._updated.wait(timeout=timeout)
+
+    def _lease(self):
+        return timezone.now() + timedelta(seconds=self.lease_seconds)
+
+    def _renew(self, in_flight):
+        """처리 중인 문서의 점유 기한을 연장하고, 기한이 지난 다른 작업자의 문서를 대기열로 돌린다"""
+        if time.monotonic() - self._renewed_at < self.lease_seconds / 3:
+            return
+        self._renewed_at = time.monotonic()
+        if in_flight:
+            (JobDocument.objects
+             .filter(pk__in=list(in_flight.values()), claimed_by=self.worker_id)
+             .update(lease_expires_at=self._lease()))
+        # 점유 기한이 없는 실행 중 문서는 기한을 기록하기 전 버전의 서버가 남긴 것이다
+        expired = (JobDocument.objects
+                   .filter(status=JobDocument.STATUS_RUNNING)
+                   .filter(Q(lease_expires_at__lt=timezone.now()) | Q(lease_expires_at__isnull=True))
+                   .update(status=JobDocument.STATUS_PENDING, claimed_by='', lease_expires_at=None))
+        if expired:
+            print(f"Job worker {self.worker_id}: requeued {expired} documents with expired leases")
+
+    def _run(self):
+        close_old_connections()
+        in_flight = {}
+        while True:
+            try:
+                self._renew(in_flight)
+                self._fill(in_flight)
+                if not in_flight:
+                    self._wakeup.wait(timeout=self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                done, _ = wait(list(in_flight), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finish(in_flight.pop(future), future)
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                close_old_connections()
+                time.sleep(self.poll_interval)
+
+    def _fill(self, in_flight):
+        free = self.max_in_flight - len(in_flight)
+        if free <= 0 or time.monotonic() < self._backoff_until:
+            return
+        pending = (JobDocument.objects
+                   .filter(status=JobDocument.STATUS_PENDING)
+                   .select_related('job')
+                   .order_by('created_at', 'index')[:free])
+        for document in pending:
+            # 여러 프로세스가 같은 문서를 가져가지 않도록 상태를 조건부로 바꾼다
+            claimed = (JobDocument.objects
+                       .filter(pk=document.pk, status=JobDocument.STATUS_PENDING)
+                       .update(status=JobDocument.STATUS_RUNNING, claimed_by=self.worker_id,
+                               lease_expires_at=self._lease()))
+            if not claimed:
+                continue
+            messages, kwargs = self.build_request(document.text, document.job.columns, document.job.output_format,
+                                                  self.generation_kwargs)
+            try:
+                future = self.scheduler.submit(messages, **kwargs)
+            except Overloaded as e:
+                self._requeue(document.pk, e)
+                return
+            except Exception as e:
+                self._save(document.pk, JobDocument.STATUS_FAILED, error=str(e))
+                continue
+            in_flight[future] = document.pk
+
+    def _finish(self, document_id, future):
+        try:
+            self._save(document_id, JobDocument.STATUS_COMPLETED, response=future.result())
+        except Overloaded as e:
+            self._requeue(document_id, e)
+        except Exception as e:
+            self._save(document_id, JobDocument.STATUS_FAILED, error=str(e))
+
+    def _requeue(self, document_id, error):
+        """서버가 바쁘면 문서를 실패로 두지 않고 대기 상태로 돌린 뒤 retry_after 동안 제출을 멈춘다"""
+        self._backoff_until = time.monotonic() + error.retry_after
+        (JobDocument.objects
+         .filter(pk=document_id, claimed_by=self.worker_id)
+         .update(status=JobDocument.STATUS_PENDING, claimed_by='', lease_expires_at=None))
+
+    def _save(self, document_id, status, response='', error=''):
+        """결과를 기록한다 (점유 기한이 지나 다른 작업자가 가져간 문서면 버린다)"""
+        saved = (JobDocument.objects
+                 .filter(pk=document_id, claimed_by=self.worker_id)
+                 .update(status=status, response=response, error=error, claimed_by='', lease_expires_at=None,
+                         updated_at=timezone.now()))
+        if not saved:
+            print(f"Job worker {self.worker_id}: lost the lease on document {document_id}, result discarded")
+        with self._updated:
+            self._updated.notify_all()
+
+
+def create_job(documents, columns, output_format='markdown'):
+    """작업과 문서 레코드를 저장한다"""
+    with transaction.atomic():
+        job = ExtractionJob.objects.create(columns=columns, output_format=output_format)
+        JobDocument.objects.bulk_create([
+            JobDocument(job=job, index=i, text=text) for i, text in enumerate(documents)
+        ])
+    return job
@@ -0,0 +1,155 @@
+import json
+
+import torch
+from transformers import LogitsProcessor
+
+
+def _single_token(tokenizer, text):
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(ids) != 1:
+        raise ValueError(f"{text!r} is not a single token for this tokenizer")
+    return ids[0]
+
+
+class JsonVocabulary:
+    """JSON 문자열 값 안에 그대로 들어갈 수 있는 토큰 마스크와 구조 토큰 id (토크나이저마다 한 번 계산)
+
+    따옴표, 역슬래시와 제어 문자(U+0000~U+001F)는 이스케이프 없이 문자열에 들어갈 수 없으므로 뺀다.
+    """
+    UNSAFE_CHARS = '"\\'
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        size = len(tokenizer)
+        texts = tokenizer.batch_decode([[i] for i in range(size)])
+        special = set(tokenizer.all_special_ids) | set(getattr(tokenizer, 'added_tokens_decoder', {}).keys())
+        self.value_mask = torch.tensor([
+            bool(text) and i not in special and not any(c in self.UNSAFE_CHARS or c < ' ' for c in text)
+            for i, text in enumerate(texts)
+        ], dtype=torch.bool)
+        self.quote_id = _single_token(tokenizer, '"')
+        self.comma_id = _single_token(tokenizer, ',')
+        self.close_id = _single_token(tokenizer, ']')
+        self.row_close_ids = self.encode('}')
+        self._masks = {}
+
+    def encode(self, text):
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def value_mask_for(self, scores):
+        """scores 의 크기와 장치에 맞춘 값 토큰 마스크 (닫는 따옴표 포함)"""
+        key = (scores.shape[-1], scores.device)
+        if key not in self._masks:
+            mask = torch.zeros(scores.shape[-1], dtype=torch.bool)
+            size = min(len(self.value_mask), scores.shape[-1])
+            mask[:size] = self.value_mask[:size]
+            mask[self.quote_id] = True
+            self._masks[key] = mask.to(scores.device)
+        return self._masks[key]
+
+
+class JsonTableConstraint:
+    """[{"열1": "값", "열2": "값"}, ...] 형태만 생성되도록 하는 행 하나의 상태 기계
+
+    따옴표, 키, 쉼표 같은 구조 토큰은 강제로 넣고 모델은 문자열 값과
+    값의 끝(따옴표), 다음 행(,) 또는 표의 끝(])만 고른다. 표가 닫히면 바로 eos 를 강제한다.
+    max_new_tokens 가 표를 닫을 만큼만 남으면 값을 닫고 남은 열은 비운 채 행과 배열을 닫으므로
+    생성이 길이 제한으로 끝나도 결과는 항상 JSON 으로 읽힌다.
+    """
+    FORCED = 'forced'
+    VALUE = 'value'
+    ROW_END = 'row_end'
+    DONE = 'done'
+
+    def __init__(self, vocab, columns, eos_token_id, max_new_tokens=256, max_rows=50, max_value_tokens=64):
+        self.vocab = vocab
+        self.columns = list(columns)
+        self.eos_token_id = eos_token_id
+        self.max_rows = max_rows
+        self.max_value_tokens = max_value_tokens
+        self.remaining = max_new_tokens
+        # 값을 닫고("), 행을 닫고(}), 배열을 닫는(]) 데 드는 토큰 수
+        self.close_cost = 2 + len(vocab.row_close_ids)
+        self.rows = 0
+        self.column = 0
+        self.value_tokens = 0
+        self._force(vocab.encode('[{' + self._key(0)), self.VALUE)
+
+    def _key(self, i):
+        return json.dumps(self.columns[i], ensure_ascii=False) + ': "'
+
+    def _force(self, ids, then):
+        self.state = self.FORCED
+        self.forced = list(ids)
+        self.then = then
+
+    def _fits(self, ids):
+        """ids 를 넣고 값 토큰 하나를 쓴 뒤에도 표를 닫을 토큰이 남는지"""
+        return self.remaining >= len(ids) + 1 + self.close_cost
+
+    def allowed(self):
+        """('forced'|'choice'|'value', 허용 토큰 id 목록 또는 None)"""
+        if self.state == self.FORCED:
+            return 'forced', [self.forced[0]]
+        if self.state == self.VALUE:
+            if self.value_tokens >= self.max_value_tokens or self.remaining <= self.close_cost:
+                return 'forced', [self.vocab.quote_id]
+            return 'value', None
+        if self.state == self.ROW_END:
+            if self.rows + 1 >= self.max_rows or not self._fits(self.vocab.encode(' {' + self._key(0))):
+                return 'forced', [self.vocab.close_id]
+            return 'choice', [self.vocab.comma_id, self.vocab.close_id]
+        return 'forced', [self.eos_token_id]
+
+    def advance(self, token_id):
+        self.remaining -= 1
+        if self.state == self.FORCED:
+            self.forced.pop(0)
+            if not self.forced:
+                self.state = self.then
+                self.value_tokens = 0
+        elif self.state == self.VALUE:
+            if token_id != self.vocab.quote_id:
+                self.value_tokens += 1
+                return
+            self.column += 1
+            next_key = self.vocab.encode(', ' + self._key(self.column)) if self.column < len(self.columns) else None
+            if next_key is not None and self._fits(next_key):
+                self._force(next_key, self.VALUE)
+            else:
+                # 남은 열은 비워 둔다 (클라이언트가 '-' 로 채운다)
+                self._force(self.vocab.row_close_ids, self.ROW_END)
+        elif self.state == self.ROW_END:
+            if token_id == self.vocab.comma_id:
+                self.rows += 1
+                self.column = 0
+                self._force(self.vocab.encode(' {' + self._key(0)), self.VALUE)
+            else:
+                self._force([self.eos_token_id], self.DONE)
+
+
+class JsonTableLogitsProcessor(LogitsProcessor):
+    """배치의 각 행에 JsonTableConstraint 를 적용한다 (None 인 행은 제약 없음)"""
+    def __init__(self, constraints):
+        self.constraints = constraints
+        self._prompt_length = None
+
+    def __call__(self, input_ids, scores):
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1]
+        elif input_ids.shape[1] > self._prompt_length:
+            for row, constraint in enumerate(self.constraints):
+                if constraint is not None:
+                    constraint.advance(int(input_ids[row, -1]))
+
+        for row, constraint in enumerate(self.constraints):
+            if constraint is None:
+                continue
+            kind, ids = constraint.allowed()
+            if kind == 'value':
+                scores[row] = scores[row].masked_fill(~constraint.vocab.value_mask_for(scores), float('-inf'))
+            else:
+                keep = scores[row, ids].clone()
+                scores[row] = float('-inf')
+                scores[row, ids] = keep
+        return scores
@@ -0,0 +1,163 @@
+import glob
+import json
+import mmap
+import os
+import struct
+
+QUANTIZATION_MODES = ('none', 'int8', 'int4')
+
+SAFETENSORS_DTYPES = {
+    'F64': 'float64', 'F32': 'float32', 'F16': 'float16', 'BF16': 'bfloat16',
+    'I64': 'int64', 'I32': 'int32', 'I16': 'int16', 'I8': 'int8', 'U8': 'uint8', 'BOOL': 'bool',
+}
+
+
+def stub_model(tokenizer):
+    """가중치를 내려받지 않고 토크나이저 어휘에 맞춘 작은 무작위 가중치 Llama 모델 (부하 테스트용)
+
+    종료 토큰이 거의 나오지 않으므로 요청마다 max_new_tokens 만큼 생성해 부하가 일정하다.
+    """
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=256,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=8192,
+        tie_word_embeddings=True,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    return LlamaForCausalLM(config)
+
+
+def _model_dir(model_id):
+    """로컬 디렉터리면 그대로, 허브 id 면 캐시된 스냅샷 경로 (없으면 safetensors 와 설정만 내려받는다)"""
+    if os.path.isdir(model_id):
+        return model_id
+    from huggingface_hub import snapshot_download
+    return snapshot_download(model_id, allow_patterns=['*.safetensors', '*.json'])
+
+
+def mmap_safetensors(path):
+    """safetensors 파일을 copy-on-write 로 mmap 하고 복사 없이 그 위에 텐서를 만든다
+
+    여러 프로세스가 같은 파일을 열면 가중치는 페이지 캐시 한 벌을 공유하고,
+    값을 바꾼 페이지만 그 프로세스의 메모리로 복사된다.
+    """
+    import torch
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_size = struct.unpack('<Q', buffer[:8])[0]
+    header = json.loads(buffer[8:8 + header_size])
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info['dtype']])
+        start, end = info['data_offsets']
+        if end == start:
+            tensors[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + start).view(info['shape'])
+    return tensors
+
+
+def load_mmap_model(model_id):
+    """빈(meta) 모델을 만든 뒤 mmap 한 safetensors 텐서를 복사 없이 그대로 파라미터로 쓴다 (저장된 dtype 유지)"""
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    model_dir = _model_dir(model_id)
+    paths = sorted(glob.glob(os.path.join(model_dir, '*.safetensors')))
+    if not paths:
+        raise ValueError(f"No safetensors files found for {model_id}")
+
+    config = AutoConfig.from_pretrained(model_dir)
+    with init_empty_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=config.torch_dtype)
+
+    state_dict = {}
+    for path in paths:
+        state_dict.update(mmap_safetensors(path))
+    _, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+    # 묶인 lm_head 처럼 체크포인트에 없는 파라미터는 tie_weights 후에도 meta 로 남으면 안 된다
+    model.tie_weights()
+    missing = [name for name, parameter in model.named_parameters() if parameter.is_meta]
+    if missing or unexpected:
+        raise ValueError(f"Checkpoint does not match the model: missing {missing[:5]}, unexpected {unexpected[:5]}")
+    return model
+
+
+def load_model(model_id, device='cuda', quantization='none', num_threads=0, cuda_visible_devices='0', stub=False,
+               mmap_weights=False):
+    """설정한 장치와 양자화 방식으로 토크나이저와 모델을 불러온다
+
+    device='cuda' 는 bfloat16 + device_map="auto", device='cpu' 는 float32 로 계산하며
+    CPU 에서는 quantization 으로 Linear 레이어를 int8/int4 로 양자화할 수 있다.
+    stub 이면 model_id 의 토크나이저만 불러오고 모델은 작은 무작위 가중치 모델로 대신한다.
+    mmap_weights 이면 safetensors 를 mmap 해서 복사 없이 사용한다 (CPU 에서도 저장된 dtype 으로 계산).
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+    if mmap_weights and quantization != 'none':
+        raise ValueError("Memory-mapped weights cannot be quantized without copying them")
+    if device == 'cuda' and cuda_visible_devices:
+        os.environ['CUDA_VISIBLE_DEVICES'] = cuda_visible_devices
+
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+    if stub:
+        if device not in ('cuda', 'cpu'):
+            raise ValueError(f"Unknown device: {device}")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        model = stub_model(tokenizer)
+        if quantization != 'none':
+            from .quantization import quantize_linear_layers
+            quantize_linear_layers(model, quantization)
+        model.to(device)
+    elif mmap_weights:
+        if device not in ('cuda', 'cpu'):
+            raise ValueError(f"Unknown device: {device}")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        model = load_mmap_model(model_id)
+        # GPU 로는 페이지 캐시에서 바로 복사되고, CPU 에서는 mmap 한 페이지를 그대로 쓴다
+        model.to(device)
+    elif device == 'cuda':
+        if quantization != 'none':
+            raise ValueError("Quantization is only supported on the CPU backend")
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id,
+            torch_dtype=torch.bfloat16,
+            device_map="auto",
+        )
+    elif device == 'cpu':
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        # bfloat16 으로 불러온 뒤 레이어별로 변환해 float32 전체 사본이 메모리에 올라가지 않게 한다
+        model = AutoModelForCausalLM.from_pretrained(
+            model_id,
+            torch_dtype=torch.bfloat16,
+            low_cpu_mem_usage=True,
+        )
+        if quantization != 'none':
+            from .quantization import quantize_linear_layers
+            quantize_linear_layers(model, quantization)
+        model.float()
+    else:
+        raise ValueError(f"Unknown device: {device}")
+
+    model.eval()
+    return model, tokenizer
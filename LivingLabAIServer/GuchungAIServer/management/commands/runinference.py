@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from GuchungAIServer.inference import InferenceServer, local_backend
+
+
+class Command(BaseCommand):
+    help = "모델을 한 번만 불러와 HTTP 워커들이 Unix 소켓으로 공유하는 추론 프로세스를 실행합니다"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.AI_INFERENCE_SOCKET,
+                            help="소켓 경로 (기본값 AI_INFERENCE_SOCKET)")
+
+    def handle(self, *args, **options):
+        address = options['socket']
+        if not address:
+            raise CommandError("Set AI_INFERENCE_SOCKET or pass --socket")
+
+        registry, response_cache, generator = local_backend()
+        registry.start_background_load()
+        InferenceServer(address, registry, response_cache, generator).serve_forever()
@@ -0,0 +1,193 @@
+import functools
+import sys
+import threading
+import time
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160, 320)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        with self._lock:
+            samples = self._samples()
+        if not samples:
+            # 값이 없는 지표는 내보내지 않는다 (추론 프로세스의 지표와 이어 붙여도 이름이 겹치지 않게)
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"] + samples
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total) in self._values.items():
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식으로 내보낼 지표 모음"""
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, callback):
+        """수집 직전에 게이지 값을 갱신할 콜백을 등록한다"""
+        self._collectors.append(callback)
+        return callback
+
+    def render(self):
+        for callback in self._collectors:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+REQUESTS = METRICS.counter('ai_requests_total', 'HTTP requests handled, by endpoint and status code.',
+                           ['endpoint', 'status'])
+REQUEST_LATENCY = METRICS.histogram('ai_request_duration_seconds', 'End-to-end HTTP request latency.', ['endpoint'])
+QUEUE_WAIT = METRICS.histogram('ai_queue_wait_seconds', 'Time a request waited in the batch queue.', ['endpoint'])
+TOKENIZE_TIME = METRICS.histogram('ai_tokenize_seconds', 'Chat template tokenization time.', ['endpoint'])
+PREFILL_TIME = METRICS.histogram('ai_prefill_seconds', 'Time from generate() start to the first token.', ['endpoint'])
+DECODE_TIME = METRICS.histogram('ai_decode_seconds', 'Time from the first token to the end of generate().',
+                                ['endpoint'])
+DETOKENIZE_TIME = METRICS.histogram('ai_detokenize_seconds', 'Output decoding time.', ['endpoint'])
+INPUT_TOKENS = METRICS.counter('ai_input_tokens_total', 'Prompt tokens processed.', ['endpoint'])
+OUTPUT_TOKENS = METRICS.counter('ai_output_tokens_total', 'Tokens generated.', ['endpoint'])
+DECODE_TOKENS_PER_SECOND = METRICS.histogram('ai_decode_tokens_per_second', 'Per-request decode throughput.',
+                                             ['endpoint'], buckets=TOKENS_PER_SECOND_BUCKETS)
+QUEUE_DEPTH = METRICS.gauge('ai_queue_depth', 'Requests waiting in the batch queue.')
+REJECTED = METRICS.counter('ai_rejected_requests_total', 'Requests rejected by admission control.',
+                           ['endpoint', 'reason'])
+CANCELLED = METRICS.counter('ai_cancelled_requests_total', 'Generations cancelled by client disconnect or deadline.',
+                            ['endpoint', 'reason', 'stage'])
+RECLAIMED_TOKENS = METRICS.counter('ai_cancel_reclaimed_tokens_total',
+                                   'Tokens not generated because the request was cancelled (estimate).', ['endpoint'])
+RECLAIMED_SECONDS = METRICS.counter('ai_cancel_reclaimed_seconds_total',
+                                    'Generation time saved by cancellation (estimate).', ['endpoint'])
+BATCH_SIZE = METRICS.histogram('ai_batch_size', 'Requests per model.generate call.', buckets=BATCH_SIZE_BUCKETS)
+GENERATION_ERRORS = METRICS.counter('ai_generation_errors_total', 'Failed generate() calls, per request.',
+                                    ['endpoint'])
+GPU_MEMORY_ALLOCATED = METRICS.gauge('ai_gpu_memory_allocated_bytes', 'torch.cuda.memory_allocated per device.',
+                                     ['device'])
+GPU_MEMORY_RESERVED = METRICS.gauge('ai_gpu_memory_reserved_bytes', 'torch.cuda.memory_reserved per device.',
+                                    ['device'])
+GPU_MEMORY_PEAK = METRICS.gauge('ai_gpu_memory_peak_bytes', 'torch.cuda.max_memory_allocated per device.',
+                                ['device'])
+
+
+@METRICS.on_collect
+def _collect_gpu_memory():
+    # 모델을 아직 불러오지 않았으면 torch 를 새로 import 하지 않고, CUDA 를 쓰지 않는 프로세스는 건너뛴다
+    torch = sys.modules.get('torch')
+    if torch is None or not torch.cuda.is_initialized():
+        return
+    for i in range(torch.cuda.device_count()):
+        GPU_MEMORY_ALLOCATED.set(torch.cuda.memory_allocated(i), device=i)
+        GPU_MEMORY_RESERVED.set(torch.cuda.memory_reserved(i), device=i)
+        GPU_MEMORY_PEAK.set(torch.cuda.max_memory_allocated(i), device=i)
+
+
+def instrumented(endpoint):
+    """뷰 메서드의 요청 수, 상태 코드, 지연 시간을 기록하는 데코레이터"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            start = time.monotonic()
+            status_code = 500
+            try:
+                response = method(self, request, *args, **kwargs)
+                status_code = response.status_code
+                return response
+            finally:
+                REQUESTS.inc(endpoint=endpoint, status=status_code)
+                REQUEST_LATENCY.observe(time.monotonic() - start, endpoint=endpoint)
+        return wrapper
+    return decorator
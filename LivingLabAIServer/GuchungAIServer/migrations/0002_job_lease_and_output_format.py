@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('GuchungAIServer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractionjob',
+            name='output_format',
+            field=models.CharField(default='markdown', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='jobdocument',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='jobdocument',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,256 @@
+import os
+import re
+import threading
+import time
+from importlib.metadata import PackageNotFoundError, version
+
+from .prompts import (build_column_messages, build_table_messages, column_prefix_messages,
+                      json_table_prefix_messages, table_prefix_messages)
+
+
+def process_memory():
+    """현재 프로세스의 RSS 와 그중 다른 프로세스와 공유할 수 있는 파일 매핑(mmap 가중치 등) 크기 (MB)"""
+    import psutil
+    info = psutil.Process().memory_info()
+    return {
+        'rss_mb': round(info.rss / 2 ** 20, 1),
+        'shared_mb': round(getattr(info, 'shared', 0) / 2 ** 20, 1),
+    }
+
+
+# StaticCache(max_batch_size=...) 를 generate 의 past_key_values 로 넘길 수 있는 transformers 버전
+STATIC_CACHE_MIN_TRANSFORMERS = (4, 42)
+
+
+def installed_transformers_version():
+    """설치된 transformers 의 (major, minor) (import 하지 않고 패키지 정보만 읽는다, 없으면 None)"""
+    try:
+        return tuple(int(part) for part in re.findall(r'\d+', version('transformers'))[:2])
+    except PackageNotFoundError:
+        return None
+
+
+def seconds_since_process_start():
+    import psutil
+    return time.time() - psutil.Process().create_time()
+
+
+class ModelRegistry:
+    """모델을 처음 사용할 때 또는 서버 시작 시 백그라운드에서 불러오고 워밍업까지 마치는 레지스트리
+
+    torch/transformers 는 실제로 모델을 불러올 때만 import 하므로
+    manage.py check/migrate/shell 같은 명령은 모델을 불러오지 않는다.
+    """
+    STATE_IDLE = 'idle'
+    STATE_LOADING = 'loading'
+    STATE_WARMING_UP = 'warming_up'
+    STATE_READY = 'ready'
+    STATE_FAILED = 'failed'
+
+    def __init__(self, model_id, hf_home=None, device='cuda', quantization='none', num_threads=0,
+                 max_batch_size=8, max_wait_ms=20, prefix_cache=True, warmup=True,
+                 draft_model_id=None, prompt_lookup_num_tokens=10, max_queue_size=0, max_queue_wait=0,
+                 priorities=None, stub=False, static_cache=False, length_buckets=(256, 512, 1024, 2048),
+                 static_max_new_tokens=256, mmap_weights=False):
+        self.model_id = model_id
+        self.hf_home = hf_home
+        self.device = device
+        self.quantization = quantization
+        self.num_threads = num_threads
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.use_prefix_cache = prefix_cache
+        self.warmup_enabled = warmup
+        self.draft_model_id = draft_model_id
+        self.prompt_lookup_num_tokens = prompt_lookup_num_tokens
+        self.max_queue_size = max_queue_size
+        self.max_queue_wait = max_queue_wait
+        self.priorities = priorities
+        self.stub = stub
+        installed = installed_transformers_version()
+        if static_cache and (installed is None or installed < STATIC_CACHE_MIN_TRANSFORMERS):
+            # 생성 도중 실패하지 않도록 시작할 때 끄고 일반 경로로 처리한다
+            print(f"AI_STATIC_CACHE disabled for {model_id}: transformers "
+                  f"{'.'.join(map(str, STATIC_CACHE_MIN_TRANSFORMERS))} or later is required "
+                  f"(installed: {'.'.join(map(str, installed)) if installed else 'none'})")
+            static_cache = False
+        self.static_cache = static_cache
+        self.length_buckets = length_buckets
+        self.static_max_new_tokens = static_max_new_tokens
+        self.mmap_weights = mmap_weights
+        self.state = self.STATE_IDLE
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.ready_seconds = None
+        self.memory_at_ready = None
+        self.memory_bytes = None
+        self.model = None
+        self.tokenizer = None
+        self._scheduler = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start_background_load(self):
+        """별도 스레드에서 모델 로드와 워밍업을 시작한다"""
+        with self._lock:
+            if self._thread is None and self.state == self.STATE_IDLE:
+                self.state = self.STATE_LOADING
+                self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+                self._thread.start()
+
+    @property
+    def is_ready(self):
+        return self.state == self.STATE_READY
+
+    def get_scheduler(self, timeout=None):
+        """모델이 준비될 때까지 기다린 뒤 배치 스케줄러를 반환"""
+        self.start_background_load()
+        if not self._ready.wait(timeout=timeout):
+            raise TimeoutError(f"Model {self.model_id} is not ready yet")
+        if self.state == self.STATE_FAILED:
+            raise RuntimeError(f"Model {self.model_id} failed to load: {self.error}")
+        return self._scheduler
+
+    def unload(self):
+        """모델을 메모리에서 내린다 (다음 요청이 오면 다시 불러온다)"""
+        with self._lock:
+            if self.state not in (self.STATE_READY, self.STATE_FAILED):
+                return False
+            scheduler, self._scheduler = self._scheduler, None
+            self.model = None
+            self.tokenizer = None
+            self.state = self.STATE_IDLE
+            self.error = None
+            self._thread = None
+            self._ready.clear()
+        if scheduler is not None:
+            scheduler.close()
+        import gc
+        import torch
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        print(f"Model {self.model_id} unloaded")
+        return True
+
+    def get_tokenizer(self, timeout=None):
+        self.get_scheduler(timeout)
+        return self.tokenizer
+
+    def submit(self, messages, **generation_kwargs):
+        return self.get_scheduler().submit(messages, **generation_kwargs)
+
+    def generate(self, messages, **generation_kwargs):
+        return self.get_scheduler().generate(messages, **generation_kwargs)
+
+    def stream(self, messages, **generation_kwargs):
+        return self.get_scheduler().stream(messages, **generation_kwargs)
+
+    def status(self):
+        return {
+            'status': self.state,
+            'model_id': self.model_id,
+            'device': self.device,
+            'quantization': self.quantization,
+            'draft_model_id': self.draft_model_id,
+            'stub': self.stub,
+            'static_cache': self.static_cache,
+            'mmap_weights': self.mmap_weights,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'ready_seconds': self.ready_seconds,
+            'memory_at_ready': self.memory_at_ready,
+            'memory': process_memory(),
+            'model_memory_mb': round(self.memory_bytes / 2 ** 20, 1) if self.memory_bytes else None,
+            'error': self.error,
+        }
+
+    def _load(self):
+        try:
+            start = time.monotonic()
+            if self.hf_home:
+                os.environ['HF_HOME'] = self.hf_home
+
+            from .batching import BatchScheduler
+            from .loading import load_model
+            from .prefix_cache import PrefixCache
+
+            self.model, self.tokenizer = load_model(
+                self.model_id,
+                device=self.device,
+                quantization=self.quantization,
+                num_threads=self.num_threads,
+                stub=self.stub,
+                mmap_weights=self.mmap_weights,
+            )
+
+            draft_model = None
+            if self.draft_model_id:
+                draft_model, _ = load_model(
+                    self.draft_model_id,
+                    device=self.device,
+                    quantization=self.quantization,
+                    num_threads=self.num_threads,
+                    stub=self.stub,
+                    mmap_weights=self.mmap_weights,
+                )
+
+            prefix_cache = None
+            # StaticCache 를 쓰면 접두부 KV 캐시(DynamicCache)는 함께 쓸 수 없다
+            if self.use_prefix_cache and not self.static_cache:
+                prefix_cache = PrefixCache(self.model, self.tokenizer)
+                prefix_cache.register('columns', column_prefix_messages())
+                prefix_cache.register('response', table_prefix_messages())
+                prefix_cache.register('response_json', json_table_prefix_messages())
+
+            self._scheduler = BatchScheduler(
+                self.model,
+                self.tokenizer,
+                max_batch_size=self.max_batch_size,
+                max_wait_ms=self.max_wait_ms,
+                prefix_cache=prefix_cache,
+                draft_model=draft_model,
+                prompt_lookup_num_tokens=self.prompt_lookup_num_tokens,
+                max_queue_size=self.max_queue_size,
+                max_queue_wait=self.max_queue_wait,
+                priorities=self.priorities,
+                static_cache=self.static_cache,
+                length_buckets=self.length_buckets,
+                static_max_new_tokens=self.static_max_new_tokens,
+            )
+            self.load_seconds = time.monotonic() - start
+            self.memory_bytes = sum(t.numel() * t.element_size()
+                                    for m in (self.model, draft_model) if m is not None
+                                    for t in list(m.parameters()) + list(m.buffers()))
+
+            if self.warmup_enabled:
+                self.state = self.STATE_WARMING_UP
+                self._warmup()
+
+            # 재시작부터 요청을 받을 수 있을 때까지 걸린 시간과 그 시점의 메모리
+            self.ready_seconds = round(seconds_since_process_start(), 1)
+            self.memory_at_ready = process_memory()
+            self.state = self.STATE_READY
+            print(f"Model {self.model_id} ready {self.ready_seconds:.1f}s after process start "
+                  f"(load {self.load_seconds:.1f}s, warm-up {self.warmup_seconds or 0:.1f}s, "
+                  f"RSS {self.memory_at_ready['rss_mb']:.0f} MB, shared {self.memory_at_ready['shared_mb']:.0f} MB)")
+        except Exception as e:
+            self.error = str(e)
+            self.state = self.STATE_FAILED
+            print(f"Error loading model {self.model_id}: {e}")
+        finally:
+            self._ready.set()
+
+    def _warmup(self):
+        """CUDA 커널과 메모리 풀을 미리 준비하고 접두부 KV 캐시를 채운다 (StaticCache 를 쓰면 길이/배치 크기 구간별 컴파일도)"""
+        import torch
+        start = time.monotonic()
+        warmup_kwargs = {'max_new_tokens': 8, 'do_sample': False, 'endpoint': 'warmup'}
+        self._scheduler.generate(build_column_messages("성명 홍길동 연락처 010-0000-0000"), **warmup_kwargs)
+        self._scheduler.generate(build_table_messages("성명 홍길동 연락처 010-0000-0000", ['성명', '연락처']), **warmup_kwargs)
+        self._scheduler.warmup_buckets()
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        self.warmup_seconds = time.monotonic() - start
@@ -1,3 +1,55 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class ExtractionJob(models.Model):
+    """여러 문서의 표 추출을 한 번에 요청한 작업"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    columns = models.JSONField()
+    output_format = models.CharField(max_length=16, default='markdown')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def status(self):
+        statuses = set(self.documents.values_list('status', flat=True))
+        if not statuses or statuses <= {JobDocument.STATUS_COMPLETED, JobDocument.STATUS_FAILED}:
+            return 'completed'
+        if statuses == {JobDocument.STATUS_PENDING}:
+            return 'pending'
+        return 'running'
+
+
+class JobDocument(models.Model):
+    """작업에 포함된 문서 하나와 그 추출 결과"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(ExtractionJob, related_name='documents', on_delete=models.CASCADE)
+    index = models.PositiveIntegerField()
+    text = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    response = models.TextField(blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    # 실행 중인 문서를 가져간 작업자와 그 점유가 끝나는 시각 (작업자가 주기적으로 연장한다)
+    claimed_by = models.CharField(max_length=64, blank=True, default='')
+    lease_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['job', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'index'], name='unique_job_document_index'),
+        ]
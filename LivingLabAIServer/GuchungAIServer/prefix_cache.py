@@ -0,0 +1,57 @@
+import threading
+
+import torch
+
+from .prompts import render_prefix_ids
+
+
+class PrefixEntry:
+    """고정 프롬프트 접두부의 토큰과 past-key-values"""
+    def __init__(self, name, ids):
+        self.name = name
+        self.ids = list(ids)
+        self.past_key_values = None
+
+    def matches(self, ids):
+        return len(ids) > len(self.ids) and ids[:len(self.ids)] == self.ids
+
+
+class PrefixCache:
+    """뷰마다 고정된 채팅 템플릿 접두부의 KV 캐시를 한 번만 계산해 재사용한다"""
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, messages):
+        """PREFIX_SENTINEL 로 끝나는 메시지로 접두부를 등록한다"""
+        self._entries[name] = PrefixEntry(name, render_prefix_ids(self.tokenizer, messages))
+
+    def match(self, ids):
+        """ids 로 시작하는 가장 긴 등록된 접두부를 찾는다"""
+        best = None
+        for entry in self._entries.values():
+            if entry.matches(ids) and (best is None or len(entry.ids) > len(best.ids)):
+                best = entry
+        return best
+
+    def past_key_values(self, entry, batch_size):
+        """접두부 KV 캐시를 배치 크기만큼 복제한 새 캐시 객체를 반환"""
+        with self._lock:
+            if entry.past_key_values is None:
+                entry.past_key_values = self._compute(entry.ids)
+        from transformers import DynamicCache
+        return DynamicCache.from_legacy_cache(tuple(
+            (key.expand(batch_size, -1, -1, -1).contiguous(), value.expand(batch_size, -1, -1, -1).contiguous())
+            for key, value in entry.past_key_values
+        ))
+
+    def _compute(self, ids):
+        input_ids = torch.tensor([ids], dtype=torch.long, device=self.model.device)
+        with torch.no_grad():
+            outputs = self.model(input_ids, use_cache=True)
+        past = outputs.past_key_values
+        if hasattr(past, 'to_legacy_cache'):
+            past = past.to_legacy_cache()
+        return past
@@ -0,0 +1,89 @@
+COLUMN_SYSTEM_PROMPT = (
+    "You are a skilled data analyst. Extract and return the most relevant column names from the provided text. "
+    "Ensure that the column names are concise, relevant, and free of typographical errors. "
+    "The column names should be in Korean and should match the data context exactly."
+    "Don't leave a note, just show a response"
+)
+
+TABLE_SYSTEM_PROMPT = (
+    "You are an AI that extracts structured information from text. "
+    "Please convert the following information into a well-formatted table with rows and columns aligned correctly. "
+    "Ensure that all columns and rows are represented correctly. "
+    "and handle cases where multiple spaces or irregular spacing occurs by treating it as a single space. "
+    "If multiple pieces of information, such as bank name and account number, are in one cell, separate them into different columns. "
+    "Combine similar or identical column headers into one column, and fill in missing data with '-'. "
+    "Do not leave notes in the response, just return the formatted table."
+)
+
+JSON_TABLE_SYSTEM_PROMPT = (
+    "You are an AI that extracts structured information from text. "
+    "Return the information as a JSON array with one object per record, using exactly the requested columns as keys. "
+    "Handle cases where multiple spaces or irregular spacing occurs by treating it as a single space. "
+    "If multiple pieces of information, such as bank name and account number, are in one cell, put them under the matching columns. "
+    "Fill in missing data with '-'. "
+    "Do not leave notes in the response, just return the JSON."
+)
+
+TABLE_USER_PREAMBLE = (
+    "Here is the text with information that needs to be converted into a table. "
+    "The table should have the following columns: "
+)
+
+# 채팅 템플릿에서 고정 접두부가 끝나는 위치를 찾기 위한 표식
+PREFIX_SENTINEL = "\uffff"
+
+
+def build_column_messages(text):
+    """열 제목 추출용 메시지"""
+    return [
+        {"role": "system", "content": COLUMN_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{text}"}
+    ]
+
+
+def build_table_messages(text, columns):
+    """표 데이터 추출용 메시지"""
+    return [
+        {"role": "system", "content": TABLE_SYSTEM_PROMPT},
+        {"role": "user", "content": TABLE_USER_PREAMBLE + ', '.join(columns) + ".\n\n" + text}
+    ]
+
+
+def build_json_table_messages(text, columns):
+    """JSON 형식 표 데이터 추출용 메시지"""
+    return [
+        {"role": "system", "content": JSON_TABLE_SYSTEM_PROMPT},
+        {"role": "user", "content": TABLE_USER_PREAMBLE + ', '.join(columns) + ".\n\n" + text}
+    ]
+
+
+def column_prefix_messages():
+    """요청마다 변하지 않는 열 제목 추출 프롬프트의 앞부분"""
+    return build_column_messages(PREFIX_SENTINEL)
+
+
+def table_prefix_messages():
+    """요청마다 변하지 않는 표 추출 프롬프트의 앞부분"""
+    return [
+        {"role": "system", "content": TABLE_SYSTEM_PROMPT},
+        {"role": "user", "content": TABLE_USER_PREAMBLE + PREFIX_SENTINEL}
+    ]
+
+
+def json_table_prefix_messages():
+    """요청마다 변하지 않는 JSON 표 추출 프롬프트의 앞부분"""
+    return [
+        {"role": "system", "content": JSON_TABLE_SYSTEM_PROMPT},
+        {"role": "user", "content": TABLE_USER_PREAMBLE + PREFIX_SENTINEL}
+    ]
+
+
+def render_prefix_ids(tokenizer, messages):
+    """PREFIX_SENTINEL 앞까지의 채팅 템플릿을 토큰화한다.
+
+    마지막 토큰은 뒤에 오는 텍스트와 합쳐져 다르게 토큰화될 수 있으므로 제외한다.
+    """
+    rendered = tokenizer.apply_chat_template(messages, tokenize=False)
+    prefix_text = rendered[:rendered.index(PREFIX_SENTINEL)]
+    ids = tokenizer(prefix_text, add_special_tokens=False)['input_ids']
+    return ids[:-1]
@@ -0,0 +1,69 @@
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+
+class Int4WeightOnlyLinear(nn.Module):
+    """그룹 단위 비대칭 4비트로 가중치를 저장하고 forward 때 복원해서 계산하는 Linear"""
+    def __init__(self, linear, group_size=128, compute_dtype=torch.float32):
+        super().__init__()
+        self.in_features = linear.in_features
+        self.out_features = linear.out_features
+        self.compute_dtype = compute_dtype
+        weight = linear.weight.detach().float()
+        if self.in_features % group_size:
+            group_size = self.in_features
+        self.group_size = group_size
+
+        groups = weight.reshape(self.out_features, -1, group_size)
+        w_min = groups.amin(dim=-1, keepdim=True)
+        w_max = groups.amax(dim=-1, keepdim=True)
+        scale = ((w_max - w_min) / 15).clamp(min=1e-8)
+        q = torch.clamp(torch.round((groups - w_min) / scale), 0, 15).to(torch.uint8)
+        q = q.reshape(self.out_features, self.in_features)
+        # 두 개의 4비트 값을 한 바이트에 담는다
+        self.register_buffer('packed_weight', q[:, 0::2] | (q[:, 1::2] << 4))
+        self.register_buffer('scale', scale.to(compute_dtype))
+        self.register_buffer('zero', w_min.to(compute_dtype))
+        if linear.bias is not None:
+            self.register_buffer('bias', linear.bias.detach().to(compute_dtype))
+        else:
+            self.bias = None
+
+    def dequantize(self):
+        low = self.packed_weight & 0x0F
+        high = self.packed_weight >> 4
+        q = torch.stack((low, high), dim=-1).reshape(self.out_features, -1, self.group_size)
+        weight = q.to(self.compute_dtype) * self.scale + self.zero
+        return weight.reshape(self.out_features, self.in_features)
+
+    def forward(self, x):
+        return F.linear(x.to(self.compute_dtype), self.dequantize(), self.bias)
+
+    def extra_repr(self):
+        return f"in_features={self.in_features}, out_features={self.out_features}, group_size={self.group_size}"
+
+
+def _int8_linear(linear):
+    linear = linear.float()
+    linear.qconfig = torch.ao.quantization.default_dynamic_qconfig
+    return torch.ao.nn.quantized.dynamic.Linear.from_float(linear)
+
+
+def quantize_linear_layers(model, mode, group_size=128):
+    """모델의 모든 nn.Linear 를 int8 동적 양자화 또는 int4 weight-only 양자화 모듈로 교체한다
+
+    한 번에 한 레이어씩 float32 로 바꿔 양자화하므로 전체 모델을 float32 로 올리지 않는다.
+    """
+    if mode == 'int8':
+        convert = _int8_linear
+    elif mode == 'int4':
+        convert = lambda linear: Int4WeightOnlyLinear(linear, group_size=group_size)
+    else:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child) is nn.Linear:
+                setattr(parent, name, convert(child))
+    return model
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def _copy_result(source, target):
+    """생성 Future 의 결과와 GPU 사용 시간을 캐시가 돌려준 Future 로 옮긴다"""
+    target.gpu_seconds = getattr(source, 'gpu_seconds', 0.0)
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class ResponseCache:
+    """생성 결과를 메모리 LRU(+선택적 디스크)에 저장하고 같은 요청은 한 번만 생성하는 캐시"""
+    def __init__(self, max_entries=1024, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_gpu_seconds = 0.0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_id, generation_kwargs, messages):
+        """모델, 생성 파라미터, 프롬프트(텍스트와 열 포함)로 캐시 키를 만든다"""
+        payload = json.dumps({
+            'model_id': model_id,
+            'generation_kwargs': generation_kwargs,
+            'messages': messages,
+        }, ensure_ascii=False, sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_or_submit(self, key, submit):
+        """캐시된 결과나 진행 중인 같은 요청의 Future를 반환하고, 없으면 submit()으로 생성한다"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._read_disk(key)
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._store(key, entry)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_gpu_seconds += entry['gpu_seconds']
+                future = Future()
+                future.set_result(entry['response'])
+                return future
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            self.misses += 1
+            future = Future()
+            self._in_flight[key] = future
+        future.add_done_callback(lambda f: self._complete(key, f))
+        # submit()은 모델 로드를 기다릴 수 있으므로 잠금 밖에서 호출한다
+        try:
+            submit().add_done_callback(lambda inner: _copy_result(inner, future))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                'saved_gpu_seconds': round(self.saved_gpu_seconds, 3),
+            }
+
+    def _complete(self, key, future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            entry = {'response': future.result(), 'gpu_seconds': getattr(future, 'gpu_seconds', 0.0)}
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing response cache file {path}: {e}")
+
+
+class CachingGenerator:
+    """결정적(greedy) 생성 요청에만 ResponseCache 를 적용하는 생성기 래퍼
+
+    샘플링 요청은 매번 다른 결과가 나와야 하므로 캐시를 거치지 않는다.
+    캐시를 거치는 생성은 같은 요청을 기다리는 다른 클라이언트와 공유되므로 cancel_token 으로 취소하지 않는다.
+    """
+    def __init__(self, backend, cache, model_id):
+        self.backend = backend
+        self.cache = cache
+        self.model_id = model_id
+
+    def submit(self, messages, **generation_kwargs):
+        if generation_kwargs.get('do_sample', False):
+            return self.backend.submit(messages, **generation_kwargs)
+        generation_kwargs.pop('cancel_token', None)
+        params = {k: v for k, v in generation_kwargs.items() if k != 'endpoint'}
+        key = self.cache.make_key(self.model_id, params, messages)
+        return self.cache.get_or_submit(key, lambda: self.backend.submit(messages, **generation_kwargs))
+
+    def generate(self, messages, timeout=None, **generation_kwargs):
+        return self.submit(messages, **generation_kwargs).result(timeout=timeout)
+
+    def stream(self, messages, **generation_kwargs):
+        return self.backend.stream(messages, **generation_kwargs)
@@ -0,0 +1,121 @@
+import threading
+import time
+
+DEFAULT_MODEL = 'default'
+
+
+class UnknownModel(ValueError):
+    """등록되지 않은 모델 이름을 요청했다 (400)"""
+
+
+def resolve_model(models, endpoint_models, endpoint=None, requested=None):
+    """요청의 model 값, 엔드포인트별 설정, 'default' 순서로 사용할 모델 이름을 고른다"""
+    name = requested or endpoint_models.get(endpoint) or DEFAULT_MODEL
+    if name not in models:
+        raise UnknownModel(f"Unknown model {name!r} (available: {', '.join(sorted(models))})")
+    return name
+
+
+class ModelRouter:
+    """엔드포인트나 요청마다 다른 모델로 보내는 생성기 (ModelRegistry 와 CachingGenerator 를 대신한다)
+
+    모델은 처음 요청될 때 불러오며, memory_budget_bytes 를 넘으면 처리 중인 요청이 없는 모델부터
+    가장 오래 쓰지 않은 순서로 내린다. 모델 크기는 한 번 불러온 뒤에야 알 수 있으므로
+    처음 불러오는 모델은 불러온 뒤에 예산을 맞춘다.
+    """
+    def __init__(self, registries, generators, endpoint_models=None, memory_budget_bytes=0):
+        self.registries = registries
+        self.generators = generators
+        self.endpoint_models = endpoint_models or {}
+        self.memory_budget_bytes = memory_budget_bytes
+        self._in_flight = {name: 0 for name in registries}
+        self._last_used = {name: 0.0 for name in registries}
+        self._lock = threading.Lock()
+
+    def resolve(self, endpoint=None, requested=None):
+        return resolve_model(self.registries, self.endpoint_models, endpoint, requested)
+
+    def start_background_load(self):
+        """기본 모델과 엔드포인트에 지정된 모델을 미리 불러온다"""
+        for name in {DEFAULT_MODEL, *self.endpoint_models.values()}:
+            if name in self.registries:
+                self._evict(keep=name, incoming=self.registries[name].memory_bytes or 0)
+                self.registries[name].start_background_load()
+
+    @property
+    def is_ready(self):
+        # 예산 때문에 내려간 기본 모델은 다음 요청에서 다시 불러오므로 준비된 것으로 본다
+        registry = self.registries[DEFAULT_MODEL]
+        return registry.is_ready or (registry.state == registry.STATE_IDLE and registry.memory_bytes is not None)
+
+    def status(self):
+        status = self.registries[DEFAULT_MODEL].status()
+        status['models'] = {
+            name: {
+                'model_id': registry.model_id,
+                'status': registry.state,
+                'model_memory_mb': round(registry.memory_bytes / 2 ** 20, 1) if registry.memory_bytes else None,
+                'in_flight': self._in_flight[name],
+            }
+            for name, registry in self.registries.items()
+        }
+        status['endpoint_models'] = self.endpoint_models
+        return status
+
+    def get_tokenizer(self, endpoint=None, model=None, timeout=None):
+        return self.registries[self.resolve(endpoint, model)].get_tokenizer(timeout)
+
+    def submit(self, messages, model=None, **generation_kwargs):
+        name = self._acquire(generation_kwargs.get('endpoint'), model)
+        try:
+            future = self.generators[name].submit(messages, **generation_kwargs)
+        except Exception:
+            self._release(name)
+            raise
+        future.add_done_callback(lambda f: self._release(name))
+        return future
+
+    def generate(self, messages, timeout=None, **generation_kwargs):
+        return self.submit(messages, **generation_kwargs).result(timeout=timeout)
+
+    def stream(self, messages, model=None, **generation_kwargs):
+        name = self._acquire(generation_kwargs.get('endpoint'), model)
+        try:
+            streamer, future = self.generators[name].stream(messages, **generation_kwargs)
+        except Exception:
+            self._release(name)
+            raise
+        future.add_done_callback(lambda f: self._release(name))
+        return streamer, future
+
+    def _acquire(self, endpoint, requested):
+        name = self.resolve(endpoint, requested)
+        registry = self.registries[name]
+        if not registry.is_ready:
+            self._evict(keep=name, incoming=registry.memory_bytes or 0)
+        with self._lock:
+            self._in_flight[name] += 1
+            self._last_used[name] = time.monotonic()
+        return name
+
+    def _release(self, name):
+        with self._lock:
+            self._in_flight[name] -= 1
+        # 처음 불러온 모델은 이때 크기를 알게 되므로 여기서 다시 예산을 맞춘다
+        self._evict(keep=name)
+
+    def _evict(self, keep, incoming=0):
+        if not self.memory_budget_bytes:
+            return
+        with self._lock:
+            loaded = [name for name, registry in self.registries.items() if registry.is_ready]
+            total = incoming + sum(self.registries[name].memory_bytes or 0 for name in loaded)
+            for name in sorted(loaded, key=lambda n: self._last_used[n]):
+                if total <= self.memory_budget_bytes:
+                    break
+                if name == keep or self._in_flight[name]:
+                    continue
+                registry = self.registries[name]
+                size = registry.memory_bytes or 0
+                if registry.unload():
+                    total -= size
@@ -0,0 +1,36 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import ExtractionJob, JobDocument
+
+
+class JobCreateSerializer(serializers.Serializer):
+    """작업 생성 요청: 문서 텍스트 목록과 추출할 열 목록"""
+    documents = serializers.ListField(child=serializers.CharField(allow_blank=True), allow_empty=False)
+    columns = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    output_format = serializers.ChoiceField(choices=['markdown', 'json'], required=False,
+                                            default=settings.AI_OUTPUT_FORMAT)
+
+
+class JobDocumentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JobDocument
+        fields = ('index', 'status', 'response', 'error', 'updated_at')
+
+
+class ExtractionJobSerializer(serializers.ModelSerializer):
+    status = serializers.CharField(read_only=True)
+    total = serializers.SerializerMethodField()
+    finished = serializers.SerializerMethodField()
+    documents = JobDocumentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ExtractionJob
+        fields = ('id', 'status', 'columns', 'output_format', 'created_at', 'total', 'finished', 'documents')
+
+    def get_total(self, job):
+        return len(job.documents.all())
+
+    def get_finished(self, job):
+        return sum(1 for document in job.documents.all()
+                   if document.status in (JobDocument.STATUS_COMPLETED, JobDocument.STATUS_FAILED))
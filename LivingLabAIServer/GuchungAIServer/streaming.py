@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+
+def stream_format(value):
+    """요청의 stream 값을 스트리밍 형식으로 변환 (스트리밍하지 않으면 None)"""
+    if value in (None, False, '', 'false', 'False', '0'):
+        return None
+    if value in STREAM_FORMATS:
+        return value
+    return 'ndjson'
+
+
+def _encode(event, fmt):
+    payload = json.dumps(event, ensure_ascii=False)
+    if fmt == 'sse':
+        return f"data: {payload}\n\n"
+    return payload + "\n"
+
+
+def _events(streamer, future, cancel_token=None):
+    """생성된 토큰 조각 이벤트 다음에 전체 응답 또는 오류 이벤트를 내보낸다
+
+    클라이언트가 연결을 끊어 응답이 중간에 닫히면(GeneratorExit) 생성을 취소한다.
+    """
+    finished = False
+    try:
+        for token in streamer:
+            if token:
+                yield {'token': token}
+        finished = True
+        try:
+            yield {'done': True, 'response': future.result()}
+        except Exception as e:
+            yield {'done': True, 'error': str(e)}
+    finally:
+        if not finished and cancel_token is not None:
+            cancel_token.cancel()
+
+
+async def _aevents(events):
+    """ASGI에서 버퍼링 없이 전송되도록 동기 이터레이터를 별도 스레드에서 소비한다"""
+    iterator = iter(events)
+    sentinel = object()
+    while True:
+        event = await sync_to_async(next, thread_sensitive=False)(iterator, sentinel)
+        if event is sentinel:
+            break
+        yield event
+
+
+def streaming_response(request, streamer, future, fmt, cancel_token=None):
+    """토큰을 생성되는 즉시 ndjson 또는 server-sent events로 보내는 응답"""
+    events = _events(streamer, future, cancel_token)
+    if isinstance(request, ASGIRequest):
+        async def content():
+            try:
+                async for event in _aevents(events):
+                    yield _encode(event, fmt)
+            except (GeneratorExit, asyncio.CancelledError):
+                # events 는 다른 스레드에서 실행 중일 수 있으므로 닫지 않고 토큰으로 취소한다
+                if cancel_token is not None:
+                    cancel_token.cancel()
+                raise
+    else:
+        def content():
+            try:
+                for event in events:
+                    yield _encode(event, fmt)
+            finally:
+                events.close()
+    response = StreamingHttpResponse(content(), content_type=STREAM_FORMATS[fmt])
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
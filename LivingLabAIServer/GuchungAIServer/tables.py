@@ -0,0 +1,93 @@
+import json
+import re
+
+MISSING_VALUES = ('', '-', 'none', 'null', 'n/a')
+
+
+def _normalize(name):
+    return re.sub(r'\s+', '', name).lower()
+
+
+def _is_missing(value):
+    return value is None or value.strip().lower() in MISSING_VALUES
+
+
+def parse_markdown_table(table_markdown):
+    """마크다운 표에서 헤더와 데이터 행을 꺼낸다 (구분선과 빈 행은 건너뛴다)"""
+    lines = [line.strip() for line in table_markdown.splitlines() if line.strip().startswith('|')]
+    if not lines:
+        return [], []
+    headers = [cell.strip() for cell in lines[0].strip('|').split('|')]
+    rows = []
+    for line in lines[1:]:
+        cells = [cell.strip() for cell in line.strip('|').split('|')]
+        if all(re.fullmatch(r':?-{2,}:?', cell) for cell in cells if cell):
+            continue
+        if all(_is_missing(cell) for cell in cells):
+            continue
+        rows.append(cells)
+    return headers, rows
+
+
+def align_rows(headers, rows, columns):
+    """헤더 이름이 같은 열끼리 맞춰 요청한 columns 순서의 dict 행으로 바꾼다"""
+    index = {_normalize(header): i for i, header in enumerate(headers)}
+    aligned = []
+    for cells in rows:
+        row = {}
+        for position, column in enumerate(columns):
+            i = index.get(_normalize(column))
+            if i is None and len(headers) == len(columns):
+                # 헤더 이름이 조금 달라도 열 수가 같으면 순서대로 맞춘다
+                i = position
+            row[column] = cells[i] if i is not None and i < len(cells) else '-'
+        aligned.append(row)
+    return aligned
+
+
+def merge_rows(rows, columns):
+    """중복 행을 없애고, 같은 사람의 부분 행(조각마다 일부 열만 채워진 행)을 합친다
+
+    부분 행은 충돌하는 값이 없고 비어 있지 않은 값이 하나 이상 같은 행에만 합친다.
+    겹치는 값이 없는 행은 다른 사람일 수 있으므로 따로 둔다.
+    """
+    merged = []
+    seen = set()
+    for row in rows:
+        values = {c: row[c].strip() for c in columns if not _is_missing(row[c])}
+        key = tuple(sorted(values.items()))
+        if key in seen:
+            continue
+        seen.add(key)
+        for existing in merged:
+            shared = [c for c in values if not _is_missing(existing[c])]
+            if shared and all(existing[c].strip() == values[c] for c in shared):
+                for c in values:
+                    if _is_missing(existing[c]):
+                        existing[c] = row[c]
+                break
+        else:
+            merged.append(dict(row))
+    return merged
+
+
+def render_markdown_table(columns, rows):
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "| " + " | ".join('---' for _ in columns) + " |",
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(row.get(c) or '-' for c in columns) + " |")
+    return "\n".join(lines)
+
+
+def parse_json_rows(text, columns):
+    """JSON 배열(또는 객체) 응답을 columns 순서의 dict 행으로 바꾼다"""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = [data]
+    return [{c: str(row.get(c, '-')) for c in columns} for row in data if isinstance(row, dict)]
+
+
+def render_json_rows(columns, rows):
+    return json.dumps([{c: row.get(c) or '-' for c in columns} for row in rows], ensure_ascii=False)
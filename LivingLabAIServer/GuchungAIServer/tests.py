@@ -1,3 +1,207 @@
-from django.test import TestCase
+import json
+import pickle
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import cancellation, model_registry
+from .admission import Overloaded, QueueFull, endpoint_priority
+from .cancellation import CancelToken, GenerationCancelled
+from .chunking import may_need_chunking, needs_chunking, split_into_chunks
+from .json_constraint import JsonTableConstraint
+from .tables import align_rows, merge_rows, parse_markdown_table, render_markdown_table
+
+EOS = -1
+
+
+class CharVocabulary:
+    """문자 하나가 토큰 하나인 JsonVocabulary 대용 (토크나이저 없이 상태 기계만 확인한다)"""
+    quote_id = ord('"')
+    comma_id = ord(',')
+    close_id = ord(']')
+    row_close_ids = [ord('}')]
+
+    def encode(self, text):
+        return [ord(c) for c in text]
+
+
+def generate_json(columns, max_new_tokens, seed, max_value_tokens=8):
+    """제약이 허용하는 토큰 중 무작위로 골라 max_new_tokens 까지 생성한 문자열"""
+    rng = random.Random(seed)
+    constraint = JsonTableConstraint(CharVocabulary(), columns, EOS, max_new_tokens=max_new_tokens,
+                                     max_value_tokens=max_value_tokens)
+    output = []
+    for _ in range(max_new_tokens):
+        kind, ids = constraint.allowed()
+        if kind == 'value':
+            token = ord('"') if rng.random() < 0.1 else ord(rng.choice('가나다abc'))
+        elif kind == 'choice':
+            token = ids[0] if rng.random() < 0.9 else ids[1]
+        else:
+            token = ids[0]
+        if token == EOS:
+            break
+        output.append(token)
+        constraint.advance(token)
+    return ''.join(chr(token) for token in output)
+
+
+class JsonTableConstraintTests(SimpleTestCase):
+    def test_output_parses_for_any_budget(self):
+        columns = [f'열{i}' for i in range(10)]
+        for max_new_tokens in range(14, 400, 7):
+            for seed in range(5):
+                text = generate_json(columns, max_new_tokens, seed)
+                rows = json.loads(text)
+                self.assertIsInstance(rows, list)
+                for row in rows:
+                    self.assertLessEqual(set(row), set(columns))
+
+    def test_keys_follow_column_order(self):
+        rows = json.loads(generate_json(['성명', '주소'], 200, 0))
+        self.assertEqual([list(row) for row in rows], [['성명', '주소']] * len(rows))
+
+    def test_value_length_is_capped(self):
+        rows = json.loads(generate_json(['a'], 200, 1, max_value_tokens=3))
+        self.assertTrue(all(len(row['a']) <= 3 for row in rows))
+
+    def test_eos_is_forced_after_close(self):
+        constraint = JsonTableConstraint(CharVocabulary(), ['a'], EOS, max_new_tokens=100)
+        for token in '[{"a": "x"}]':
+            constraint.advance(ord(token))
+        self.assertEqual(constraint.allowed(), ('forced', [EOS]))
+
+
+class WordTokenizer:
+    """공백으로 나눈 단어 하나를 토큰 하나로 세는 토크나이저"""
+    def __call__(self, text, add_special_tokens=True):
+        return {'input_ids': text.split()}
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_pages_are_packed_up_to_the_limit(self):
+        pages = ['a b c', 'd e', 'f g h i', '', 'j']
+        self.assertEqual(split_into_chunks(WordTokenizer(), pages, 5), ['a b c\nd e', 'f g h i\nj'])
+
+    def test_long_page_is_split_on_lines(self):
+        page = 'a b c\nd e f\ng h'
+        self.assertEqual(split_into_chunks(WordTokenizer(), [page], 4), ['a b c', 'd e f', 'g h'])
+
+    def test_byte_length_check_skips_short_text(self):
+        self.assertFalse(may_need_chunking('짧은 글', 100))
+        self.assertTrue(may_need_chunking('가' * 40, 100))
+        self.assertFalse(needs_chunking(WordTokenizer(), '가 ' * 40, 100))
+
+
+class TableMergeTests(SimpleTestCase):
+    columns = ['성명', '주소', '연락처']
+
+    def test_partial_rows_from_chunks_are_merged(self):
+        rows = [
+            {'성명': '홍길동', '주소': '-', '연락처': '-'},
+            {'성명': '홍길동', '주소': '대전', '연락처': ''},
+            {'성명': '-', '주소': '대전', '연락처': '010'},
+        ]
+        self.assertEqual(merge_rows(rows, self.columns), [{'성명': '홍길동', '주소': '대전', '연락처': '010'}])
+
+    def test_partial_rows_without_shared_values_are_kept_apart(self):
+        # 두 번째 사람의 연락처만 있는 조각 행이 첫 번째 사람에게 합쳐지면 안 된다
+        rows = [
+            {'성명': '홍길동', '주소': '대전', '연락처': '-'},
+            {'성명': '-', '주소': '-', '연락처': '010'},
+            {'성명': '김이름', '주소': '-', '연락처': '-'},
+        ]
+        self.assertEqual(merge_rows(rows, self.columns), rows)
+
+    def test_duplicate_rows_are_removed(self):
+        row = {'성명': '홍길동', '주소': '대전', '연락처': '010'}
+        self.assertEqual(merge_rows([row, dict(row, 주소=' 대전 '), dict(row)], self.columns), [row])
+
+    def test_conflicting_rows_are_kept(self):
+        rows = [{'성명': '홍길동', '주소': '대전', '연락처': '-'}, {'성명': '김이름', '주소': '대전', '연락처': '-'}]
+        self.assertEqual(len(merge_rows(rows, self.columns)), 2)
+
+    def test_markdown_round_trip(self):
+        text = render_markdown_table(self.columns, [{'성명': '홍길동', '주소': '대전', '연락처': None}])
+        headers, cells = parse_markdown_table(text)
+        self.assertEqual(align_rows(headers, cells, self.columns),
+                         [{'성명': '홍길동', '주소': '대전', '연락처': '-'}])
+
+    def test_headers_are_matched_by_name(self):
+        rows = align_rows(['연락처', '성 명'], [['010', '홍길동']], self.columns)
+        self.assertEqual(rows, [{'성명': '홍길동', '주소': '-', '연락처': '010'}])
+
+
+class AdmissionTests(SimpleTestCase):
+    def test_retry_after_is_rounded_up_to_whole_seconds(self):
+        self.assertEqual(Overloaded('busy', 2.1).retry_after, 3)
+        self.assertEqual(Overloaded('busy', 4).retry_after, 4)
+
+    def test_retry_after_is_at_least_one_second(self):
+        self.assertEqual(Overloaded('busy', 0).retry_after, 1)
+        self.assertEqual(QueueFull('full', 0.2).retry_after, 1)
+
+    def test_retry_after_survives_pickling(self):
+        # 추론 프로세스에서 Django 워커로 보낼 때도 Retry-After 값을 유지해야 한다
+        error = pickle.loads(pickle.dumps(QueueFull('full', 7)))
+        self.assertIsInstance(error, QueueFull)
+        self.assertEqual(error.retry_after, 7)
+
+    def test_endpoint_priority(self):
+        priorities = {'columns': 0, 'table': 1}
+        self.assertEqual(endpoint_priority(priorities, 'columns'), 0)
+        self.assertEqual(endpoint_priority(priorities, 'table'), 1)
+        # 설정에 없는 엔드포인트는 가장 나중
+        self.assertEqual(endpoint_priority(priorities, 'ai'), 2)
+        self.assertEqual(endpoint_priority({}, 'ai'), 1)
+
+
+class CancelTokenTests(SimpleTestCase):
+    def test_first_reason_wins_and_callbacks_run_once(self):
+        token = CancelToken()
+        reasons = []
+        token.add_callback(reasons.append)
+        token.cancel()
+        token.cancel(CancelToken.DEADLINE)
+        self.assertTrue(token.cancelled)
+        self.assertEqual(token.reason, CancelToken.CLIENT_DISCONNECTED)
+        self.assertEqual(reasons, [CancelToken.CLIENT_DISCONNECTED])
+
+    def test_callback_added_after_cancel_runs_immediately(self):
+        token = CancelToken()
+        token.cancel(CancelToken.DEADLINE)
+        reasons = []
+        token.add_callback(reasons.append)
+        self.assertEqual(reasons, [CancelToken.DEADLINE])
+
+    def test_deadline(self):
+        with mock.patch.object(cancellation.time, 'monotonic', return_value=100.0):
+            token = CancelToken(timeout=5)
+            self.assertFalse(token.cancelled)
+            self.assertEqual(token.remaining(), 5.0)
+        with mock.patch.object(cancellation.time, 'monotonic', return_value=106.0):
+            self.assertEqual(token.reason, CancelToken.DEADLINE)
+            self.assertEqual(token.remaining(), 0.0)
+
+    def test_no_timeout_never_expires(self):
+        token = CancelToken()
+        self.assertIsNone(token.remaining())
+        self.assertFalse(token.cancelled)
+
+    def test_cancelled_error_survives_pickling(self):
+        error = pickle.loads(pickle.dumps(GenerationCancelled(CancelToken.DEADLINE)))
+        self.assertEqual(error.reason, CancelToken.DEADLINE)
+
+
+class StaticCacheVersionTests(SimpleTestCase):
+    def registry(self, installed):
+        with mock.patch.object(model_registry, 'version', return_value=installed):
+            return model_registry.ModelRegistry('model', static_cache=True)
+
+    def test_old_transformers_disables_static_cache(self):
+        self.assertFalse(self.registry('4.40.0').static_cache)
+
+    def test_supported_transformers_keeps_static_cache(self):
+        self.assertTrue(self.registry('4.42.4').static_cache)
+        self.assertTrue(self.registry('4.45.0.dev0').static_cache)
@@ -1,114 +1,316 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import torch
-import os
-from transformers import AutoTokenizer, AutoModelForCausalLM
-
-os.environ['HF_HOME'] = '/home/swsong/Guchung/.cache/huggingface'
-os.environ['CUDA_VISIBLE_DEVICES'] = '0'
-model_id = 'MLP-KTLim/llama-3-Korean-Bllossom-8B'
-tokenizer = AutoTokenizer.from_pretrained(model_id)
-model = AutoModelForCausalLM.from_pretrained(
-    model_id,
-    torch_dtype=torch.bfloat16,
-    device_map="auto",
-)
-model.eval()
+from django.conf import settings
+from django.http import HttpResponse
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from . import metrics
+from .admission import ModelNotReady, Overloaded, QueueFull
+from .cancellation import CancelToken, GenerationCancelled, client_disconnected
+from .routing import UnknownModel
+from .inference import InferenceClient, local_backend
+from .jobs import JobWorker, create_job
+from .models import ExtractionJob
+from .serializers import ExtractionJobSerializer, JobCreateSerializer
+from .streaming import stream_format, streaming_response
+from .prompts import build_column_messages, build_json_table_messages, build_table_messages
+from .chunking import may_need_chunking, needs_chunking, split_into_chunks
+from .tables import (align_rows, merge_rows, parse_json_rows, parse_markdown_table, render_json_rows,
+                     render_markdown_table)
+
+if settings.AI_INFERENCE_SOCKET:
+    # 모델은 manage.py runinference 프로세스 하나에만 올리고 모든 HTTP 워커가 소켓으로 공유한다
+    registry = response_cache = generator = InferenceClient(settings.AI_INFERENCE_SOCKET, settings.AI_MODELS,
+                                                            settings.AI_ENDPOINT_MODELS, hf_home=settings.AI_HF_HOME)
+else:
+    registry, response_cache, generator = local_backend()
+
+GENERATION_KWARGS = {
+    'max_new_tokens': 256,
+    'do_sample': True,
+    'temperature': 0.6,
+    'top_p': 0.9,
+    'repetition_penalty': 1.1,
+}
+
+# 같은 입력에 항상 같은 결과를 내는 greedy 디코딩 (응답 캐시 대상)
+DETERMINISTIC_GENERATION_KWARGS = {
+    'max_new_tokens': 256,
+    'do_sample': False,
+    'repetition_penalty': 1.1,
+}
+
+
+def request_flag(request, name, default):
+    """요청의 참/거짓 값 (form 이나 문자열로 온 "false", "0" 도 거짓으로 읽는다)"""
+    value = request.data.get(name, default)
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def generation_kwargs(request, endpoint, speculative='none'):
+    """요청의 deterministic 값(없으면 AI_DETERMINISTIC)과 뷰의 추측 디코딩 설정에 따라 생성 파라미터를 고른다
+
+    endpoint 는 지표의 라벨과 모델 선택(AI_ENDPOINT_MODELS)에 쓰이고, 요청의 model 값이 있으면 그 모델을 쓴다.
+    """
+    deterministic = request_flag(request, 'deterministic', settings.AI_DETERMINISTIC)
+    kwargs = DETERMINISTIC_GENERATION_KWARGS if deterministic else GENERATION_KWARGS
+    kwargs = dict(kwargs, endpoint=endpoint)
+    if request.data.get('model'):
+        kwargs['model'] = request.data['model']
+    if speculative != 'none':
+        kwargs['speculative'] = speculative
+    return kwargs
+
+
+# 결과를 기다리는 동안 클라이언트 연결이 끊겼는지 확인하는 간격 (초)
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+def new_cancel_token():
+    """AI_GENERATION_DEADLINE_SECONDS 가 지나거나 클라이언트 연결이 끊기면 생성을 멈추는 토큰"""
+    return CancelToken(settings.AI_GENERATION_DEADLINE_SECONDS)
+
+
+def wait_for_result(request, future, cancel_token):
+    """결과를 기다리며 클라이언트 연결이 끊겼으면 생성을 취소한다"""
+    while True:
+        try:
+            return future.result(timeout=DISCONNECT_POLL_SECONDS)
+        except FutureTimeoutError:
+            if not cancel_token.cancelled and client_disconnected(request):
+                cancel_token.cancel(CancelToken.CLIENT_DISCONNECTED)
+
+
+def cancelled_response(error):
+    """마감 시간이 지났으면 504, 클라이언트가 끊었으면 499 (nginx 와 같은 관례)"""
+    code = status.HTTP_504_GATEWAY_TIMEOUT if error.reason == CancelToken.DEADLINE else 499
+    return Response({'error': str(error)}, status=code)
+
+
+def overloaded_response(error):
+    """대기열이 가득 찼으면 429, 최대 대기 시간을 넘겼으면 503 과 Retry-After 를 돌려준다"""
+    code = status.HTTP_429_TOO_MANY_REQUESTS if isinstance(error, QueueFull) else status.HTTP_503_SERVICE_UNAVAILABLE
+    return Response({'error': str(error), 'retry_after': error.retry_after}, status=code,
+                    headers={'Retry-After': str(error.retry_after)})
+
+
+def table_generation(text, columns, output_format, kwargs):
+    """출력 형식에 맞는 메시지와 생성 파라미터
+
+    json 형식은 logits 제약으로 열 이름을 키로 하는 JSON 배열만 생성한다.
+    구조 토큰이 반복되므로 repetition_penalty 는 적용하지 않고, 매 행 생성되는 키 때문에
+    max_new_tokens 를 열 수에 맞춰 늘린다 (그래도 모자라면 제약이 배열을 닫는다).
+    """
+    if output_format == 'json':
+        kwargs = {k: v for k, v in kwargs.items() if k != 'repetition_penalty'}
+        kwargs['max_new_tokens'] = max(kwargs.get('max_new_tokens', 256),
+                                       settings.AI_JSON_TOKENS_PER_COLUMN * len(columns))
+        kwargs['json_columns'] = tuple(columns)
+        return build_json_table_messages(text, columns), kwargs
+    return build_table_messages(text, columns), kwargs
+
+
+def chunking_tokenizer(request, text):
+    """텍스트를 AI_CHUNK_MAX_TOKENS 조각으로 나눠야 하면 토크나이저, 아니면 None
+
+    바이트 수로 보아 넘을 수 없는 텍스트는 토큰화하지 않는다. 모델이 AI_MAX_QUEUE_WAIT_SECONDS 안에
+    준비되지 않으면 기다리지 않고 ModelNotReady(503)를 던진다.
+    """
+    if not may_need_chunking(text, settings.AI_CHUNK_MAX_TOKENS):
+        return None
+    try:
+        tokenizer = registry.get_tokenizer('response', request.data.get('model'),
+                                           timeout=settings.AI_MAX_QUEUE_WAIT_SECONDS)
+    except TimeoutError:
+        raise ModelNotReady("Model is still loading", retry_after=settings.AI_MAX_QUEUE_WAIT_SECONDS)
+    return tokenizer if needs_chunking(tokenizer, text, settings.AI_CHUNK_MAX_TOKENS) else None
+
+
+def extract_table_chunked(request, chunks, columns, output_format, kwargs, cancel_token):
+    """조각별로 표를 추출(스케줄러가 한 배치로 묶음)한 뒤 하나의 표로 합친다 (취소되면 모든 조각이 멈춘다)"""
+    futures = []
+    for chunk in chunks:
+        messages, chunk_kwargs = table_generation(chunk, columns, output_format, kwargs)
+        futures.append(generator.submit(messages, cancel_token=cancel_token, **chunk_kwargs))
+    rows = []
+    for future in futures:
+        response_text = wait_for_result(request, future, cancel_token)
+        if output_format == 'json':
+            rows.extend(parse_json_rows(response_text, columns))
+        else:
+            headers, cells = parse_markdown_table(response_text)
+            rows.extend(align_rows(headers, cells, columns))
+    merged = merge_rows(rows, columns)
+    if output_format == 'json':
+        return render_json_rows(columns, merged)
+    return render_markdown_table(columns, merged)
+
+
+job_worker = JobWorker(generator,
+                       dict(DETERMINISTIC_GENERATION_KWARGS if settings.AI_DETERMINISTIC else GENERATION_KWARGS,
+                            endpoint='job'),
+                       table_generation,
+                       max_in_flight=settings.AI_JOB_MAX_IN_FLIGHT,
+                       lease_seconds=settings.AI_JOB_LEASE_SECONDS)
+
+MODEL_READY = metrics.METRICS.gauge('ai_model_ready', '1 when the model is loaded and warmed up.')
+CACHE_LOOKUPS = metrics.METRICS.gauge('ai_response_cache_lookups', 'Response cache lookups by result.', ['result'])
+CACHE_SAVED_SECONDS = metrics.METRICS.gauge('ai_response_cache_saved_gpu_seconds',
+                                            'GPU seconds saved by response cache hits.')
+
+
+@metrics.METRICS.on_collect
+def _collect_server_state():
+    MODEL_READY.set(1 if registry.is_ready else 0)
+    stats = response_cache.stats()
+    for result in ('hits', 'disk_hits', 'misses', 'coalesced'):
+        CACHE_LOOKUPS.set(stats[result], result=result)
+    CACHE_SAVED_SECONDS.set(stats['saved_gpu_seconds'])
+
+
+def metrics_view(request):
+    """Prometheus 가 수집하는 지표 (text exposition format)
+
+    추론 프로세스를 따로 띄운 경우 그 프로세스의 생성 지표를 이어 붙인다.
+    """
+    body = metrics.METRICS.render()
+    if isinstance(generator, InferenceClient):
+        try:
+            body += generator.render_metrics()
+        except Exception as e:
+            print(f"Error collecting inference server metrics: {e}")
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class HealthView(APIView):
+    """모델 로드 상태를 반환하는 readiness API (준비 전에는 503)"""
+    def get(self, request):
+        code = status.HTTP_200_OK if registry.is_ready else status.HTTP_503_SERVICE_UNAVAILABLE
+        return Response(registry.status(), status=code)
+
+
+class CacheStatsView(APIView):
+    """응답 캐시 적중률과 절약된 GPU 시간을 반환하는 API"""
+    def get(self, request):
+        return Response(response_cache.stats(), status=status.HTTP_200_OK)
+
 
 class AIColumnsView(APIView):
     """텍스트에서 열 제목을 추출하여 반환하는 API"""
+    @metrics.instrumented('columns')
     def post(self, request):
         try:
             text = request.data.get('text')
 
-            messages = [
-                {"role": "system", "content": (
-                    "You are a skilled data analyst. Extract and return the most relevant column names from the provided text. "
-                    "Ensure that the column names are concise, relevant, and free of typographical errors. "
-                    "The column names should be in Korean and should match the data context exactly."
-                    "Don't leave a note, just show a response"
-                )},
-                {"role": "user", "content": f"{text}"}
-            ]
-
-            input_ids = tokenizer.apply_chat_template(
-                messages,
-                add_generation_prompt=True,
-                return_tensors="pt"
-            ).to(model.device)
-
-            terminators = [
-                tokenizer.eos_token_id,
-                tokenizer.convert_tokens_to_ids("<|eot_id|>")
-            ]
-
-            outputs = model.generate(
-                input_ids,
-                max_new_tokens=256,
-                eos_token_id=terminators,
-                do_sample=True,
-                temperature=0.6,
-                top_p=0.9,
-                repetition_penalty=1.1
-            )
-
-            response_text = tokenizer.decode(outputs[0][input_ids.shape[-1]:], skip_special_tokens=True)
+            messages = build_column_messages(text)
+
+            cancel_token = new_cancel_token()
+            future = generator.submit(messages, cancel_token=cancel_token,
+                                      **generation_kwargs(request, 'columns', settings.AI_COLUMNS_SPECULATIVE))
+            response_text = wait_for_result(request, future, cancel_token)
 
             return Response({'response': response_text}, status=status.HTTP_200_OK)
 
+        except Overloaded as e:
+            return overloaded_response(e)
+
+        except GenerationCancelled as e:
+            return cancelled_response(e)
+
+        except UnknownModel as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class AIResponseView(APIView):
-    """텍스트와 열 정보를 기반으로 표 데이터를 추출하는 API"""
+    """텍스트와 열 정보를 기반으로 표 데이터를 추출하는 API
+
+    stream 값을 true(또는 'ndjson') / 'sse'로 보내면 생성되는 토큰을 즉시 스트리밍한다.
+    deterministic 을 true 로 보내면 greedy 디코딩을 사용하고 같은 요청은 캐시된 결과를 돌려준다.
+    output_format 을 'json' 으로 보내면 columns 를 키로 하는 JSON 배열로 응답한다.
+    텍스트가 AI_CHUNK_MAX_TOKENS 보다 길면 pages(페이지별 텍스트) 경계에서 나눠 조각별로 추출한 뒤 합친다.
+    클라이언트 연결이 끊기거나 AI_GENERATION_DEADLINE_SECONDS 가 지나면 생성을 중단한다.
+    """
+    @metrics.instrumented('response')
     def post(self, request):
         try:
             text = request.data.get('text')
             columns = request.data.get('columns')
 
-            messages = [
-                {"role": "system", "content": (
-                    "You are an AI that extracts structured information from text. "
-                    "Please convert the following information into a well-formatted table with rows and columns aligned correctly. "
-                    "Ensure that all columns and rows are represented correctly. "
-                    "and handle cases where multiple spaces or irregular spacing occurs by treating it as a single space. "
-                    "If multiple pieces of information, such as bank name and account number, are in one cell, separate them into different columns. "
-                    "Combine similar or identical column headers into one column, and fill in missing data with '-'. "
-                    "Do not leave notes in the response, just return the formatted table."
-                    )},
-                {"role": "user", "content": (
-                        "Here is the text with information that needs to be converted into a table. "
-                        "The table should have the following columns: " + ', '.join(columns) + ".\n\n" + text
-                )}
-            ]
-
-            input_ids = tokenizer.apply_chat_template(
-                messages,
-                add_generation_prompt=True,
-                return_tensors="pt"
-            ).to(model.device)
-
-            terminators = [
-                tokenizer.eos_token_id,
-                tokenizer.convert_tokens_to_ids("<|eot_id|>")
-            ]
-
-            outputs = model.generate(
-                input_ids,
-                max_new_tokens=256,
-                eos_token_id=terminators,
-                do_sample=True,
-                temperature=0.6,
-                top_p=0.9,
-                repetition_penalty=1.1
-            )
-
-            response_text = tokenizer.decode(outputs[0][input_ids.shape[-1]:], skip_special_tokens=True)
+            output_format = request.data.get('output_format', settings.AI_OUTPUT_FORMAT)
+            base_kwargs = generation_kwargs(request, 'response', settings.AI_RESPONSE_SPECULATIVE)
+            messages, kwargs = table_generation(text, columns, output_format, base_kwargs)
+
+            fmt = stream_format(request.data.get('stream'))
+            pages = request.data.get('pages') or [text]
+            chunked = request_flag(request, 'chunked', True)
+            cancel_token = new_cancel_token()
+            tokenizer = None if fmt or not chunked else chunking_tokenizer(request, text)
+            if tokenizer is not None:
+                chunks = split_into_chunks(tokenizer, pages, settings.AI_CHUNK_MAX_TOKENS)
+                response_text = extract_table_chunked(request, chunks, columns, output_format, base_kwargs, cancel_token)
+                return Response({'response': response_text, 'chunks': len(chunks)}, status=status.HTTP_200_OK)
+
+            if fmt:
+                streamer, future = generator.stream(messages, cancel_token=cancel_token, **kwargs)
+                return streaming_response(request._request, streamer, future, fmt, cancel_token)
+
+            future = generator.submit(messages, cancel_token=cancel_token, **kwargs)
+            response_text = wait_for_result(request, future, cancel_token)
 
             return Response({'response': response_text}, status=status.HTTP_200_OK)
 
+        except Overloaded as e:
+            return overloaded_response(e)
+
+        except GenerationCancelled as e:
+            return cancelled_response(e)
+
+        except UnknownModel as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class JobCreateView(APIView):
+    """여러 문서의 표 추출 작업을 등록하고 작업 id를 바로 반환하는 API"""
+    @metrics.instrumented('jobs')
+    def post(self, request):
+        serializer = JobCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        job = create_job(serializer.validated_data['documents'], serializer.validated_data['columns'],
+                         serializer.validated_data['output_format'])
+        job_worker.notify()
+
+        return Response({'id': str(job.id), 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+class JobDetailView(APIView):
+    """작업 상태와 문서별 결과를 반환하는 API
+
+    wait=<초>를 주면 작업이 끝나거나 시간이 다 될 때까지 기다렸다가 응답한다 (롱 폴링).
+    """
+    def get(self, request, job_id):
+        try:
+            job = ExtractionJob.objects.get(pk=job_id)
+        except ExtractionJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), settings.AI_JOB_MAX_WAIT_SECONDS)
+        except ValueError:
+            return Response({'error': 'wait must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        deadline = time.monotonic() + wait
+        while job.status != 'completed' and time.monotonic() < deadline:
+            job_worker.wait_for_update(min(1.0, deadline - time.monotonic()))
+
+        return Response(ExtractionJobSerializer(job).data, status=status.HTTP_200_OK)
@@ -0,0 +1,36 @@
+"""벤치마크들이 함께 쓰는 입력: 데스크톱 클라이언트의 OCR 캐시 JSON 과 열 제목 캐시"""
+import glob
+import hashlib
+import json
+import os
+
+OCR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'OCR')
+FIXTURES_DIR = os.path.join(OCR_DIR, 'cache')
+GPT_CACHE_DIR = os.path.join(OCR_DIR, 'gpt_cache')
+
+DEFAULT_COLUMNS = ['성명', '보훈번호', '생년월일', '성별', '주소', '연락처', '은행', '계좌번호']
+
+
+def load_pages(fixtures):
+    """OCR 캐시 JSON 마다 페이지별 텍스트 목록"""
+    documents = []
+    for path in sorted(glob.glob(os.path.join(fixtures, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        documents.append([page.get('text', '') for page in data.get('pages', [])])
+    return documents
+
+
+def load_texts(fixtures):
+    """OCR 캐시 JSON 마다 클라이언트가 AI 서버에 보내는 것과 같은 텍스트 (페이지를 공백으로 이은 것)"""
+    return [" ".join(pages) for pages in load_pages(fixtures)]
+
+
+def load_columns(gpt_cache, text):
+    """클라이언트가 text 로 받아 둔 열 제목 (캐시 키는 텍스트의 md5), 없으면 DEFAULT_COLUMNS"""
+    path = os.path.join(gpt_cache, f"{hashlib.md5(text.encode()).hexdigest()}.json")
+    if not os.path.exists(path):
+        return DEFAULT_COLUMNS
+    with open(path, 'r', encoding='utf-8') as f:
+        columns = [c.strip() for c in json.load(f).get('column_names', '').split(',') if c.strip()]
+    return columns or DEFAULT_COLUMNS
@@ -0,0 +1,100 @@
+"""CPU 백엔드에서 양자화 방식별 tokens/s 와 최대 RSS 비교
+
+모드마다 별도 프로세스에서 모델을 불러오므로 최대 RSS 가 서로 섞이지 않는다.
+
+사용 예:
+    python benchmarks/cpu_quantization.py --modes none int8 int4 --threads 8 --new-tokens 64
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from _fixtures import DEFAULT_COLUMNS, FIXTURES_DIR, load_texts  # noqa: E402
+
+def peak_rss_mb():
+    # Linux 의 ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_text(fixtures):
+    texts = load_texts(fixtures)
+    if not texts:
+        return "성명 홍길동 보훈번호 123456 연락처 010-0000-0000 주소 대전광역시 유성구"
+    return texts[0]
+
+
+def run_single(args):
+    """한 가지 양자화 방식으로 측정하고 결과를 JSON 한 줄로 출력"""
+    import torch
+    from GuchungAIServer.loading import load_model
+    from GuchungAIServer.prompts import build_table_messages
+
+    start = time.perf_counter()
+    model, tokenizer = load_model(args.model_id, device='cpu', quantization=args.mode, num_threads=args.threads)
+    load_seconds = time.perf_counter() - start
+
+    input_ids = tokenizer.apply_chat_template(
+        build_table_messages(load_text(args.fixtures), DEFAULT_COLUMNS),
+        add_generation_prompt=True,
+        return_tensors="pt"
+    )
+    with torch.no_grad():
+        model.generate(input_ids, max_new_tokens=2, do_sample=False)
+        start = time.perf_counter()
+        outputs = model.generate(input_ids, max_new_tokens=args.new_tokens, min_new_tokens=args.new_tokens,
+                                 do_sample=False)
+        elapsed = time.perf_counter() - start
+    new_tokens = outputs.shape[-1] - input_ids.shape[-1]
+
+    print(json.dumps({
+        'mode': args.mode,
+        'threads': torch.get_num_threads(),
+        'load_seconds': load_seconds,
+        'prompt_tokens': input_ids.shape[-1],
+        'new_tokens': new_tokens,
+        'tokens_per_second': new_tokens / elapsed,
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-id', default='MLP-KTLim/llama-3-Korean-Bllossom-8B')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--modes', nargs='+', default=['none', 'int8', 'int4'])
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--new-tokens', type=int, default=64)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_single(args)
+        return
+
+    results = []
+    for mode in args.modes:
+        command = [sys.executable, os.path.abspath(__file__), '--mode', mode,
+                   '--model-id', args.model_id, '--fixtures', args.fixtures,
+                   '--threads', str(args.threads), '--new-tokens', str(args.new_tokens)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"[{mode}] failed:\n{completed.stderr}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    baseline = next((r for r in results if r['mode'] == 'none'), None)
+    print(f"{'mode':<6}{'threads':>8}{'load (s)':>10}{'tokens/s':>10}{'speed-up':>10}{'peak RSS (MB)':>15}")
+    for r in results:
+        speedup = r['tokens_per_second'] / baseline['tokens_per_second'] if baseline else float('nan')
+        print(f"{r['mode']:<6}{r['threads']:>8}{r['load_seconds']:>10.1f}{r['tokens_per_second']:>10.2f}"
+              f"{speedup:>9.2f}x{r['peak_rss_mb']:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""OCR 캐시 JSON 으로 만든 요청을 두 API 에 동시에 보내 지연 시간과 처리량을 측정하는 부하 테스트
+
+--url 을 주지 않으면 작은 무작위 가중치 모델(AI_STUB_MODEL)을 쓰는 CPU 서버를 직접 띄우므로
+GPU 와 8B 가중치 없이 뷰와 스케줄링 경로의 변경 전후를 비교할 수 있다.
+tokens/s 는 서버의 /metrics 에서 ai_output_tokens_total 의 증가량으로 계산한다.
+
+사용 예:
+    python benchmarks/loadtest.py --concurrency 8 --requests 200
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --endpoints response --concurrency 4
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from _fixtures import FIXTURES_DIR, GPT_CACHE_DIR, load_columns, load_pages
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    'columns': '/api/get-ai-column-response/',
+    'response': '/api/get-ai-response/',
+}
+
+
+def load_payloads(fixtures, gpt_cache):
+    """OCR 캐시 JSON 마다 (열 추출 요청, 표 추출 요청) 본문을 만든다 (열은 gpt_cache 에 있으면 그 값을 쓴다)"""
+    payloads = []
+    for pages in load_pages(fixtures):
+        text = " ".join(pages)
+        columns = load_columns(gpt_cache, text)
+        payloads.append({
+            'columns': {'text': text},
+            'response': {'text': text, 'columns': columns, 'pages': pages},
+        })
+    return payloads
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    """무작위 가중치 모델을 쓰는 CPU 개발 서버를 띄우고 모델이 준비될 때까지 기다린다"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        AI_STUB_MODEL='true',
+        AI_DEVICE='cpu',
+        AI_PRELOAD_MODEL='true',
+        AI_MAX_QUEUE_SIZE=str(args.max_queue_size),
+    )
+    if args.model_id:
+        env['AI_MODEL_ID'] = args.model_id
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+        cwd=SERVER_DIR, env=env,
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(url + '/api/health/', timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server was not ready within {args.startup_timeout}s")
+
+
+def output_tokens(url):
+    """/metrics 의 엔드포인트별 ai_output_tokens_total 합"""
+    try:
+        text = requests.get(url + '/metrics', timeout=5).text
+    except requests.RequestException:
+        return None
+    return sum(float(value) for value in re.findall(r'^ai_output_tokens_total\{[^}]*\} (\S+)$', text, re.M))
+
+
+def percentile(samples, q):
+    if not samples:
+        return float('nan')
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+
+def send(url, endpoint, payload, timeout):
+    start = time.perf_counter()
+    try:
+        response = requests.post(url + ENDPOINTS[endpoint], json=payload, timeout=timeout)
+        status_code = response.status_code
+    except requests.RequestException:
+        status_code = 'error'
+    return endpoint, status_code, time.perf_counter() - start
+
+
+def run(url, payloads, args):
+    jobs = []
+    for i in range(args.requests):
+        payload = payloads[i % len(payloads)]
+        endpoint = args.endpoints[i % len(args.endpoints)]
+        body = dict(payload[endpoint], deterministic=args.deterministic)
+        jobs.append((endpoint, body))
+
+    tokens_before = output_tokens(url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda job: send(url, job[0], job[1], args.timeout), jobs))
+    elapsed = time.perf_counter() - start
+    tokens_after = output_tokens(url)
+
+    print(f"{len(jobs)} requests, concurrency {args.concurrency}, {elapsed:.1f}s")
+    print(f"{'endpoint':<10}{'ok':>6}{'429':>6}{'fail':>6}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}{'req/s':>9}")
+    for endpoint in args.endpoints:
+        rows = [r for r in results if r[0] == endpoint]
+        latencies = [r[2] * 1000 for r in rows if r[1] == 200]
+        rejected = sum(1 for r in rows if r[1] == 429)
+        failed = len(rows) - len(latencies) - rejected
+        print(f"{endpoint:<10}{len(latencies):>6}{rejected:>6}{failed:>6}"
+              f"{percentile(latencies, 50):>11.1f}{percentile(latencies, 95):>11.1f}{percentile(latencies, 99):>11.1f}"
+              f"{len(latencies) / elapsed:>9.2f}")
+    if tokens_before is not None and tokens_after is not None:
+        print(f"output tokens/s: {(tokens_after - tokens_before) / elapsed:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help="이미 실행 중인 서버 주소 (없으면 무작위 가중치 모델 서버를 띄운다)")
+    parser.add_argument('--model-id', help="토크나이저를 가져올 모델 (기본값 AI_MODEL_ID)")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--gpt-cache', default=GPT_CACHE_DIR)
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--deterministic', action='store_true', help="greedy 디코딩 (같은 요청은 응답 캐시에 적중)")
+    parser.add_argument('--max-queue-size', type=int, default=64)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.fixtures, args.gpt_cache)
+    if not payloads:
+        print(f"No OCR fixtures found in {args.fixtures}")
+        return
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    try:
+        run(url.rstrip('/'), payloads, args)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
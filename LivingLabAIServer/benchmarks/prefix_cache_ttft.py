@@ -0,0 +1,72 @@
+"""시스템 프롬프트 접두부 KV 캐시 사용 여부에 따른 time-to-first-token 비교
+
+사용 예:
+    python benchmarks/prefix_cache_ttft.py --fixtures ../OCR/cache --repeats 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from GuchungAIServer.batching import BatchScheduler
+from GuchungAIServer.prefix_cache import PrefixCache
+from GuchungAIServer.prompts import (build_column_messages, build_table_messages,
+                                     column_prefix_messages, table_prefix_messages)
+from _fixtures import DEFAULT_COLUMNS, FIXTURES_DIR, load_texts
+
+def time_first_token(scheduler, messages, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        scheduler.generate(messages, max_new_tokens=1, do_sample=False)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-id', default='MLP-KTLim/llama-3-Korean-Bllossom-8B')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--check-tokens', type=int, default=32)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_id)
+    model = AutoModelForCausalLM.from_pretrained(args.model_id, torch_dtype=torch.bfloat16, device_map="auto")
+    model.eval()
+
+    prefix_cache = PrefixCache(model, tokenizer)
+    prefix_cache.register('columns', column_prefix_messages())
+    prefix_cache.register('response', table_prefix_messages())
+    cached = BatchScheduler(model, tokenizer, max_batch_size=1, max_wait_ms=0, prefix_cache=prefix_cache)
+    uncached = BatchScheduler(model, tokenizer, max_batch_size=1, max_wait_ms=0)
+
+    texts = load_texts(args.fixtures)
+    if not texts:
+        print(f"No OCR fixtures found in {args.fixtures}")
+        return
+
+    print(f"{'prompt':<10}{'doc':>5}{'no cache (ms)':>16}{'cache (ms)':>14}{'speed-up':>10}{'same output':>13}")
+    for name, build in (('columns', build_column_messages),
+                        ('response', lambda text: build_table_messages(text, DEFAULT_COLUMNS))):
+        for i, text in enumerate(texts):
+            messages = build(text)
+            # 첫 호출에서 접두부 KV를 계산하므로 측정 전에 한 번 실행
+            cached.generate(messages, max_new_tokens=1, do_sample=False)
+            base = time_first_token(uncached, messages, args.repeats)
+            fast = time_first_token(cached, messages, args.repeats)
+            same = (uncached.generate(messages, max_new_tokens=args.check_tokens, do_sample=False)
+                    == cached.generate(messages, max_new_tokens=args.check_tokens, do_sample=False))
+            print(f"{name:<10}{i:>5}{base * 1000:>16.1f}{fast * 1000:>14.1f}{base / fast:>9.2f}x{str(same):>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""OCR/cache 문서로 추측(speculative) 디코딩의 수락률과 전체 속도 향상을 측정
+
+greedy 디코딩으로 일반 생성, prompt-lookup, (주어지면) 초안 모델 방식을 비교한다.
+수락률은 초안 토큰 중 대상 모델 검증을 통과한 비율이다.
+
+사용 예:
+    python benchmarks/speculative.py --new-tokens 256
+    python benchmarks/speculative.py --draft-model-id <같은 토크나이저를 쓰는 작은 모델>
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from transformers.generation import candidate_generator
+
+from GuchungAIServer.loading import load_model
+from GuchungAIServer.prompts import build_table_messages
+from _fixtures import DEFAULT_COLUMNS, FIXTURES_DIR, load_texts
+
+class DraftCounter:
+    """후보 생성기가 만든 초안 토큰 수를 센다"""
+    def __init__(self):
+        self.drafted = 0
+        for cls in (candidate_generator.PromptLookupCandidateGenerator, candidate_generator.AssistedCandidateGenerator):
+            original = cls.get_candidates
+
+            def get_candidates(generator, input_ids, _original=original):
+                candidate_ids, candidate_logits = _original(generator, input_ids)
+                self.drafted += candidate_ids.shape[-1] - input_ids.shape[-1]
+                return candidate_ids, candidate_logits
+
+            cls.get_candidates = get_candidates
+
+
+def run(model, input_ids, terminators, new_tokens, counter, **kwargs):
+    forwards = []
+    handle = model.register_forward_pre_hook(lambda module, args: forwards.append(1))
+    counter.drafted = 0
+    try:
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(input_ids, max_new_tokens=new_tokens, eos_token_id=terminators,
+                                     do_sample=False, **kwargs)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+    finally:
+        handle.remove()
+    generated = outputs[0][input_ids.shape[-1]:]
+    # 첫 forward 는 prefill 이고, 이후 검증 단계마다 (수락된 토큰 + 1)개가 생성된다
+    verify_steps = max(1, len(forwards) - 1)
+    accepted = max(0, len(generated) - 1 - verify_steps)
+    return {
+        'seconds': elapsed,
+        'tokens': len(generated),
+        'forwards': len(forwards),
+        'acceptance': accepted / counter.drafted if counter.drafted else None,
+        'ids': generated.tolist(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-id', default='MLP-KTLim/llama-3-Korean-Bllossom-8B')
+    parser.add_argument('--draft-model-id', default=None)
+    parser.add_argument('--device', default='cuda')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--new-tokens', type=int, default=256)
+    parser.add_argument('--prompt-lookup-tokens', type=int, default=10)
+    args = parser.parse_args()
+
+    model, tokenizer = load_model(args.model_id, device=args.device)
+    modes = {'prompt_lookup': {'prompt_lookup_num_tokens': args.prompt_lookup_tokens}}
+    if args.draft_model_id:
+        draft_model, _ = load_model(args.draft_model_id, device=args.device)
+        modes['draft'] = {'assistant_model': draft_model}
+    terminators = [tokenizer.eos_token_id, tokenizer.convert_tokens_to_ids("<|eot_id|>")]
+    counter = DraftCounter()
+
+    texts = load_texts(args.fixtures)
+    if not texts:
+        print(f"No OCR fixtures found in {args.fixtures}")
+        return
+
+    speedups = {mode: [] for mode in modes}
+    print(f"{'doc':>4}{'mode':>15}{'tokens':>8}{'seconds':>9}{'accept':>8}{'speed-up':>10}{'same':>6}")
+    for i, text in enumerate(texts):
+        input_ids = tokenizer.apply_chat_template(
+            build_table_messages(text, DEFAULT_COLUMNS), add_generation_prompt=True, return_tensors="pt"
+        ).to(model.device)
+        run(model, input_ids, terminators, 8, counter)
+        base = run(model, input_ids, terminators, args.new_tokens, counter)
+        print(f"{i:>4}{'baseline':>15}{base['tokens']:>8}{base['seconds']:>9.2f}{'-':>8}{'1.00x':>10}{'-':>6}")
+        for mode, kwargs in modes.items():
+            result = run(model, input_ids, terminators, args.new_tokens, counter, **kwargs)
+            speedup = base['seconds'] / result['seconds']
+            speedups[mode].append(speedup)
+            accept = f"{result['acceptance']:.2f}" if result['acceptance'] is not None else '-'
+            print(f"{i:>4}{mode:>15}{result['tokens']:>8}{result['seconds']:>9.2f}{accept:>8}"
+                  f"{speedup:>9.2f}x{str(result['ids'] == base['ids']):>6}")
+
+    for mode, values in speedups.items():
+        print(f"{mode}: median speed-up {statistics.median(values):.2f}x over {len(values)} documents")
+
+
+if __name__ == '__main__':
+    main()
@@ -129,3 +129,104 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# AI inference
+
+AI_MODEL_ID = env('AI_MODEL_ID', default='MLP-KTLim/llama-3-Korean-Bllossom-8B')
+
+# 이름별 모델 (default 는 AI_MODEL_ID), 엔드포인트별로 쓸 모델 이름 (예: columns=small), 동시에 올려 둘 모델 크기 합의 상한(GB, 0 이면 제한 없음)
+AI_MODELS = env.dict('AI_MODELS', default={})
+AI_MODELS.setdefault('default', AI_MODEL_ID)
+
+AI_ENDPOINT_MODELS = env.dict('AI_ENDPOINT_MODELS', default={})
+
+AI_MODEL_MEMORY_BUDGET_GB = env.float('AI_MODEL_MEMORY_BUDGET_GB', default=0.0)
+
+AI_HF_HOME = env('AI_HF_HOME', default='/home/swsong/Guchung/.cache/huggingface')
+
+# 추론 장치 ('cuda' 또는 'cpu')와 CPU 백엔드의 Linear 레이어 양자화 방식 ('none', 'int8', 'int4')
+AI_DEVICE = env('AI_DEVICE', default='cuda')
+
+AI_QUANTIZATION = env('AI_QUANTIZATION', default='none')
+
+# CPU 백엔드에서 torch 가 사용할 intra-op 스레드 수 (0 이면 torch 기본값)
+AI_NUM_THREADS = env.int('AI_NUM_THREADS', default=0)
+
+# safetensors 를 mmap 해서 복사 없이 사용 (같은 호스트의 여러 프로세스가 페이지 캐시의 가중치를 공유, 양자화와 함께 쓸 수 없음)
+AI_MMAP_WEIGHTS = env.bool('AI_MMAP_WEIGHTS', default=False)
+
+# 서버 시작 시 백그라운드에서 모델을 불러오고 워밍업 생성을 실행할지 여부
+# (끄면 첫 요청에서 불러온다)
+AI_PRELOAD_MODEL = env.bool('AI_PRELOAD_MODEL', default=True)
+
+AI_WARMUP = env.bool('AI_WARMUP', default=True)
+
+# 요청을 모아 한 번의 model.generate로 처리하는 배치 스케줄러 설정
+
+AI_MAX_BATCH_SIZE = env.int('AI_MAX_BATCH_SIZE', default=8)
+
+AI_MAX_BATCH_WAIT_MS = env.int('AI_MAX_BATCH_WAIT_MS', default=20)
+
+# 뷰마다 고정된 시스템 프롬프트 접두부의 KV 캐시를 재사용
+AI_PREFIX_CACHE = env.bool('AI_PREFIX_CACHE', default=True)
+
+# 입력 길이를 구간(length buckets)에 맞추고 미리 할당한 StaticCache 와 torch.compile 로 생성 (접두부 캐시와 추측 디코딩은 꺼짐)
+AI_STATIC_CACHE = env.bool('AI_STATIC_CACHE', default=False)
+
+AI_LENGTH_BUCKETS = env.list('AI_LENGTH_BUCKETS', cast=int, default=[256, 512, 1024, 2048])
+
+AI_STATIC_MAX_NEW_TOKENS = env.int('AI_STATIC_MAX_NEW_TOKENS', default=256)
+
+# 이보다 긴 문서는 페이지/줄 경계에서 나눠 조각별로 추출한 뒤 합친다 (토큰 수)
+AI_CHUNK_MAX_TOKENS = env.int('AI_CHUNK_MAX_TOKENS', default=1536)
+
+# 뷰별 추측(speculative) 디코딩 방식 ('none', 입력 텍스트에서 후보를 찾는 'prompt_lookup',
+# AI_DRAFT_MODEL_ID 의 작은 모델로 후보를 만드는 'draft')
+AI_COLUMNS_SPECULATIVE = env('AI_COLUMNS_SPECULATIVE', default='none')
+
+AI_RESPONSE_SPECULATIVE = env('AI_RESPONSE_SPECULATIVE', default='none')
+
+AI_DRAFT_MODEL_ID = env('AI_DRAFT_MODEL_ID', default=None)
+
+AI_PROMPT_LOOKUP_TOKENS = env.int('AI_PROMPT_LOOKUP_TOKENS', default=10)
+
+# 표 추출 응답 형식 ('markdown' 또는 열 이름을 키로 하는 'json', 요청의 output_format 값이 우선)
+AI_OUTPUT_FORMAT = env('AI_OUTPUT_FORMAT', default='markdown')
+
+# json 형식에서 열 하나당 확보할 생성 토큰 수 (열 이름 키도 매 행 생성되므로 열이 많으면 max_new_tokens 를 늘린다)
+AI_JSON_TOKENS_PER_COLUMN = env.int('AI_JSON_TOKENS_PER_COLUMN', default=64)
+
+# greedy 디코딩을 기본으로 사용할지 여부 (요청의 deterministic 값이 우선)
+AI_DETERMINISTIC = env.bool('AI_DETERMINISTIC', default=False)
+
+# greedy 디코딩 결과를 저장하는 응답 캐시 (메모리 LRU 항목 수, 선택적 디스크 저장 경로)
+AI_RESPONSE_CACHE_SIZE = env.int('AI_RESPONSE_CACHE_SIZE', default=1024)
+
+AI_RESPONSE_CACHE_DIR = env('AI_RESPONSE_CACHE_DIR', default=None)
+
+# 비동기 작업 API: 작업자가 스케줄러에 동시에 제출하는 최대 문서 수와 롱 폴링 최대 대기 시간
+
+AI_JOB_MAX_IN_FLIGHT = env.int('AI_JOB_MAX_IN_FLIGHT', default=AI_MAX_BATCH_SIZE * 2)
+
+AI_JOB_MAX_WAIT_SECONDS = env.int('AI_JOB_MAX_WAIT_SECONDS', default=60)
+
+# 작업자가 가져간 문서의 점유 기한 (초). 작업자는 이 시간의 1/3 마다 연장하며, 기한이 지난 문서는 다른 작업자가 다시 처리한다
+AI_JOB_LEASE_SECONDS = env.int('AI_JOB_LEASE_SECONDS', default=60)
+
+# 모델 앞 대기열: 최대 대기 요청 수(넘으면 429), 최대 대기 시간(초, 넘으면 503), 엔드포인트별 우선순위(작을수록 먼저)
+AI_MAX_QUEUE_SIZE = env.int('AI_MAX_QUEUE_SIZE', default=64)
+
+AI_MAX_QUEUE_WAIT_SECONDS = env.float('AI_MAX_QUEUE_WAIT_SECONDS', default=30.0)
+
+# 요청을 받은 뒤 이 시간(초)이 지나면 대기 중이거나 생성 중인 요청을 취소한다 (0 이면 제한 없음)
+AI_GENERATION_DEADLINE_SECONDS = env.float('AI_GENERATION_DEADLINE_SECONDS', default=300.0)
+
+AI_ENDPOINT_PRIORITIES = env.dict('AI_ENDPOINT_PRIORITIES', cast={'value': int},
+                                  default={'columns': 0, 'response': 1, 'job': 2})
+
+# 모델을 manage.py runinference 프로세스에 올리고 HTTP 워커는 이 Unix 소켓으로 요청한다 (없으면 워커 안에서 불러옴)
+AI_INFERENCE_SOCKET = env('AI_INFERENCE_SOCKET', default=None)
+
+# 부하 테스트용: AI_MODEL_ID 의 토크나이저만 불러오고 모델은 작은 무작위 가중치 모델로 대신한다
+AI_STUB_MODEL = env.bool('AI_STUB_MODEL', default=False)
@@ -17,9 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
-from GuchungAIServer.views import AIResponseView, AIColumnsView
+from GuchungAIServer.views import AIResponseView, AIColumnsView, CacheStatsView, HealthView, JobCreateView, JobDetailView, metrics_view
 
 urlpatterns = [
     path('api/get-ai-column-response/', AIColumnsView.as_view(), name='get-ai-column-response'),
     path('api/get-ai-response/', AIResponseView.as_view(), name='ai_response'),
+    path('api/health/', HealthView.as_view(), name='health'),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('api/jobs/', JobCreateView.as_view(), name='job-create'),
+    path('api/jobs/<uuid:job_id>/', JobDetailView.as_view(), name='job-detail'),
 ]
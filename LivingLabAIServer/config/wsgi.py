@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# 서버 프로세스에서만 모델을 미리 불러오고, 재시작 전에 남아 있던 작업을 이어서 처리한다
+from django.conf import settings  # noqa: E402
+from GuchungAIServer.views import job_worker, registry  # noqa: E402
+
+if settings.AI_PRELOAD_MODEL:
+    registry.start_background_load()
+job_worker.ensure_started()
@@ -1,5 +1,7 @@
+import asyncio
 import requests
 import os
+from transport import TRANSPORT
 
 api_key = os.getenv('upstage_key')  # 업스테이지 API 키
 
@@ -8,8 +10,10 @@ def ocr_document(filename, folder):
     headers = {"Authorization": f"Bearer {api_key}"}
     
     try:
-        with open(filename, "rb") as file:
-            response = requests.post(url, headers=headers, files={"document": file})
+        # 재시도할 때도 같은 내용을 보내도록 파일 핸들 대신 읽어 둔 바이트를 넘긴다
+        content = _read_file(filename)
+        response = TRANSPORT.post('ocr', url, headers=headers,
+                                 files={"document": (os.path.basename(filename), content)})
         response.raise_for_status()
         data = response.json()
         
@@ -20,3 +24,22 @@ def ocr_document(filename, folder):
     except Exception as e:
         print(f"Unexpected error for {os.path.basename(filename)}: {e}")
         return None
+
+def _read_file(filename):
+    with open(filename, "rb") as file:
+        return file.read()
+
+async def ocr_document_async(transport, filename, folder):
+    """ocr_document 의 비동기 버전 (AsyncTransport 사용)"""
+    url = "https://api.upstage.ai/v1/document-ai/ocr"
+    headers = {"Authorization": f"Bearer {api_key}"}
+
+    try:
+        content = await asyncio.to_thread(_read_file, filename)
+        response = await transport.post('ocr', url, headers=headers,
+                                        files={"document": (os.path.basename(filename), content)})
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        print(f"Error performing OCR on {os.path.basename(filename)}: {e}")
+        return None
@@ -0,0 +1,177 @@
+"""OCR 결과와 열 제목 응답을 압축해 SQLite 파일 하나에 저장하는 캐시
+
+기존 cache/<해시>.json, gpt_cache/<해시>.json 은 처음 열 때 한 번 가져옵니다.
+직접 가져오기만 하려면:
+    python cache_store.py --migrate [--delete]
+"""
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# 캐시 파일 위치와 최대 크기 (압축된 크기 기준, 넘으면 가장 오래 쓰지 않은 항목부터 지운다)
+OCR_CACHE_DB = os.getenv('OCR_CACHE_DB', 'cache.sqlite3')
+OCR_CACHE_MAX_MB = float(os.getenv('OCR_CACHE_MAX_MB', '1024'))
+# 처음 열 때 가져올 예전 캐시 폴더
+LEGACY_DIRS = {'ocr': 'cache', 'columns': 'gpt_cache'}
+
+KIND_OCR = 'ocr'
+KIND_COLUMNS = 'columns'
+
+
+class CacheStore:
+    """(종류, 내용 해시) 를 키로 zlib 압축한 JSON 을 저장하는 SQLite 캐시
+
+    쓰기는 트랜잭션 단위로 반영되므로 배치 도중 프로그램이 죽어도 반쯤 쓴 항목이 남지 않습니다.
+    여러 작업자 스레드가 같은 연결을 잠금으로 나눠 씁니다.
+    """
+    def __init__(self, path=OCR_CACHE_DB, max_bytes=int(OCR_CACHE_MAX_MB * 2 ** 20)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                model_version TEXT,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, kind, key):
+        """저장된 값 (없으면 None). 읽은 항목은 최근에 쓴 것으로 표시한다"""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE kind = ? AND key = ?",
+                               (time.time(), kind, key))
+        try:
+            return json.loads(zlib.decompress(row[0]))
+        except (zlib.error, ValueError) as e:
+            print(f"Error reading cache entry {kind}/{key}: {e}")
+            return None
+
+    def put(self, kind, key, value, model_version=None, created_at=None):
+        raw = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        payload = zlib.compress(raw, 6)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._conn.execute("SELECT size FROM entries WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key, payload, len(payload), len(raw), model_version, created_at or now, now))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.total_bytes += len(payload) - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self):
+        """최대 크기를 넘으면 가장 오래 쓰지 않은 항목부터 지워 최대 크기의 90% 까지 줄인다"""
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        removed = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for kind, key, size in self._conn.execute(
+                    "SELECT kind, key, size FROM entries ORDER BY accessed_at").fetchall():
+                if self.total_bytes - removed <= target:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (kind, key))
+                removed += size
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.total_bytes -= removed
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM entries GROUP BY kind"
+            ).fetchall()
+        return {kind: {'entries': count, 'bytes': size, 'raw_bytes': raw} for kind, count, size, raw in rows}
+
+    def migrated(self, name):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM meta WHERE name = ?", (name,)).fetchone() is not None
+
+    def migrate(self, legacy_dirs=LEGACY_DIRS, delete=False):
+        """예전 JSON 캐시 폴더를 가져온다 (이미 있는 키는 건너뛰고, delete 면 가져온 파일을 지운다)"""
+        imported = 0
+        for kind, folder in legacy_dirs.items():
+            for path in glob.glob(os.path.join(folder, '*.json')):
+                key = os.path.splitext(os.path.basename(path))[0]
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        value = json.load(f)
+                    if self.get(kind, key) is None:
+                        model_version = value.get('modelVersion') if isinstance(value, dict) else None
+                        self.put(kind, key, value, model_version=model_version, created_at=os.path.getmtime(path))
+                        imported += 1
+                    if delete:
+                        os.remove(path)
+                except (IOError, ValueError) as e:
+                    print(f"Error migrating cache file {path}: {e}")
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (f"migrated:{folder}", str(time.time())))
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """프로세스에서 함께 쓰는 캐시 (처음 열 때 예전 캐시 폴더를 가져온다)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CacheStore()
+            pending = {kind: folder for kind, folder in LEGACY_DIRS.items()
+                       if os.path.isdir(folder) and not _store.migrated(f"migrated:{folder}")}
+            if pending:
+                print(f"Imported {_store.migrate(pending)} legacy cache files into {_store.path}")
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 캐시 관리")
+    parser.add_argument('--migrate', action='store_true', help="cache/, gpt_cache/ 의 JSON 을 가져온다")
+    parser.add_argument('--delete', action='store_true', help="가져온 JSON 파일을 지운다")
+    args = parser.parse_args()
+
+    store = CacheStore()
+    if args.migrate:
+        print(f"Imported {store.migrate(delete=args.delete)} files")
+    for kind, stats in store.stats().items():
+        print(f"{kind}: {stats['entries']} entries, {stats['bytes'] / 2 ** 20:.1f} MB "
+              f"(uncompressed {stats['raw_bytes'] / 2 ** 20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
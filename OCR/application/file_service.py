@@ -1,14 +1,16 @@
 import os
-import json
+from cache_store import KIND_OCR, get_store
 from utils import calculate_file_hash
 
-def manage_cache(file_hash, file_path, cache_folder, ocr_function, folder):
-    """파일 해시와 캐시 폴더를 관리하며 캐시 파일이 존재하는지 확인합니다."""
-    cache_file = os.path.join(cache_folder, f"{file_hash}.json")
-    
-    if os.path.exists(cache_file):
-        print(f"Cache file found for {os.path.basename(file_path)}.")
-        return cache_file
+def get_cached_ocr(file_hash, file_path):
+    """파일 해시로 캐시된 OCR 결과를 찾습니다. 없으면 None 을 반환합니다."""
+    ocr_data = get_store().get(KIND_OCR, file_hash)
+    if ocr_data is not None:
+        print(f"Cache entry found for {os.path.basename(file_path)}.")
     else:
-        print(f"Cache file not found for {os.path.basename(file_path)}.")
-        return None
+        print(f"Cache entry not found for {os.path.basename(file_path)}.")
+    return ocr_data
+
+def store_ocr(file_hash, ocr_data):
+    """OCR 결과를 파일 해시로 캐시에 저장합니다."""
+    get_store().put(KIND_OCR, file_hash, ocr_data, model_version=ocr_data.get('modelVersion'))
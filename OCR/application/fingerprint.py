@@ -0,0 +1,152 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_store import OCR_CACHE_DB
+
+# 새 파일을 해시할 스레드 수 (hashlib 은 큰 버퍼를 해시하는 동안 GIL 을 놓으므로 코어 수만큼 빨라진다)
+FINGERPRINT_WORKERS = max(1, int(os.getenv('FINGERPRINT_WORKERS', str(os.cpu_count() or 4))))
+# mmap 을 쓸 수 없을 때 한 번에 읽을 크기
+READ_BUFFER_SIZE = 1 << 20
+
+
+def hash_file(path):
+    """파일 내용의 MD5 (캐시 키와 원본 서식 템플릿이 이 값을 쓰므로 알고리즘은 바꾸지 않는다). 읽지 못하면 None"""
+    hash_md5 = hashlib.md5()
+    try:
+        with open(path, "rb") as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    hash_md5.update(mapped)
+            except ValueError:
+                # 빈 파일은 mmap 할 수 없다
+                for chunk in iter(lambda: f.read(READ_BUFFER_SIZE), b""):
+                    hash_md5.update(chunk)
+    except OSError as e:
+        print(f"Error calculating hash for {path}: {e}")
+        return None
+    return hash_md5.hexdigest()
+
+
+class FingerprintIndex:
+    """(경로, 크기, 수정 시각, inode) -> 해시 를 기억해 바뀌지 않은 파일은 다시 읽지 않는 색인 (캐시와 같은 SQLite 파일)"""
+    def __init__(self, path=OCR_CACHE_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                hashed_at REAL NOT NULL
+            )
+        """)
+
+    def lookup(self, stats):
+        """{경로: os.stat 결과} 중 색인과 크기/수정 시각/inode 가 같은 파일의 {경로: 해시}"""
+        found = {}
+        paths = list(stats)
+        with self._lock:
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT path, size, mtime_ns, inode, hash FROM fingerprints WHERE path IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for path, size, mtime_ns, inode, file_hash in rows:
+                    st = stats[path]
+                    if (size, mtime_ns, inode) == (st.st_size, st.st_mtime_ns, st.st_ino):
+                        found[path] = file_hash
+        return found
+
+    def store(self, entries):
+        """[(경로, os.stat 결과, 해시), ...] 를 한 트랜잭션으로 기록한다"""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?)",
+                    [(path, st.st_size, st.st_mtime_ns, st.st_ino, file_hash, now) for path, st, file_hash in entries])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FingerprintIndex()
+        return _index
+
+
+def lookup_fingerprints(paths):
+    """색인만으로 구한 {경로: 해시} (읽지 못한 파일은 None) 와 아직 해시해야 할 경로 목록
+
+    색인에 있고 크기/수정 시각/inode 가 그대로인 파일은 읽지 않는다.
+    """
+    stats = {}
+    result = {}
+    for path in paths:
+        key = os.path.abspath(path)
+        try:
+            stats[key] = os.stat(key)
+        except OSError as e:
+            print(f"Error calculating hash for {path}: {e}")
+            result[path] = None
+
+    known = get_index().lookup(stats)
+    missing = {}
+    for path in paths:
+        if path in result:
+            continue
+        key = os.path.abspath(path)
+        if key in known:
+            result[path] = known[key]
+        else:
+            missing[path] = None
+    return result, list(missing)
+
+
+def hash_and_index(path):
+    """파일을 해시해 색인에 기록한 해시 (읽지 못하면 None). 여러 스레드에서 함께 불러도 된다"""
+    key = os.path.abspath(path)
+    try:
+        st = os.stat(key)
+    except OSError as e:
+        print(f"Error calculating hash for {path}: {e}")
+        return None
+    file_hash = hash_file(key)
+    if file_hash is not None:
+        get_index().store([(key, st, file_hash)])
+    return file_hash
+
+
+def fingerprint_files(paths, max_workers=FINGERPRINT_WORKERS):
+    """여러 파일의 {경로: 해시} (읽지 못한 파일은 None)
+
+    색인에 있고 크기/수정 시각/inode 가 그대로인 파일은 읽지 않으며, 나머지는 스레드들이 함께 해시합니다.
+    """
+    result, missing = lookup_fingerprints(paths)
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            result.update(zip(missing, executor.map(hash_and_index, missing)))
+    return result
+
+
+def fingerprint_file(path):
+    return fingerprint_files([path])[path]
@@ -0,0 +1,290 @@
+import json
+import os
+import statistics
+import threading
+
+from layout_extractor import PageLayout, normalize_label
+
+# 정렬에 쓸 원본 서식 단어의 최소 신뢰도와 영역 여백 (단어 높이의 배수)
+ANCHOR_MIN_CONFIDENCE = 0.9
+REGION_PADDING = 0.3
+# AI 서버가 읽은 값의 위치는 서로 다른 문서 몇 장에서 같은 곳으로 나와야 영역으로 기억한다
+LEARN_CONFIRMATIONS = 2
+
+
+def _solve3(m, v):
+    """3x3 연립방정식 (행렬식이 0에 가까우면 None)"""
+    def det(a):
+        return (a[0][0] * (a[1][1] * a[2][2] - a[1][2] * a[2][1])
+                - a[0][1] * (a[1][0] * a[2][2] - a[1][2] * a[2][0])
+                + a[0][2] * (a[1][0] * a[2][1] - a[1][1] * a[2][0]))
+    d = det(m)
+    if abs(d) < 1e-9:
+        return None
+    result = []
+    for col in range(3):
+        replaced = [[v[r] if c == col else m[r][c] for c in range(3)] for r in range(3)]
+        result.append(det(replaced) / d)
+    return result
+
+
+def fit_transform(pairs):
+    """(원래 좌표, 옮긴 좌표) 쌍으로 어파인 변환 x' = ax + by + c 를 최소제곱으로 구한다
+
+    기울어짐과 배율까지 맞추며, 점이 3개보다 적거나 한 줄에 늘어서 있으면 평행 이동만 맞춘다.
+    """
+    if not pairs:
+        return None
+    dx = statistics.median(q[0] - p[0] for p, q in pairs)
+    dy = statistics.median(q[1] - p[1] for p, q in pairs)
+    translation = ((1.0, 0.0, dx), (0.0, 1.0, dy))
+    if len(pairs) < 3:
+        return translation
+
+    m = [[0.0] * 3 for _ in range(3)]
+    vx = [0.0] * 3
+    vy = [0.0] * 3
+    for (x, y), (tx, ty) in pairs:
+        row = (x, y, 1.0)
+        for i in range(3):
+            for j in range(3):
+                m[i][j] += row[i] * row[j]
+            vx[i] += row[i] * tx
+            vy[i] += row[i] * ty
+    ax, ay = _solve3(m, vx), _solve3(m, vy)
+    if ax is None or ay is None:
+        return translation
+    return tuple(ax), tuple(ay)
+
+
+def apply_transform(transform, x, y):
+    (a, b, c), (d, e, f) = transform
+    return a * x + b * y + c, d * x + e * y + f
+
+
+def invert_transform(transform):
+    """어파인 변환의 역변환 (되돌릴 수 없으면 None)"""
+    (a, b, c), (d, e, f) = transform
+    det = a * e - b * d
+    if abs(det) < 1e-9:
+        return None
+    return ((e / det, -b / det, (b * f - c * e) / det),
+            (-d / det, a / det, (c * d - a * f) / det))
+
+
+def boxes_overlap(a, b, ratio=0.5):
+    """두 사각형이 작은 쪽 넓이의 ratio 이상 겹치는지"""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return False
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height >= ratio * smaller
+
+
+def transform_box(transform, box):
+    """사각형의 네 꼭짓점을 옮긴 뒤 감싸는 사각형"""
+    x0, y0, x1, y1 = box
+    points = [apply_transform(transform, x, y) for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+    return (min(p[0] for p in points), min(p[1] for p in points),
+            max(p[0] for p in points), max(p[1] for p in points))
+
+
+class FormTemplate:
+    """원본 서식 하나(파일 해시)에 대해 열마다 값이 놓이는 페이지 영역을 기억하는 템플릿
+
+    영역은 원본 서식의 좌표로 저장하며, 사용자 문서마다 원본 서식의 인쇄된 단어(앵커)를
+    맞춰 기울어짐과 위치 차이를 보정한 뒤 영역 안의 단어를 읽습니다.
+    AI 서버가 읽은 값의 위치는 후보(candidates)로 두었다가 다른 문서에서도 같은 곳으로 나와야 영역이 됩니다.
+    """
+    def __init__(self, path, anchors, regions=None, candidates=None):
+        self.path = path
+        self.anchors = anchors
+        self.regions = regions or {}
+        self.candidates = candidates or {}
+        self.changed = False
+        # 여러 작업자 스레드가 같은 템플릿을 읽고 배운다
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, template_dir, form_hash, original_ocr_data):
+        """저장된 템플릿을 읽고, 없으면 원본 서식의 OCR 단어로 빈 템플릿을 만든다"""
+        path = os.path.join(template_dir, f"{form_hash}.json")
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                return cls(path, data['anchors'], data.get('regions'), data.get('candidates'))
+            except Exception as e:
+                print(f"Error reading form template {path}: {e}")
+
+        anchors = []
+        for page in (original_ocr_data or {}).get('pages', []):
+            layout = PageLayout(page, {})
+            anchors.append([[w.norm, w.x0, w.y0, w.x1, w.y1] for w in layout.words
+                            if w.norm and w.confidence >= ANCHOR_MIN_CONFIDENCE])
+        return cls(path, anchors)
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if not self.changed:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({'anchors': self.anchors, 'regions': self.regions, 'candidates': self.candidates},
+                          f, ensure_ascii=False)
+            self.changed = False
+        except IOError as e:
+            print(f"Error writing form template {self.path}: {e}")
+
+    def _align(self, page_index, layout):
+        """원본 서식 좌표 -> 문서 좌표 변환과 서식에 인쇄된 문서 단어들"""
+        if page_index >= len(self.anchors):
+            return None, set()
+        counts = {}
+        for norm, *_ in self.anchors[page_index]:
+            counts[norm] = counts.get(norm, 0) + 1
+        by_text = {}
+        for word in layout.words:
+            by_text.setdefault(word.norm, []).append(word)
+
+        # 원본과 문서에 한 번씩만 나오는 단어끼리 짝을 짓는다
+        pairs = []
+        for norm, x0, y0, x1, y1 in self.anchors[page_index]:
+            matches = by_text.get(norm, [])
+            if counts[norm] == 1 and len(matches) == 1 and len(norm) >= 2:
+                pairs.append((((x0 + x1) / 2, (y0 + y1) / 2), matches[0].center, matches[0]))
+        transform = fit_transform([(p, q) for p, q, _ in pairs])
+        if transform is None:
+            return None, set()
+
+        # 값으로 쓰인 단어가 우연히 앵커와 같은 경우를 걸러내고 다시 맞춘다
+        heights = [w.height for _, _, w in pairs]
+        limit = 2 * statistics.median(heights)
+        kept = [(p, q, w) for p, q, w in pairs
+                if abs(apply_transform(transform, *p)[0] - q[0]) + abs(apply_transform(transform, *p)[1] - q[1]) <= limit]
+        if kept and len(kept) < len(pairs):
+            transform = fit_transform([(p, q) for p, q, _ in kept]) or transform
+
+        # 옮긴 위치에 같은 글자가 있는 문서 단어는 서식에 인쇄된 글자이므로 값에서 뺀다
+        printed = set()
+        for norm, x0, y0, x1, y1 in self.anchors[page_index]:
+            x, y = apply_transform(transform, (x0 + x1) / 2, (y0 + y1) / 2)
+            for word in by_text.get(norm, []):
+                if abs(word.center[0] - x) + abs(word.center[1] - y) <= word.height:
+                    printed.add(word.index)
+        return transform, printed
+
+    def printed_columns(self, ocr_data, values):
+        """값({열: 값}) 중 문서에서 원본 서식에 인쇄된 글자 자리에만 있는 열 (빈 칸 옆의 다른 레이블을 값으로 읽은 경우)
+
+        같은 글자라도 서식의 다른 곳에 인쇄된 것은 상관없으므로 "2", "여" 같은 짧은 값도 그대로 둡니다.
+        """
+        pages = [PageLayout(page, {}) for page in (ocr_data or {}).get('pages', [])]
+        alignments = {}
+        printed_columns = set()
+        for column, value in values.items():
+            spans = [(i, span) for i, layout in enumerate(pages) for span in layout.find_phrase(str(value))]
+            if not spans:
+                continue
+            for page_index, _ in spans:
+                if page_index not in alignments:
+                    alignments[page_index] = self._align(page_index, pages[page_index])[1]
+            if all(w.index in alignments[page_index] for page_index, span in spans for w in span):
+                printed_columns.add(column)
+        return printed_columns
+
+    def forget(self, column):
+        """잘못 배운 열의 영역과 후보를 지운다"""
+        with self._lock:
+            if self.regions.pop(column, None) is not None or self.candidates.pop(column, None) is not None:
+                self.changed = True
+
+    def learn(self, ocr_data, row, confirmed=(), document=None):
+        """추출 결과(열 -> 값)에서 값이 놓인 영역을 찾아 아직 모르는 열의 영역 후보로 기억한다
+
+        confirmed 의 열(레이블로 직접 읽은 값)은 바로 영역이 되고, 나머지(AI 서버가 읽은 값)는
+        서로 다른 문서(document 는 문서 해시) LEARN_CONFIRMATIONS 장에서 같은 곳으로 나와야 영역이 됩니다.
+        다른 곳으로 나오면 후보를 새 위치로 바꿉니다.
+        """
+        confirmed = set(confirmed)
+        pages = [PageLayout(page, {}) for page in (ocr_data or {}).get('pages', [])]
+        for column, value in row.items():
+            if column in self.regions or value is None or not normalize_label(str(value)):
+                continue
+            found = [(i, span) for i, layout in enumerate(pages) for span in layout.find_phrase(str(value))]
+            # 같은 값이 여러 곳에 있으면 어느 칸인지 알 수 없으므로 배우지 않는다
+            if len(found) != 1:
+                continue
+            page_index, span = found[0]
+            transform, _ = self._align(page_index, pages[page_index])
+            to_original = invert_transform(transform) if transform is not None else None
+            if to_original is None:
+                continue
+            box = (min(w.x0 for w in span), min(w.y0 for w in span),
+                   max(w.x1 for w in span), max(w.y1 for w in span))
+            region = {'page': page_index, 'box': list(self._widen(page_index, transform_box(to_original, box)))}
+            with self._lock:
+                if column not in self.regions:
+                    self._observe(column, region, column in confirmed, document)
+
+    def _observe(self, column, region, confirmed, document):
+        self.changed = True
+        if confirmed:
+            self.regions[column] = region
+            self.candidates.pop(column, None)
+            return
+        candidate = self.candidates.get(column)
+        if candidate is None or candidate['page'] != region['page'] or not boxes_overlap(candidate['box'], region['box']):
+            self.candidates[column] = dict(region, documents=[document])
+            return
+        if document is not None and document in candidate['documents']:
+            return
+        candidate['documents'].append(document)
+        candidate['box'] = [min(candidate['box'][0], region['box'][0]), min(candidate['box'][1], region['box'][1]),
+                            max(candidate['box'][2], region['box'][2]), max(candidate['box'][3], region['box'][3])]
+        if len(candidate['documents']) >= LEARN_CONFIRMATIONS:
+            self.regions[column] = {'page': candidate['page'], 'box': candidate['box']}
+            del self.candidates[column]
+
+    def _widen(self, page_index, box):
+        """값 길이가 문서마다 다르므로 영역 오른쪽 끝을 같은 줄의 다음 인쇄된 단어 앞까지 넓힌다"""
+        x0, y0, x1, y1 = box
+        limit = None
+        for norm, ax0, ay0, ax1, ay1 in self.anchors[page_index]:
+            overlap = min(y1, ay1) - max(y0, ay0)
+            if ax0 >= x1 and overlap >= 0.5 * min(y1 - y0, ay1 - ay0):
+                limit = ax0 if limit is None else min(limit, ax0)
+        if limit is not None:
+            x1 = max(x1, limit - 1)
+        return x0, y0, x1, y1
+
+    def extract(self, ocr_data, columns, min_confidence=0.9):
+        """기억한 영역에서 열 값을 읽는다 ({열 이름: 값}, 읽은 단어의 신뢰도가 낮은 열은 뺀다)"""
+        pages = [PageLayout(page, {}) for page in (ocr_data or {}).get('pages', [])]
+        with self._lock:
+            regions = dict(self.regions)
+        alignments = {}
+        values = {}
+        for column in columns:
+            region = regions.get(column)
+            if region is None or region['page'] >= len(pages):
+                continue
+            page_index = region['page']
+            layout = pages[page_index]
+            if page_index not in alignments:
+                alignments[page_index] = self._align(page_index, layout)
+            transform, printed = alignments[page_index]
+            if transform is None:
+                continue
+            x0, y0, x1, y1 = transform_box(transform, region['box'])
+            pad = REGION_PADDING * (y1 - y0)
+            words = [w for w in layout.words_in(x0 - pad, y0 - pad, x1 + pad, y1 + pad)
+                     if w.index not in printed]
+            if words and min(w.confidence for w in words) >= min_confidence:
+                values[column] = " ".join(w.text for w in words)
+        return values
@@ -113,30 +113,38 @@ import json
 import io
 import pandas as pd
 import re
-import requests
 import os
+from transport import TRANSPORT
+from cache_store import KIND_COLUMNS, get_store
+from layout_extractor import extract_key_values, normalize_label
 
 AI_COLUMNS_ENDPOINT = os.getenv('AI_COLUMNS_ENDPOINT')
 AI_RESPONSE_ENDPOINT = os.getenv('AI_RESPONSE_ENDPOINT')
+AI_STREAMING = os.getenv('AI_STREAMING', '').lower() in ('1', 'true', 'yes')
+AI_OUTPUT_FORMAT = os.getenv('AI_OUTPUT_FORMAT', 'markdown')
+# OCR 단어 좌표로 서식의 '레이블: 값' 을 먼저 읽고 못 읽은 열만 AI 서버에 보낸다
+LAYOUT_EXTRACTION = os.getenv('LAYOUT_EXTRACTION', 'true').lower() in ('1', 'true', 'yes')
+LAYOUT_MIN_CONFIDENCE = float(os.getenv('LAYOUT_MIN_CONFIDENCE', '0.9'))
+# 원본 서식마다 열 값의 위치를 배워 두고 다음 배치부터 그 영역에서 읽는다
+FORM_TEMPLATES = os.getenv('FORM_TEMPLATES', 'true').lower() in ('1', 'true', 'yes')
+TEMPLATE_DIR = os.getenv('TEMPLATE_DIR', 'templates')
 
 def get_ai_columns(text):
     """AI 서버에 파일 내용을 보내어 열 제목을 추출합니다."""
     text_hash = hashlib.md5(text.encode()).hexdigest()
-    gpt_cache_file = os.path.join('gpt_cache', f"{text_hash}.json")
-    
-    if os.path.exists(gpt_cache_file):
+    cached = get_store().get(KIND_COLUMNS, text_hash)
+
+    if cached is not None:
         print("AI response found in cache.")
         try:
-            with open(gpt_cache_file, "r") as f:
-                response = json.load(f)
-                column_names = response['column_names']
-                return [col.strip() for col in column_names.split(',')]
+            column_names = cached['column_names']
+            return [col.strip() for col in column_names.split(',')]
         except Exception as e:
-            print(f"Error reading GPT cache file {gpt_cache_file}: {e}")
+            print(f"Error reading cached AI columns {text_hash}: {e}")
             return []
     else:
         try:
-            response = requests.post(AI_COLUMNS_ENDPOINT, json={"text": text})
+            response = TRANSPORT.post('ai', AI_COLUMNS_ENDPOINT, json={"text": text})
 
             if response.status_code == 200:
                 response_data = response.json()
@@ -144,8 +152,7 @@ def get_ai_columns(text):
 
                 if column_names:
                     columns = [col.strip() for col in column_names.split(',')]
-                    with open(gpt_cache_file, "w") as f:
-                        json.dump({'column_names': column_names}, f)
+                    get_store().put(KIND_COLUMNS, text_hash, {'column_names': column_names})
                     return columns
                 else:
                     print("Error: No column names found in AI response.")
@@ -198,28 +205,112 @@ def clean_and_format_table(table_markdown):
         print(f"Error cleaning and formatting table: {e}")
         return pd.DataFrame()
 
-def extract_table_from_text(text, columns):
-    """AI 서버에 텍스트에서 표 형식으로 변환된 데이터를 DataFrame으로 변환합니다."""
+def parse_json_table(table_json, columns):
+    """AI 서버의 JSON 응답(열 이름을 키로 하는 객체 배열)을 DataFrame으로 변환"""
     try:
-        response = requests.post(AI_RESPONSE_ENDPOINT, json={
-            "text": text,
-            "columns": columns
-        })
+        rows = json.loads(table_json)
+        if isinstance(rows, dict):
+            rows = [rows]
+        return pd.DataFrame([[row.get(col, '-') for col in columns] for row in rows], columns=columns)
+    except Exception as e:
+        print(f"Error parsing JSON table: {e}")
+        return pd.DataFrame()
 
-        if response.status_code == 200:
-            response_data = response.json()
-            table_markdown = response_data['response']
+def parse_table(table_text, columns):
+    """응답 형식에 맞춰 DataFrame으로 변환"""
+    if AI_OUTPUT_FORMAT == 'json':
+        return parse_json_table(table_text, columns)
+    return clean_and_format_table(table_text)
+
+def count_table_rows(table_markdown):
+    """지금까지 받은 마크다운(또는 JSON)에서 완성된 데이터 행 수를 센다"""
+    if AI_OUTPUT_FORMAT == 'json':
+        return table_markdown.count('}')
+    lines = [line for line in table_markdown.split('\n')[:-1] if line.strip().startswith('|')]
+    return max(0, len(lines) - 2)
+
+def resolve_local_values(ocr_data, columns, template=None):
+    """AI 서버 없이 읽을 수 있는 열 값 (기억한 서식 영역과 레이블 옆이나 아래)
+
+    레이블로 읽은 값이 기억한 영역의 값과 다르면 영역을 잘못 배운 것이므로 템플릿에서 지우고 레이블 값을 씁니다.
+    """
+    values = {}
+    if template is not None:
+        values.update(template.extract(ocr_data, columns, LAYOUT_MIN_CONFIDENCE))
+    if LAYOUT_EXTRACTION:
+        layout_values = extract_key_values(ocr_data, columns, LAYOUT_MIN_CONFIDENCE)[0]
+        if template is not None:
+            # 원본 서식에 인쇄된 글자를 값으로 읽었다면 빈 칸이므로 AI 서버에 맡긴다
+            for col in template.printed_columns(ocr_data, layout_values):
+                del layout_values[col]
+            for col, value in layout_values.items():
+                if col in values and normalize_label(values[col]) != normalize_label(value):
+                    template.forget(col)
+        values.update(layout_values)
+    print(f"Template/layout extraction resolved {len(values)} of {len(columns)} columns")
+    return values
+
+def merge_local_values(df, values, columns):
+    """AI 서버가 추출한 표(나머지 열)에 직접 읽은 값을 합쳐 열 순서를 맞춥니다."""
+    if not values:
+        return df
+    if df.empty:
+        return pd.DataFrame([[values.get(col) for col in columns]], columns=columns)
+    for col, value in values.items():
+        df[col] = value
+    ordered = [col for col in columns if col in df.columns]
+    return df[ordered + [col for col in df.columns if col not in ordered]]
+
+async def request_table_async(transport, text, columns, on_progress=None, pages=None):
+    """AI 서버에 열 값을 표로 추출해 달라고 요청합니다 (AsyncTransport 사용). 응답 표 문자열이나 None 을 반환합니다.
+
+    AI_STREAMING 이 설정되면 스트리밍 응답을 사용하며,
+    on_progress(지금까지 받은 마크다운, 완성된 행 수)가 토큰마다 호출됩니다.
+    pages(페이지별 텍스트)를 주면 서버가 긴 문서를 페이지 경계에서 나눠 추출합니다.
+    """
+    try:
+        if AI_STREAMING:
+            table_markdown = ""
+            async with transport.stream('ai', "POST", AI_RESPONSE_ENDPOINT, json={
+                "text": text,
+                "columns": columns,
+                "output_format": AI_OUTPUT_FORMAT,
+                "stream": True
+            }) as response:
+                if response.status_code != 200:
+                    print(f"Error from AI API: {response.status_code}, {(await response.aread()).decode(errors='replace')}")
+                    return None
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if 'token' in event:
+                        table_markdown += event['token']
+                        if on_progress:
+                            on_progress(table_markdown, count_table_rows(table_markdown))
+                    elif event.get('done'):
+                        if 'error' in event:
+                            print(f"Error from AI API: {event['error']}")
+                            return None
+                        table_markdown = event.get('response', table_markdown)
             print(f"Extracted Table Markdown:\n{table_markdown}")
+            return table_markdown
 
-            # 표 형식의 데이터를 DataFrame으로 변환
-            df = clean_and_format_table(table_markdown)
-            return df
-
-        else:
+        payload = {
+            "text": text,
+            "columns": columns,
+            "output_format": AI_OUTPUT_FORMAT
+        }
+        if pages:
+            payload["pages"] = pages
+        response = await transport.post('ai', AI_RESPONSE_ENDPOINT, json=payload)
+        if response.status_code != 200:
             print(f"Error from AI API: {response.status_code}, {response.text}")
-            return pd.DataFrame()
+            return None
+        table_markdown = response.json()['response']
+        print(f"Extracted Table Markdown:\n{table_markdown}")
+        return table_markdown
 
     except Exception as e:
         print(f"Error extracting table from text: {e}")
-        return pd.DataFrame()
-
+        return None
@@ -1,15 +1,15 @@
 import os
-import json
+import threading
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton, QLabel, 
                              QFileDialog, QProgressBar, QTextEdit, QListWidget, QDialog, QListWidgetItem, QHBoxLayout, QSizePolicy)
 from PyQt5.QtGui import QIcon, QColor, QPalette, QDragEnterEvent, QDropEvent
-from PyQt5.QtCore import Qt, QTimer, QMimeData
-from gpt_service import extract_table_from_text, get_ai_columns
+from PyQt5.QtCore import Qt, QTimer, QMimeData, QThreadPool
+from gpt_service import FORM_TEMPLATES, TEMPLATE_DIR
+from form_template import FormTemplate
 from utils import normalize_column_name
-from file_service import calculate_file_hash, manage_cache
-from api import ocr_document
-import hashlib
+from workers import OriginalWorker, PipelineWorker
+from transport import format_transport_stats
 
 class DropArea(QWidget):
     def __init__(self, parent, file_type):
@@ -186,6 +186,11 @@ class OCRApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.existing_df = None
+        self.results = []
+        self.batch_results = {}
+        self.cancel_event = threading.Event()
+        self.template = None
+        self.thread_pool = QThreadPool()
         
         self.setWindowTitle("스마트 지류to데이터 시스템")
         self.setGeometry(100, 100, 800, 600)
@@ -289,6 +294,12 @@ class OCRApp(QMainWindow):
         self.progress_bar.setFixedHeight(20) 
         progress_bar_with_percent.addWidget(self.progress_bar)
 
+        # 파이프라인 단계별 처리 중/작업자 수와 대기열 길이
+        self.stage_label = QLabel("")
+        self.stage_label.setStyleSheet("color: #AAAAAA; font-size: 12px;")
+        self.stage_label.setAlignment(Qt.AlignRight)
+        progress_bar_with_percent.addWidget(self.stage_label)
+
         progress_layout.addLayout(progress_bar_with_percent)
         self.layout.addLayout(progress_layout)
 
@@ -298,6 +309,11 @@ class OCRApp(QMainWindow):
         self.process_button.clicked.connect(self.process_files)
         button_layout.addWidget(self.process_button)
 
+        self.cancel_button = QPushButton("취소")
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        self.cancel_button.setEnabled(False)
+        button_layout.addWidget(self.cancel_button)
+
         self.save_button = QPushButton("엑셀 저장")
         self.save_button.clicked.connect(self.save_results_to_excel)
         button_layout.addWidget(self.save_button)
@@ -418,100 +434,93 @@ class OCRApp(QMainWindow):
                 self.show_status(f"Failed to save results: {e}", error=True)
 
     def process_files(self):
-        CACHE_DIR = 'cache'
-        
+        """원본 서류를 먼저 처리한 뒤 사용자 문서들을 작업자 스레드의 단계별 파이프라인으로 처리한다"""
         if not self.original_drop_area.files:
             self.show_status("Error: Original file not selected", error=True)
             return
         if not self.user_drop_area.files:
             self.show_status("Error: User files not selected", error=True)
             return
-        
+
         self.percent_label.setVisible(True)
-        
-        total_files = len(self.user_drop_area.files) + 1
+        self.process_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+
+        self.user_files = list(self.user_drop_area.files)
+        self.total_files = len(self.user_files) + 1
+        self.completed_files = 0
+        self.cancel_event = threading.Event()
+        self.batch_results = {}
+        self.template = None
 
         self.progress_bar.setValue(0)
-        self.progress_bar.setMaximum(total_files)
-        self.update_progress_label(0, total_files)
-        QApplication.processEvents()
+        self.progress_bar.setMaximum(self.total_files)
+        self.update_progress_label(0, self.total_files)
 
-        original_file = self.original_drop_area.files[0]
-        original_file_hash = calculate_file_hash(original_file)
-        original_cache_file = manage_cache(original_file_hash, original_file, CACHE_DIR, ocr_document, 'input')
+        columns = list(self.existing_df.columns) if self.existing_df is not None else None
+        worker = OriginalWorker(self.original_drop_area.files[0], columns)
+        worker.signals.result.connect(self.on_original_processed)
+        worker.signals.error.connect(lambda index, message: self.finish_batch(message, error=True))
+        self.thread_pool.start(worker)
 
-        if original_cache_file:
-            try:
-                with open(original_cache_file, "r") as f:
-                    original_ocr_data = json.load(f)
-            except IOError as e:
-                self.show_status(f"Error reading cache file: {e}", error=True)
-                return
-        else:
-            original_ocr_data = ocr_document(original_file, 'input')
-            if original_ocr_data:
-                cache_path = os.path.join(CACHE_DIR, f"{original_file_hash}.json")
-                try:
-                    with open(cache_path, "w") as f:
-                        json.dump(original_ocr_data, f)
-                except IOError as e:
-                    self.show_status(f"Error writing cache file: {e}", error=True)
-                    return
-        
-        original_text = " ".join([page.get('text', '') for page in original_ocr_data.get('pages', [])])
-        
+    def on_original_processed(self, index, result):
+        original_file_hash, original_ocr_data, self.columns = result
         if self.existing_df is not None:
-            self.columns = list(self.existing_df.columns)
             self.show_status("Existing Excel file used for table structure")
         else:
-            self.columns = get_ai_columns(original_text)
-            if not self.columns:
-                self.show_status("Error: Failed to extract columns from GPT", error=True)
-                return 
             self.show_status("AI used to extract table structure")
-            
-        self.progress_bar.setValue(1)
-        self.update_progress_label(1, total_files)
-        QApplication.processEvents() 
+        self.advance_progress()
+
+        if self.cancel_event.is_set():
+            self.finish_batch("Processing cancelled")
+            return
+
+        self.template = FormTemplate.load(TEMPLATE_DIR, original_file_hash, original_ocr_data) if FORM_TEMPLATES else None
+        worker = PipelineWorker(self.user_files, self.columns, self.template, self.cancel_event)
+        worker.signals.status.connect(lambda index, message: self.show_status(message))
+        worker.signals.error.connect(lambda index, message: self.show_status(message, error=True))
+        worker.signals.result.connect(self.on_document_processed)
+        worker.signals.done.connect(self.on_document_done)
+        worker.signals.stats.connect(self.stage_label.setText)
+        self.thread_pool.start(worker)
+
+    def on_document_processed(self, index, df):
+        if not df.empty:
+            self.batch_results[index] = df
+
+    def on_document_done(self, index):
+        self.advance_progress()
+        if self.completed_files < self.total_files:
+            return
+        if self.cancel_event.is_set():
+            self.finish_batch("Processing cancelled")
+        else:
+            self.finish_batch("All files processed successfully")
+
+    def advance_progress(self):
+        self.completed_files += 1
+        self.progress_bar.setValue(self.completed_files)
+        self.update_progress_label(self.completed_files, self.total_files)
+
+    def finish_batch(self, message, error=False):
+        """배치를 마치고 문서 순서대로 결과를 모은다 (취소됐으면 끝난 문서까지만)"""
+        self.results = [self.batch_results[i] for i in sorted(self.batch_results)]
+        if self.template is not None:
+            self.template.save()
+        self.process_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        # 배치가 끝나면 단계 상태 대신 HTTP 연결 재사용/재시도 카운터를 보여준다
+        stats = format_transport_stats()
+        print(f"HTTP transport: {stats}")
+        self.stage_label.setText(stats)
+        self.show_status(message, error=error)
+
+    def cancel_processing(self):
+        """대기 중인 문서는 시작하지 않고, 처리 중인 OCR 과 AI 요청은 연결을 끊어 멈춘다"""
+        self.cancel_event.set()
+        self.cancel_button.setEnabled(False)
+        self.show_status("Cancelling...")
 
-        self.results = []
-        for i, user_file in enumerate(self.user_drop_area.files):
-            user_file_hash = calculate_file_hash(user_file)
-            user_cache_file = manage_cache(user_file_hash, user_file, CACHE_DIR, ocr_document, 'user_data')
-            
-            if user_cache_file:
-                try:
-                    with open(user_cache_file, "r") as f:
-                        user_ocr_data = json.load(f)
-                except IOError as e:
-                    self.show_status(f"Error reading cache file for file {i+1}", error=True)
-                    continue
-            else:
-                user_ocr_data = ocr_document(user_file, 'user_data')
-                if user_ocr_data:
-                    cache_path = os.path.join(CACHE_DIR, f"{user_file_hash}.json")
-                    try:
-                        with open(cache_path, "w") as f:
-                            json.dump(user_ocr_data, f)
-                    except IOError as e:
-                        self.show_status(f"Error writing cache file for file {i+1}", error=True)
-                        continue
-            
-            if user_ocr_data:
-                user_text = " ".join([page.get('text', '') for page in user_ocr_data.get('pages', [])])
-                df = extract_table_from_text(user_text, self.columns)
-                if not df.empty:
-                    self.results.append(df)
-            
-            self.progress_bar.setValue(i + 2)
-            self.update_progress_label(i + 2, total_files)
-            QApplication.processEvents()  
-            self.show_status(f"Processed file {i + 1} of {len(self.user_drop_area.files)}")
-
-        self.show_status("All files processed successfully")
-        self.update_progress_label(total_files, total_files)
-        QApplication.processEvents()
-        
     def update_progress_label(self, current, total=None, error=False):
         """퍼센트 값을 업데이트하고 레이블 표시"""
         if error:
@@ -0,0 +1,247 @@
+import re
+from collections import defaultdict
+
+# 레이블 글자 사이 간격, 값 단어 사이 간격, 레이블과 값 사이 거리 (레이블 높이의 배수)
+LABEL_GAP = 3.0
+VALUE_GAP = 2.5
+VALUE_DISTANCE = 8.0
+
+# 체크박스가 들어간 값은 어느 칸이 표시됐는지 해석해야 하므로 모델에 맡긴다
+CHECKBOX_MARKS = set('□■☐☑☒✓✔✗✘')
+CHECK_WORDS = {'v', 'V'}
+
+
+def normalize_label(text):
+    """공백과 기호를 지운 비교용 문자열 ("성 명:" -> "성명")"""
+    return re.sub(r'[\W_]+', '', text).lower()
+
+
+class Word:
+    """OCR 단어 하나 (boundingBox.vertices 를 감싸는 사각형)"""
+    def __init__(self, index, word):
+        xs = [v.get('x', 0) for v in word['boundingBox']['vertices']]
+        ys = [v.get('y', 0) for v in word['boundingBox']['vertices']]
+        self.index = index
+        self.text = word.get('text', '')
+        self.norm = normalize_label(self.text)
+        self.confidence = word.get('confidence', 0.0)
+        self.x0, self.y0, self.x1, self.y1 = min(xs), min(ys), max(xs), max(ys)
+
+    @property
+    def height(self):
+        return max(1, self.y1 - self.y0)
+
+    @property
+    def center(self):
+        return (self.x0 + self.x1) / 2, (self.y0 + self.y1) / 2
+
+    def same_line(self, other):
+        """세로로 절반 이상 겹치면 같은 줄로 본다"""
+        overlap = min(self.y1, other.y1) - max(self.y0, other.y0)
+        return overlap >= 0.5 * min(self.height, other.height)
+
+
+class WordGrid:
+    """단어 사각형을 고정 크기 칸에 나눠 담은 공간 색인"""
+    def __init__(self, words, cell_size):
+        self.words = words
+        self.cell_size = max(1, int(cell_size))
+        self.cells = defaultdict(list)
+        for word in words:
+            for cell in self._cells(word.x0, word.y0, word.x1, word.y1):
+                self.cells[cell].append(word)
+
+    def _cells(self, x0, y0, x1, y1):
+        size = self.cell_size
+        for cx in range(int(x0) // size, int(x1) // size + 1):
+            for cy in range(int(y0) // size, int(y1) // size + 1):
+                yield cx, cy
+
+    def query(self, x0, y0, x1, y1):
+        """사각형과 겹치는 단어들 (문서 순서)"""
+        found = {}
+        for cell in self._cells(x0, y0, x1, y1):
+            for word in self.cells.get(cell, ()):
+                if word.x1 >= x0 and word.x0 <= x1 and word.y1 >= y0 and word.y0 <= y1:
+                    found[word.index] = word
+        return [found[i] for i in sorted(found)]
+
+
+class PageLayout:
+    """한 페이지의 단어에서 레이블을 찾고 그 오른쪽이나 아래의 값을 읽는다"""
+    def __init__(self, page, labels):
+        self.width = page.get('width') or 0
+        self.height = page.get('height') or 0
+        self.words = [Word(i, w) for i, w in enumerate(page.get('words', [])) if w.get('boundingBox')]
+        heights = sorted(word.height for word in self.words) or [1]
+        self.grid = WordGrid(self.words, 2 * heights[len(heights) // 2])
+        self.labels = labels
+        self.spans = self._find_labels()
+        self.label_words = {word.index for span in self.spans for word in span[1]} | self._spaced_words()
+
+    def _right_of(self, word, distance):
+        """word 와 같은 줄에서 오른쪽으로 distance 안에 있는 단어들 (가까운 순서)"""
+        candidates = self.grid.query(word.x1, word.y0, word.x1 + distance, word.y1)
+        return sorted((w for w in candidates if w.index != word.index and w.x0 >= word.x0 and word.same_line(w)),
+                      key=lambda w: w.x0)
+
+    def _find_labels(self):
+        """(열 이름, 레이블 단어들, 같은 단어 안에 붙은 값) 목록 ("성 명" 처럼 나뉜 레이블은 이어 붙인다)"""
+        longest = max((len(key) for key in self.labels), default=0)
+        spans = []
+        for word in self.words:
+            if not word.norm:
+                continue
+            # "성명:김강찬" 처럼 레이블과 값이 한 단어에 붙어 있는 경우
+            if ':' in word.text:
+                key, value = word.text.split(':', 1)
+                if normalize_label(key) in self.labels and value.strip():
+                    spans.append((self.labels[normalize_label(key)], [word], value.strip()))
+                    continue
+            text, span, current = word.norm, [word], word
+            while len(text) < longest and text not in self.labels:
+                following = [w for w in self._right_of(current, LABEL_GAP * current.height) if w.norm]
+                if not following or not any(key.startswith(text + following[0].norm) for key in self.labels):
+                    break
+                current = following[0]
+                text += current.norm
+                span.append(current)
+            if text in self.labels:
+                spans.append((self.labels[text], span, None))
+        # "신청인 성명" 안의 "성명" 처럼 더 긴 레이블의 일부인 레이블은 버린다
+        word_sets = [{w.index for w in span} for _, span, _ in spans]
+        return [entry for entry, words in zip(spans, word_sets)
+                if not any(words < other for other in word_sets)]
+
+    def _spaced_words(self):
+        """"성    별" 처럼 글자 사이를 띄운 인쇄된 레이블의 글자들 (요청한 열이 아니어도 값이 아니다)"""
+        spaced = set()
+        for word in self.words:
+            if len(word.norm) != 1:
+                continue
+            following = [w for w in self._right_of(word, LABEL_GAP * word.height) if w.norm]
+            if following and len(following[0].norm) == 1 and following[0].x0 - word.x1 > word.x1 - word.x0:
+                spaced.update((word.index, following[0].index))
+        return spaced
+
+    def _line_value(self, first, limit, height):
+        """first 에서 시작해 같은 줄의 다음 레이블이나 큰 간격(인쇄된 레이블 높이 기준) 전까지의 단어들"""
+        words = [first]
+        for word in self._right_of(first, limit):
+            if word.index in self.label_words or word.x0 - words[-1].x1 > VALUE_GAP * height:
+                break
+            words.append(word)
+        return words
+
+    def _value_right(self, span):
+        """레이블 오른쪽의 값 (오른쪽에 아무것도 없으면 None, 바로 다른 레이블이 오면 빈 칸이므로 [])"""
+        last = span[-1]
+        height = last.height
+        for word in self._right_of(last, VALUE_DISTANCE * height):
+            if word.index in self.label_words:
+                return []
+            return self._line_value(word, self.width or VALUE_DISTANCE * height, height)
+        return None
+
+    def _value_below(self, span):
+        first, last = span[0], span[-1]
+        height = max(w.height for w in span)
+        below = [w for w in self.grid.query(first.x0 - height, last.y1, last.x1 + height, last.y1 + 3 * height)
+                 if w.y0 >= last.y1 - 0.2 * height]
+        if not below:
+            return None
+        top = min(below, key=lambda w: (w.y0, w.x0))
+        if top.index in self.label_words:
+            return None
+        row = [w for w in below if w.same_line(top) and w.index not in self.label_words]
+        start = min(row, key=lambda w: w.x0)
+        # 왼쪽에 바로 이어지는 단어가 있으면 칸 안의 값이 아니라 문장의 일부다
+        left = self.grid.query(start.x0 - VALUE_GAP * start.height, start.y0, start.x0 - 1, start.y1)
+        if any(w.same_line(start) and w.x1 <= start.x0 for w in left):
+            return None
+        words = self._line_value(start, self.width or VALUE_DISTANCE * height, height)
+        # 같은 간격 아래에 값이 또 있으면 여러 행짜리 표이므로 모델에 맡긴다
+        step = top.y1 - last.y1
+        next_row = self.grid.query(first.x0 - height, top.y1 + 0.2 * height, last.x1 + height, top.y1 + step)
+        if any(w.index not in self.label_words for w in next_row):
+            return None
+        return words
+
+    def find_phrase(self, text):
+        """공백과 기호를 무시하고 text 와 내용이 같은, 한 줄 안의 연속된 단어들을 모두 찾는다"""
+        target = normalize_label(text)
+        matches = []
+        for word in self.words:
+            if not word.norm or not target.startswith(word.norm):
+                continue
+            joined, span, current = word.norm, [word], word
+            while len(joined) < len(target):
+                following = [w for w in self._right_of(current, VALUE_GAP * current.height) if w.norm]
+                if not following or not target.startswith(joined + following[0].norm):
+                    break
+                current = following[0]
+                joined += current.norm
+                span.append(current)
+            if joined == target:
+                matches.append(span)
+        return matches
+
+    def words_in(self, x0, y0, x1, y1):
+        """중심이 사각형 안에 있는 단어들 (위에서 아래로, 줄 안에서는 왼쪽부터)"""
+        words = [w for w in self.grid.query(x0, y0, x1, y1)
+                 if x0 <= w.center[0] <= x1 and y0 <= w.center[1] <= y1]
+        lines = []
+        for word in sorted(words, key=lambda w: w.y0):
+            for line in lines:
+                if line[0].same_line(word):
+                    line.append(word)
+                    break
+            else:
+                lines.append([word])
+        return [w for line in lines for w in sorted(line, key=lambda w: w.x0)]
+
+    def values(self):
+        """열 이름 -> [(값, 최소 신뢰도), ...]"""
+        found = defaultdict(list)
+        for column, span, inline in self.spans:
+            if inline is not None:
+                found[column].append((inline, span[0].confidence))
+                continue
+            # 아래는 오른쪽이 비어 있는 (표 머리글 같은) 레이블에서만 읽는다
+            words = self._value_right(span)
+            if words is None:
+                words = self._value_below(span)
+            if words and not any(CHECKBOX_MARKS & set(w.text) or CHECK_WORDS & set(w.text.split()) for w in words):
+                found[column].append((" ".join(w.text for w in words), min(w.confidence for w in words)))
+        return found
+
+
+def label_keys(columns):
+    """비교용 레이블 -> 열 이름 (괄호 속 설명을 뺀 이름도 함께 찾는다)"""
+    labels = {}
+    for column in columns:
+        for key in (normalize_label(column), normalize_label(re.sub(r'\(.*?\)', '', column))):
+            if key:
+                labels.setdefault(key, column)
+    return labels
+
+
+def extract_key_values(ocr_data, columns, min_confidence=0.9):
+    """OCR 단어 좌표로 '레이블: 값' 형식의 서식에서 열 값을 읽습니다.
+
+    레이블을 찾지 못했거나, 값의 신뢰도가 min_confidence 보다 낮거나,
+    문서 안에서 같은 레이블에 서로 다른 값이 있으면(여러 행짜리 문서) 해결하지 못한 열로 돌려줍니다.
+    반환값은 ({열 이름: 값}, [해결하지 못한 열 이름]) 입니다.
+    """
+    labels = label_keys(columns)
+    found = defaultdict(list)
+    for page in (ocr_data or {}).get('pages', []):
+        for column, values in PageLayout(page, labels).values().items():
+            found[column].extend(values)
+
+    resolved = {}
+    for column in columns:
+        values = found.get(column, [])
+        if values and len({value for value, _ in values}) == 1 and min(c for _, c in values) >= min_confidence:
+            resolved[column] = values[0][0]
+    return resolved, [column for column in columns if column not in resolved]
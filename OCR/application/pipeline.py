@@ -0,0 +1,237 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from api import ocr_document_async
+from file_service import get_cached_ocr, store_ocr
+from gpt_service import merge_local_values, parse_table, request_table_async, resolve_local_values
+from fingerprint import FINGERPRINT_WORKERS, hash_and_index, lookup_fingerprints
+from transport import AsyncTransport
+
+# 단계별 동시 처리 수 (OCR 업로드와 AI 요청은 서로 다른 문서에 대해 겹쳐 진행된다)
+PIPELINE_OCR_CONCURRENCY = max(1, int(os.getenv('PIPELINE_OCR_CONCURRENCY', os.getenv('OCR_CONCURRENCY', '4'))))
+PIPELINE_TEXT_CONCURRENCY = max(1, int(os.getenv('PIPELINE_TEXT_CONCURRENCY', '2')))
+PIPELINE_AI_CONCURRENCY = max(1, int(os.getenv('PIPELINE_AI_CONCURRENCY', '2')))
+# 단계 사이 대기열 크기 (앞 단계가 너무 앞서 나가 메모리에 OCR 결과를 쌓지 않도록 한다)
+PIPELINE_QUEUE_SIZE = max(1, int(os.getenv('PIPELINE_QUEUE_SIZE', '4')))
+
+
+class Document:
+    """파이프라인을 따라 흐르는 사용자 문서 하나의 중간 결과"""
+    def __init__(self, index, path):
+        self.index = index
+        self.path = path
+        self.hash = None
+        self.ocr_data = None
+        self.pages = []
+        self.text = ""
+        self.values = {}
+        self.unresolved = []
+        self.table = None
+        self.rows = -1
+
+
+class Stage:
+    """같은 일을 하는 작업자 concurrency 개와 그 앞의 크기 제한 대기열"""
+    def __init__(self, name, handler, concurrency, queue_size):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.queue = asyncio.Queue(queue_size)
+        self.active = 0
+        self.processed = 0
+
+
+class DocumentPipeline:
+    """해시 -> 캐시 조회 -> OCR -> 텍스트 조립 -> AI 추출 -> 파싱 단계로 사용자 문서들을 처리하는 파이프라인
+
+    단계마다 작업자 수가 정해져 있어 문서 i 의 AI 추출 중에 문서 i+1 의 OCR 이 진행됩니다.
+    콜백은 모두 파이프라인 스레드에서 (문서 번호, ...) 로 호출되며, on_done 은 문서마다 한 번 호출됩니다.
+    cancel_event 가 설정되면 진행 중인 HTTP 요청까지 취소하고 남은 문서를 끝난 것으로 알립니다.
+    """
+    STOP = object()
+
+    def __init__(self, columns, template=None, cancel_event=None, on_status=None, on_result=None,
+                 on_error=None, on_done=None, on_stats=None):
+        self.columns = columns
+        self.template = template
+        self.cancel_event = cancel_event
+        self.on_status = on_status or (lambda index, message: None)
+        self.on_result = on_result or (lambda index, df: None)
+        self.on_error = on_error or (lambda index, message: None)
+        self.on_done = on_done or (lambda index: None)
+        self.on_stats = on_stats or (lambda text: None)
+        self.stages = []
+        self.pending = set()
+        self.total = 0
+        self.transport = None
+
+    def stats(self):
+        """단계별 (이름, 처리 중, 작업자 수, 대기열 길이, 처리한 수)"""
+        return [(s.name, s.active, s.concurrency, s.queue.qsize(), s.processed) for s in self.stages]
+
+    def stats_text(self):
+        return " · ".join(f"{name} {active}/{limit} (queue {queued})" for name, active, limit, queued, _ in self.stats())
+
+    async def run(self, files):
+        self.pending = set(range(len(files)))
+        self.total = len(files)
+        async with AsyncTransport() as transport:
+            self.transport = transport
+            self.stages = [
+                Stage('hash', self._hash, 1, PIPELINE_QUEUE_SIZE),
+                Stage('cache', self._cache, 1, PIPELINE_QUEUE_SIZE),
+                Stage('ocr', self._ocr, PIPELINE_OCR_CONCURRENCY, PIPELINE_QUEUE_SIZE),
+                Stage('text', self._text, PIPELINE_TEXT_CONCURRENCY, PIPELINE_QUEUE_SIZE),
+                Stage('ai', self._ai, PIPELINE_AI_CONCURRENCY, PIPELINE_QUEUE_SIZE),
+                Stage('parse', self._parse, 1, PIPELINE_QUEUE_SIZE),
+            ]
+            tasks = [asyncio.create_task(self._feed(files))]
+            for i, stage in enumerate(self.stages):
+                next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+                tasks.append(asyncio.create_task(self._run_stage(stage, next_stage)))
+            watcher = asyncio.create_task(self._watch(tasks))
+            await asyncio.gather(*tasks, return_exceptions=True)
+            watcher.cancel()
+
+        # 취소로 끝나지 못한 문서도 끝난 것으로 알린다
+        for index in sorted(self.pending):
+            self.on_done(index)
+        self.pending.clear()
+
+    async def _feed(self, files):
+        """지문이 나오는 대로 문서를 첫 단계에 넣는다
+
+        바뀌지 않은 파일은 색인에서 바로 찾아 먼저 보내고, 새 파일은 여러 스레드가 해시하며
+        끝나는 순서대로 보낸다 (새 파일을 모두 해시할 때까지 OCR 이 기다리지 않는다).
+        """
+        first = self.stages[0]
+        known, missing = await asyncio.to_thread(lookup_fingerprints, files)
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(FINGERPRINT_WORKERS, len(missing))))
+
+        async def hash_one(path):
+            return path, await loop.run_in_executor(executor, hash_and_index, path)
+
+        # 새 파일의 해시는 색인에서 찾은 문서를 넣는 동안에도 진행된다
+        hashing = [asyncio.ensure_future(hash_one(path)) for path in missing]
+        try:
+            indexes = {}
+            for i, path in enumerate(files):
+                if path in known:
+                    await first.queue.put(self._document(i, path, known[path]))
+                else:
+                    indexes.setdefault(path, []).append(i)
+            for hashed in asyncio.as_completed(hashing):
+                path, file_hash = await hashed
+                for i in indexes[path]:
+                    await first.queue.put(self._document(i, path, file_hash))
+        finally:
+            # 취소되면 아직 시작하지 않은 해시는 버리고, 이벤트 루프를 막지 않도록 스레드를 기다리지 않는다
+            for task in hashing:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+        for _ in range(first.concurrency):
+            await first.queue.put(self.STOP)
+
+    @staticmethod
+    def _document(index, path, file_hash):
+        doc = Document(index, path)
+        doc.hash = file_hash
+        return doc
+
+    async def _run_stage(self, stage, next_stage):
+        await asyncio.gather(*[self._worker(stage, next_stage) for _ in range(stage.concurrency)])
+        if next_stage is not None:
+            for _ in range(next_stage.concurrency):
+                await next_stage.queue.put(self.STOP)
+
+    async def _worker(self, stage, next_stage):
+        while True:
+            doc = await stage.queue.get()
+            if doc is self.STOP:
+                return
+            stage.active += 1
+            try:
+                keep = await stage.handler(doc)
+            except Exception as e:
+                self.on_error(doc.index, f"Error processing file {doc.index + 1} ({stage.name}): {e}")
+                keep = False
+            finally:
+                stage.active -= 1
+                stage.processed += 1
+            if keep and next_stage is not None:
+                await next_stage.queue.put(doc)
+            else:
+                self._finish(doc)
+
+    async def _watch(self, tasks):
+        """취소 신호를 확인하고 단계별 상태가 바뀌면 알린다"""
+        last = None
+        while True:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                for task in tasks:
+                    task.cancel()
+                return
+            text = self.stats_text()
+            if text != last:
+                last = text
+                self.on_stats(text)
+            await asyncio.sleep(0.2)
+
+    def _finish(self, doc):
+        if doc.index in self.pending:
+            self.pending.discard(doc.index)
+            self.on_done(doc.index)
+
+    async def _hash(self, doc):
+        if doc.hash is None:
+            self.on_error(doc.index, f"Error: could not read file {doc.index + 1}")
+            return False
+        return True
+
+    async def _cache(self, doc):
+        doc.ocr_data = await asyncio.to_thread(get_cached_ocr, doc.hash, doc.path)
+        return True
+
+    async def _ocr(self, doc):
+        if doc.ocr_data is not None:
+            return True
+        doc.ocr_data = await ocr_document_async(self.transport, doc.path, 'user_data')
+        if not doc.ocr_data:
+            self.on_error(doc.index, f"Error: OCR failed for file {doc.index + 1}")
+            return False
+        await asyncio.to_thread(store_ocr, doc.hash, doc.ocr_data)
+        return True
+
+    async def _text(self, doc):
+        doc.pages = [page.get('text', '') for page in doc.ocr_data.get('pages', [])]
+        doc.text = " ".join(doc.pages)
+        doc.values = await asyncio.to_thread(resolve_local_values, doc.ocr_data, self.columns, self.template)
+        doc.unresolved = [col for col in self.columns if col not in doc.values]
+        return True
+
+    async def _ai(self, doc):
+        if doc.unresolved:
+            doc.table = await request_table_async(self.transport, doc.text, doc.unresolved,
+                                                  on_progress=lambda table, rows: self._progress(doc, rows),
+                                                  pages=doc.pages)
+        return True
+
+    def _progress(self, doc, rows):
+        if rows != doc.rows:
+            doc.rows = rows
+            self.on_status(doc.index, f"Processing file {doc.index + 1} of {self.total}: {rows} rows extracted")
+
+    async def _parse(self, doc):
+        df = parse_table(doc.table, doc.unresolved) if doc.table else pd.DataFrame()
+        df = merge_local_values(df, doc.values, self.columns)
+        if self.template is not None and len(df) == 1:
+            await asyncio.to_thread(self.template.learn, doc.ocr_data, df.iloc[0].to_dict(),
+                                    confirmed=doc.values.keys(), document=doc.hash)
+        if not df.empty:
+            self.on_result(doc.index, df)
+        self.on_status(doc.index, f"Processed file {doc.index + 1} of {self.total}")
+        return True
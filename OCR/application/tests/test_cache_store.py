@@ -0,0 +1,91 @@
+import itertools
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import cache_store
+from cache_store import KIND_COLUMNS, KIND_OCR, CacheStore
+
+
+def noise(n):
+    """압축되지 않는 문자열 (항목 크기를 예측할 수 있도록)"""
+    return os.urandom(n).hex()
+
+
+class CacheStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        # 접근 순서가 같은 시각으로 겹치지 않도록 1초씩 늘어나는 시계를 쓴다
+        clock = itertools.count(1000)
+        patcher = mock.patch.object(cache_store.time, 'time', side_effect=lambda: float(next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open(self, max_bytes=0):
+        store = CacheStore(os.path.join(self.dir.name, 'cache.sqlite3'), max_bytes=max_bytes)
+        self.addCleanup(store.close)
+        return store
+
+    def write_legacy(self, folder, key, value):
+        path = os.path.join(self.dir.name, folder)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f'{key}.json'), 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        return os.path.join(path, f'{key}.json')
+
+    def test_round_trip(self):
+        store = self.open()
+        store.put(KIND_OCR, 'abc', {'pages': [{'text': '성명 홍길동'}]})
+        self.assertEqual(store.get(KIND_OCR, 'abc'), {'pages': [{'text': '성명 홍길동'}]})
+        self.assertIsNone(store.get(KIND_COLUMNS, 'abc'))
+
+    def test_migrate_imports_legacy_files_once(self):
+        self.write_legacy('cache', 'aaa', {'modelVersion': 'v1', 'pages': []})
+        self.write_legacy('gpt_cache', 'bbb', ['성명', '주소'])
+        # 읽을 수 없는 파일은 건너뛴다
+        with open(os.path.join(self.dir.name, 'cache', 'broken.json'), 'w') as f:
+            f.write('{not json')
+        dirs = {KIND_OCR: os.path.join(self.dir.name, 'cache'), KIND_COLUMNS: os.path.join(self.dir.name, 'gpt_cache')}
+
+        store = self.open()
+        self.assertEqual(store.migrate(dirs), 2)
+        self.assertEqual(store.get(KIND_OCR, 'aaa'), {'modelVersion': 'v1', 'pages': []})
+        self.assertEqual(store.get(KIND_COLUMNS, 'bbb'), ['성명', '주소'])
+        self.assertTrue(store.migrated(f"migrated:{dirs[KIND_OCR]}"))
+        # 이미 가져온 키는 다시 가져오지 않는다
+        self.assertEqual(store.migrate(dirs), 0)
+
+    def test_migrate_can_delete_legacy_files(self):
+        path = self.write_legacy('cache', 'aaa', {'pages': []})
+        store = self.open()
+        store.migrate({KIND_OCR: os.path.dirname(path)}, delete=True)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(store.get(KIND_OCR, 'aaa'), {'pages': []})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        store = self.open(max_bytes=4000)
+        for key in ('a', 'b', 'c'):
+            store.put(KIND_OCR, key, noise(1000))
+        # a 를 읽었으므로 가장 오래 쓰지 않은 항목은 b 가 된다
+        self.assertIsNotNone(store.get(KIND_OCR, 'a'))
+        store.put(KIND_OCR, 'd', noise(1000))
+        self.assertIsNone(store.get(KIND_OCR, 'b'))
+        for key in ('a', 'c', 'd'):
+            self.assertIsNotNone(store.get(KIND_OCR, key))
+        self.assertLessEqual(store.total_bytes, 4000)
+
+    def test_total_size_is_restored_on_reopen(self):
+        store = self.open()
+        store.put(KIND_OCR, 'a', noise(500))
+        store.put(KIND_OCR, 'a', noise(800))
+        total = store.total_bytes
+        self.assertEqual(total, store.stats()[KIND_OCR]['bytes'])
+        store.close()
+        self.assertEqual(self.open().total_bytes, total)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fingerprint
+from fingerprint import FingerprintIndex, fingerprint_files, lookup_fingerprints
+
+
+class FingerprintIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        index = FingerprintIndex(os.path.join(self.dir.name, 'index.db'))
+        patcher = mock.patch.object(fingerprint, 'get_index', return_value=index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = self.write('a.pdf', b'first')
+
+    def write(self, name, content, mtime_ns=None):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_hash_is_md5_of_content(self):
+        self.assertEqual(fingerprint_files([self.path]), {self.path: hashlib.md5(b'first').hexdigest()})
+
+    def test_unchanged_file_is_not_read_again(self):
+        self.assertEqual(lookup_fingerprints([self.path]), ({}, [self.path]))
+        fingerprint_files([self.path])
+        with mock.patch.object(fingerprint, 'hash_file') as hash_file:
+            self.assertEqual(lookup_fingerprints([self.path]), ({self.path: hashlib.md5(b'first').hexdigest()}, []))
+            fingerprint_files([self.path])
+        hash_file.assert_not_called()
+
+    def test_mtime_change_invalidates_entry(self):
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        fingerprint_files([self.path])
+        # 크기가 같은 내용으로 바꾸고 수정 시각만 다르게 한다
+        self.write('a.pdf', b'other', mtime_ns + 10 ** 9)
+        self.assertEqual(lookup_fingerprints([self.path]), ({}, [self.path]))
+        self.assertEqual(fingerprint_files([self.path])[self.path], hashlib.md5(b'other').hexdigest())
+
+    def test_size_change_invalidates_entry(self):
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        fingerprint_files([self.path])
+        # 수정 시각은 그대로 두고 크기만 바꾼다
+        self.write('a.pdf', b'longer content', mtime_ns)
+        self.assertEqual(lookup_fingerprints([self.path]), ({}, [self.path]))
+        self.assertEqual(fingerprint_files([self.path])[self.path], hashlib.md5(b'longer content').hexdigest())
+
+    def test_missing_file_is_none(self):
+        path = os.path.join(self.dir.name, 'missing.pdf')
+        self.assertEqual(fingerprint_files([path, self.path])[path], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
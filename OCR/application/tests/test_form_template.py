@@ -0,0 +1,92 @@
+import unittest
+
+from form_template import (FormTemplate, apply_transform, boxes_overlap, fit_transform, invert_transform,
+                           transform_box)
+
+# 원본 서식에 인쇄된 단어 (글자, x0, y0, x1, y1)
+PRINTED = [('성명', 10, 10, 50, 30), ('주소', 10, 60, 50, 80), ('연락처', 10, 110, 60, 130),
+           ('서명', 300, 200, 340, 220), ('2', 300, 10, 310, 30)]
+
+
+def ocr_page(words, dx=0, dy=0):
+    return {'width': 400, 'height': 300, 'words': [
+        {'text': text, 'confidence': 0.99, 'boundingBox': {'vertices': [
+            {'x': x0 + dx, 'y': y0 + dy}, {'x': x1 + dx, 'y': y0 + dy},
+            {'x': x1 + dx, 'y': y1 + dy}, {'x': x0 + dx, 'y': y1 + dy}]}}
+        for text, x0, y0, x1, y1 in words]}
+
+
+def filled(name, dx=0, dy=0):
+    """성명 칸에 name 을 적어 (dx, dy) 만큼 밀려 스캔된 문서"""
+    return {'pages': [ocr_page(PRINTED + [(name, 70, 10, 120, 30), ('2', 70, 60, 80, 80)], dx, dy)]}
+
+
+def new_template():
+    return FormTemplate.load('unused', 'form', {'pages': [ocr_page(PRINTED)]})
+
+
+class TransformTests(unittest.TestCase):
+    def test_fit_recovers_affine_transform(self):
+        def move(x, y):
+            return 1.02 * x - 0.03 * y + 7, 0.03 * x + 0.98 * y - 4
+        points = [(0, 0), (100, 0), (0, 100), (100, 100), (50, 20)]
+        transform = fit_transform([(p, move(*p)) for p in points])
+        for p in [(10, 90), (70, 30)]:
+            for got, expected in zip(apply_transform(transform, *p), move(*p)):
+                self.assertAlmostEqual(got, expected, places=6)
+
+    def test_falls_back_to_translation(self):
+        self.assertIsNone(fit_transform([]))
+        self.assertEqual(fit_transform([((0, 0), (3, 4)), ((10, 0), (13, 4))]), ((1.0, 0.0, 3), (0.0, 1.0, 4)))
+        # 한 줄에 늘어선 점은 기울기를 정할 수 없다
+        collinear = [((x, 0), (x + 2, 5)) for x in (0, 10, 20, 30)]
+        self.assertEqual(fit_transform(collinear), ((1.0, 0.0, 2), (0.0, 1.0, 5)))
+
+    def test_invert_round_trips(self):
+        transform = ((1.1, 0.2, 5.0), (-0.1, 0.9, -3.0))
+        inverse = invert_transform(transform)
+        x, y = apply_transform(inverse, *apply_transform(transform, 12.0, 34.0))
+        self.assertAlmostEqual(x, 12.0)
+        self.assertAlmostEqual(y, 34.0)
+        self.assertIsNone(invert_transform(((1, 2, 0), (2, 4, 0))))
+
+    def test_transform_box_and_overlap(self):
+        box = transform_box(((1, 0, 10), (0, 1, 5)), (0, 0, 20, 10))
+        self.assertEqual(box, (10, 5, 30, 15))
+        self.assertTrue(boxes_overlap(box, (15, 5, 35, 15)))
+        self.assertFalse(boxes_overlap(box, (31, 5, 40, 15)))
+
+
+class LearningTests(unittest.TestCase):
+    def test_ai_values_need_two_documents(self):
+        template = new_template()
+        template.learn(filled('홍길동'), {'성명': '홍길동'}, document='a')
+        template.learn(filled('홍길동'), {'성명': '홍길동'}, document='a')
+        self.assertNotIn('성명', template.regions)
+        template.learn(filled('김이름', dx=4, dy=2), {'성명': '김이름'}, document='b')
+        self.assertIn('성명', template.regions)
+        self.assertEqual(template.extract(filled('박사람', dx=-3, dy=1), ['성명']), {'성명': '박사람'})
+
+    def test_disagreeing_location_replaces_candidate(self):
+        template = new_template()
+        template.learn(filled('홍길동'), {'성명': '홍길동'}, document='a')
+        template.learn(filled('김이름'), {'성명': '서명'}, document='b')
+        self.assertNotIn('성명', template.regions)
+        self.assertEqual(template.candidates['성명']['documents'], ['b'])
+
+    def test_confirmed_values_are_learned_at_once_and_can_be_forgotten(self):
+        template = new_template()
+        template.learn(filled('홍길동'), {'성명': '홍길동'}, confirmed=['성명'], document='a')
+        self.assertIn('성명', template.regions)
+        template.forget('성명')
+        self.assertEqual(template.extract(filled('김이름'), ['성명']), {})
+
+    def test_printed_columns_only_checks_the_value_position(self):
+        template = new_template()
+        document = filled('홍길동')
+        # "2" 는 서식에도 인쇄되어 있지만 주소 칸에 적힌 것은 값이다
+        self.assertEqual(template.printed_columns(document, {'주소': '2', '성명': '서명'}), {'성명'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import os
+import unittest
+
+from layout_extractor import extract_key_values, label_keys, normalize_label
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'cache')
+COLUMNS = ['성명', '생년월일', '주소', '연락처']
+
+
+def load_ocr(file_hash):
+    with open(os.path.join(CACHE_DIR, f'{file_hash}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class ExtractKeyValuesTests(unittest.TestCase):
+    """OCR/cache 에 저장된 실제 OCR 결과로 레이블 옆 값을 읽는지 확인한다"""
+
+    def extract(self, file_hash):
+        return extract_key_values(load_ocr(file_hash), COLUMNS)[0]
+
+    def test_filled_form(self):
+        values = self.extract('821ca1265f505834837d8789d45a30e2')
+        self.assertEqual(values['성명'], '김이름')
+        self.assertEqual(values['생년월일'], '2572921')
+        self.assertEqual(values['주소'], '대전광역시 서구 둔산로 80 (301호)')
+
+    def test_form_without_contact(self):
+        values = self.extract('b3693eca25381c5592c3fed4ed2f1707')
+        self.assertEqual(values, {'성명': '홍길동', '생년월일': '310321', '주소': '대전광역시 유성구 가정북로 73'})
+
+    def test_partially_filled_form(self):
+        values = self.extract('06c12c8ba5e055546a46bdb9b7fc24f9')
+        self.assertEqual(values, {'생년월일': '240911', '연락처': '010 -4777 -4844'})
+
+    def test_blank_form_has_no_values(self):
+        values, unresolved = extract_key_values(load_ocr('a6cc356588ae15cb3291ad2c24b29c7d'), COLUMNS)
+        self.assertEqual(values, {})
+        self.assertEqual(unresolved, COLUMNS)
+
+    def test_empty_ocr_data(self):
+        self.assertEqual(extract_key_values(None, COLUMNS), ({}, COLUMNS))
+
+
+class LabelTests(unittest.TestCase):
+    def test_labels_ignore_spaces_and_descriptions(self):
+        self.assertEqual(normalize_label('성 명'), normalize_label('성명'))
+        self.assertEqual(label_keys(['연락처(휴대폰)'])[normalize_label('연락처')], '연락처(휴대폰)')
+
+
+if __name__ == '__main__':
+    unittest.main()
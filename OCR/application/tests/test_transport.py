@@ -0,0 +1,118 @@
+import unittest
+from unittest import mock
+
+import requests
+
+import transport
+from transport import CircuitBreaker, CircuitOpen, Transport, retry_delay
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """정해 둔 응답 코드나 예외를 차례로 돌려주는 세션"""
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return FakeResponse(result)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def test_opens_after_threshold_and_probes_once(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_seconds=10)
+        with mock.patch('transport.time.monotonic', return_value=100.0):
+            breaker.record_failure()
+            self.assertEqual(breaker.state, 'closed')
+            breaker.record_failure()
+            self.assertEqual(breaker.state, 'open')
+            with self.assertRaises(CircuitOpen):
+                breaker.before_request()
+
+        with mock.patch('transport.time.monotonic', return_value=111.0):
+            self.assertEqual(breaker.state, 'half-open')
+            breaker.before_request()
+            with self.assertRaises(CircuitOpen):
+                breaker.before_request()
+            breaker.record_success()
+            self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=10)
+        with mock.patch('transport.time.monotonic', return_value=0.0):
+            breaker.record_failure()
+        with mock.patch('transport.time.monotonic', return_value=20.0):
+            breaker.before_request()
+            breaker.record_failure()
+            self.assertEqual(breaker.state, 'open')
+
+    def test_release_probe_lets_next_request_through(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_seconds=10)
+        with mock.patch('transport.time.monotonic', return_value=0.0):
+            breaker.record_failure()
+        with mock.patch('transport.time.monotonic', return_value=20.0):
+            breaker.before_request()
+            breaker.release_probe()
+            breaker.before_request()
+
+
+class RetryDelayTests(unittest.TestCase):
+    def test_full_jitter_is_capped(self):
+        for attempt in range(10):
+            delay = retry_delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(transport.HTTP_BACKOFF_MAX, transport.HTTP_BACKOFF * 2 ** attempt))
+
+    def test_honours_retry_after(self):
+        self.assertGreaterEqual(retry_delay(0, '7'), 7)
+        self.assertLessEqual(retry_delay(0, 'soon'), transport.HTTP_BACKOFF)
+
+
+@mock.patch('transport.time.sleep', lambda seconds: None)
+class TransportRetryTests(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(transport.BREAKERS, {
+            'ai': CircuitBreaker('ai', failure_threshold=100),
+            'ocr': CircuitBreaker('ocr', failure_threshold=100),
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, endpoint, results):
+        session = FakeSession(results)
+        client = Transport()
+        client.sessions[endpoint] = session
+        try:
+            return client.post(endpoint, 'http://server/').status_code, session.calls
+        except Exception as e:
+            return type(e), session.calls
+
+    def test_ocr_retries_timeouts_and_server_errors(self):
+        self.assertEqual(self.post('ocr', [requests.Timeout(), 502, 200]), (200, 3))
+
+    def test_ai_does_not_resend_after_read_timeout_or_500(self):
+        self.assertEqual(self.post('ai', [requests.Timeout(), 200]), (requests.Timeout, 1))
+        self.assertEqual(self.post('ai', [500, 200]), (500, 1))
+
+    def test_ai_retries_connection_errors_and_rejections(self):
+        self.assertEqual(self.post('ai', [requests.ConnectionError(), 429, 503, 200]), (200, 4))
+
+    def test_gives_up_after_configured_retries(self):
+        with mock.patch('transport.HTTP_RETRIES', 1):
+            self.assertEqual(self.post('ocr', [503, 503, 200]), (503, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
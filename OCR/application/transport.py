@@ -0,0 +1,315 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# 연결/읽기 제한 시간 (초). 읽기는 AI 생성이 길어질 수 있어 넉넉하게 둔다
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', os.getenv('HTTP_TIMEOUT', '300')))
+# 재시도 횟수와 지수 백오프 (초, 0 ~ 계산값 사이에서 무작위로 고른다)
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+HTTP_BACKOFF = float(os.getenv('HTTP_BACKOFF', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '10'))
+# 엔드포인트별 연결 풀 크기
+HTTP_POOL_SIZES = {
+    'ocr': int(os.getenv('HTTP_POOL_SIZE_OCR', '4')),
+    'ai': int(os.getenv('HTTP_POOL_SIZE_AI', '4')),
+}
+# 연속 실패가 이만큼 쌓이면 CIRCUIT_RESET_SECONDS 동안 요청을 보내지 않고 바로 실패한다
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+# 다시 보내면 성공할 수 있는 응답 (429/503 은 서버가 보낸 Retry-After 를 따른다)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# AI 생성 요청은 다시 보내면 서버가 같은 생성을 또 하므로, 서버에 닿지 못한 연결 오류와 처리 전에 거절한 429/503 만 재시도한다
+NON_IDEMPOTENT_ENDPOINTS = {'ai'}
+NON_IDEMPOTENT_RETRYABLE_STATUS = {429, 503}
+
+
+class CircuitOpen(Exception):
+    """엔드포인트가 계속 실패해 요청을 보내지 않았다"""
+
+
+class CircuitBreaker:
+    """연속 실패 수로 닫힘 -> 열림 -> (reset_seconds 뒤) 반열림을 오가는 차단기
+
+    반열림 상태에서는 요청 하나만 보내 보고, 성공하면 닫고 실패하면 다시 연다.
+    """
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return 'open'
+        return 'half-open'
+
+    def before_request(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.probing):
+                raise CircuitOpen(f"{self.name} endpoint is unavailable "
+                                  f"({self.failures} consecutive failures), retry later")
+            if state == 'half-open':
+                self.probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def release_probe(self):
+        """결과를 알 수 없이 끝난 요청 (취소 등) 이후 다음 요청이 다시 확인할 수 있게 한다"""
+        with self._lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class TransportStats:
+    """엔드포인트별 요청/응답/재시도/실패/차단 횟수와 새로 연 연결 수"""
+    FIELDS = ('requests', 'responses', 'retries', 'failures', 'rejected', 'connections')
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, field, amount=1):
+        with self._lock:
+            counts = self.counts.setdefault(endpoint, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self.counts.items()}
+
+
+BREAKERS = {name: CircuitBreaker(name) for name in HTTP_POOL_SIZES}
+STATS = TransportStats()
+
+
+def retryable_status(endpoint):
+    """endpoint 에서 다시 보내도 되는 응답 코드"""
+    return NON_IDEMPOTENT_RETRYABLE_STATUS if endpoint in NON_IDEMPOTENT_ENDPOINTS else RETRYABLE_STATUS
+
+
+def retry_delay(attempt, retry_after=None):
+    """attempt 번째 재시도 전 대기 시간 (full jitter, 서버가 Retry-After 를 주면 그보다 짧게 기다리지 않는다)"""
+    delay = random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+class Transport:
+    """requests.Session 을 엔드포인트마다 하나씩 두고 연결을 재사용하는 동기 전송 계층"""
+    def __init__(self):
+        self.sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, endpoint):
+        with self._lock:
+            if endpoint not in self.sessions:
+                session = requests.Session()
+                size = HTTP_POOL_SIZES.get(endpoint, 4)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[endpoint] = session
+            return self.sessions[endpoint]
+
+    def post(self, endpoint, url, **kwargs):
+        """재시도와 차단기를 거쳐 POST 를 보낸다
+
+        재시도해도 안 되는 응답은 그대로 돌려주고, 연결 오류가 계속되면 마지막 예외를 다시 던진다.
+        stream=True 면 응답 본문을 읽는 도중의 오류는 재시도하지 않는다.
+        """
+        breaker = BREAKERS.setdefault(endpoint, CircuitBreaker(endpoint))
+        kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        session = self.session(endpoint)
+        retry_status = retryable_status(endpoint)
+        # 읽기 시간 초과는 서버가 아직 처리 중일 수 있으므로 AI 요청은 다시 보내지 않는다
+        retry_errors = (requests.ConnectionError,) if endpoint in NON_IDEMPOTENT_ENDPOINTS else ()
+        for attempt in range(HTTP_RETRIES + 1):
+            try:
+                breaker.before_request()
+            except CircuitOpen:
+                STATS.add(endpoint, 'rejected')
+                raise
+            STATS.add(endpoint, 'requests')
+            try:
+                response = session.post(url, **kwargs)
+                STATS.add(endpoint, 'responses')
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                if attempt == HTTP_RETRIES or (retry_errors and not isinstance(e, retry_errors)):
+                    STATS.add(endpoint, 'failures')
+                    raise
+                STATS.add(endpoint, 'retries')
+                time.sleep(retry_delay(attempt))
+                continue
+            except BaseException:
+                breaker.release_probe()
+                raise
+
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in retry_status or attempt == HTTP_RETRIES:
+                if response.status_code in retry_status:
+                    STATS.add(endpoint, 'failures')
+                return response
+            STATS.add(endpoint, 'retries')
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+            time.sleep(retry_delay(attempt, retry_after))
+
+    def connection_counts(self):
+        """엔드포인트별로 새로 연 연결 수 (urllib3 연결 풀 기준)"""
+        counts = {}
+        with self._lock:
+            sessions = dict(self.sessions)
+        for endpoint, session in sessions.items():
+            counts[endpoint] = 0
+            for adapter in set(session.adapters.values()):
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is not None:
+                        counts[endpoint] += pool.num_connections
+        return counts
+
+
+class AsyncTransport:
+    """httpx.AsyncClient 를 엔드포인트마다 하나씩 두는 비동기 전송 계층 (async with 로 연다)
+
+    재시도, 제한 시간, 차단기와 카운터는 Transport 와 같으며 차단기는 동기 요청과 함께 쓴다.
+    """
+    def __init__(self):
+        self.clients = {}
+        self._streams = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def client(self, endpoint):
+        if endpoint not in self.clients:
+            size = HTTP_POOL_SIZES.get(endpoint, 4)
+            self.clients[endpoint] = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            )
+            self._streams[endpoint] = set()
+        return self.clients[endpoint]
+
+    def _count_connection(self, endpoint, response):
+        # 같은 네트워크 스트림으로 받은 응답은 재사용한 연결이다
+        stream = response.extensions.get('network_stream')
+        if stream is not None and id(stream) not in self._streams[endpoint]:
+            self._streams[endpoint].add(id(stream))
+            STATS.add(endpoint, 'connections')
+
+    async def _send(self, endpoint, method, url, stream, **kwargs):
+        breaker = BREAKERS.setdefault(endpoint, CircuitBreaker(endpoint))
+        client = self.client(endpoint)
+        retry_status = retryable_status(endpoint)
+        retry_errors = (httpx.ConnectError, httpx.ConnectTimeout) if endpoint in NON_IDEMPOTENT_ENDPOINTS else ()
+        for attempt in range(HTTP_RETRIES + 1):
+            try:
+                breaker.before_request()
+            except CircuitOpen:
+                STATS.add(endpoint, 'rejected')
+                raise
+            STATS.add(endpoint, 'requests')
+            try:
+                response = await client.send(client.build_request(method, url, **kwargs), stream=stream)
+                STATS.add(endpoint, 'responses')
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if attempt == HTTP_RETRIES or (retry_errors and not isinstance(e, retry_errors)):
+                    STATS.add(endpoint, 'failures')
+                    raise
+                STATS.add(endpoint, 'retries')
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            except BaseException:
+                breaker.release_probe()
+                raise
+
+            self._count_connection(endpoint, response)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in retry_status or attempt == HTTP_RETRIES:
+                if response.status_code in retry_status:
+                    STATS.add(endpoint, 'failures')
+                return response
+            STATS.add(endpoint, 'retries')
+            retry_after = response.headers.get('Retry-After')
+            await response.aclose()
+            await asyncio.sleep(retry_delay(attempt, retry_after))
+
+    async def post(self, endpoint, url, **kwargs):
+        return await self._send(endpoint, 'POST', url, False, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, endpoint, method, url, **kwargs):
+        """응답을 받기 전까지만 재시도하는 스트리밍 요청"""
+        response = await self._send(endpoint, method, url, True, **kwargs)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+
+TRANSPORT = Transport()
+
+
+def transport_stats():
+    """엔드포인트별 카운터 (동기 요청의 연결 수는 urllib3 연결 풀에서 읽는다)"""
+    stats = STATS.snapshot()
+    for endpoint, opened in TRANSPORT.connection_counts().items():
+        counts = stats.setdefault(endpoint, dict.fromkeys(TransportStats.FIELDS, 0))
+        counts['connections'] += opened
+    for endpoint, counts in stats.items():
+        # 새 연결 없이 받은 응답은 열려 있던 연결을 재사용한 것이다
+        counts['reused'] = max(0, counts['responses'] - counts['connections'])
+        counts['circuit'] = BREAKERS[endpoint].state if endpoint in BREAKERS else 'closed'
+    return stats
+
+
+def format_transport_stats():
+    return ", ".join(
+        f"{endpoint}: {c['requests']} requests, {c['reused']} reused connections, {c['retries']} retries, "
+        f"{c['failures']} failures, {c['rejected']} rejected (circuit {c['circuit']})"
+        for endpoint, c in sorted(transport_stats().items())
+    )
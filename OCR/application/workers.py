@@ -0,0 +1,92 @@
+import asyncio
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from api import ocr_document
+from file_service import calculate_file_hash, get_cached_ocr, store_ocr
+from gpt_service import get_ai_columns
+
+from pipeline import DocumentPipeline
+
+
+def load_ocr(file_path, folder):
+    """캐시된 OCR 결과를 읽고, 없으면 OCR 을 요청해 캐시에 저장합니다. (파일 해시, OCR 결과) 를 반환합니다."""
+    file_hash = calculate_file_hash(file_path)
+    if file_hash is None:
+        return None, None
+    ocr_data = get_cached_ocr(file_hash, file_path)
+    if ocr_data is None:
+        ocr_data = ocr_document(file_path, folder)
+        if ocr_data:
+            store_ocr(file_hash, ocr_data)
+    return file_hash, ocr_data
+
+
+class WorkerSignals(QObject):
+    """작업자 스레드에서 GUI 스레드로 보내는 신호 (문서 번호와 함께 보낸다)"""
+    status = pyqtSignal(int, str)
+    result = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+    done = pyqtSignal(int)
+    stats = pyqtSignal(str)
+
+
+class OriginalWorker(QRunnable):
+    """원본 서류를 OCR 하고 (기존 엑셀이 없으면) AI 로 열 제목을 뽑는 작업
+
+    result 로 (파일 해시, OCR 결과, 열 제목 목록) 을 보냅니다.
+    """
+    def __init__(self, file_path, columns=None):
+        super().__init__()
+        self.file_path = file_path
+        self.columns = columns
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            file_hash, ocr_data = load_ocr(self.file_path, 'input')
+            if file_hash is None:
+                self.signals.error.emit(0, "Error: Could not read the original file")
+                return
+            if not ocr_data:
+                self.signals.error.emit(0, "Error: OCR failed for the original file")
+                return
+            columns = self.columns
+            if columns is None:
+                text = " ".join([page.get('text', '') for page in ocr_data.get('pages', [])])
+                columns = get_ai_columns(text)
+                if not columns:
+                    self.signals.error.emit(0, "Error: Failed to extract columns from GPT")
+                    return
+            self.signals.result.emit(0, (file_hash, ocr_data, columns))
+        except Exception as e:
+            self.signals.error.emit(0, f"Error processing original file: {e}")
+        finally:
+            self.signals.done.emit(0)
+
+
+class PipelineWorker(QRunnable):
+    """사용자 문서들을 DocumentPipeline 으로 처리하는 작업 (이벤트 루프를 이 작업자 스레드에서 돌린다)"""
+    def __init__(self, files, columns, template, cancel_event):
+        super().__init__()
+        self.files = files
+        self.columns = columns
+        self.template = template
+        self.cancel_event = cancel_event
+        self.signals = WorkerSignals()
+
+    def run(self):
+        pipeline = DocumentPipeline(
+            self.columns, self.template, self.cancel_event,
+            on_status=self.signals.status.emit,
+            on_result=self.signals.result.emit,
+            on_error=self.signals.error.emit,
+            on_done=self.signals.done.emit,
+            on_stats=self.signals.stats.emit,
+        )
+        try:
+            asyncio.run(pipeline.run(self.files))
+        except Exception as e:
+            self.signals.error.emit(-1, f"Error processing files: {e}")
+            for index in sorted(pipeline.pending):
+                self.signals.done.emit(index)